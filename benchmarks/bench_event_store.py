@@ -0,0 +1,97 @@
+import os
+import sys
+import csv
+import time
+import random
+import argparse
+import datetime
+import tempfile
+import statistics
+
+# Measures event_store.py at scale: ingest time for a synthetic event CSV with many rows,
+# date-window query latency through the indexes, and the cost of re-parsing the CSV instead.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from event_csv import EVENT_HEADER
+from event_store import EventStore, read_event_file
+
+CATEGORIES = {
+    "市場機制": ["債券發行", "指數調整", "除權息"],
+    "公司行動": ["法說會", "股東會", "財報"],
+    "經濟數據": ["CPI", "非農就業", "GDP"],
+    "金融危機": ["銀行倒閉", "股災"],
+}
+
+def write_synthetic_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    first_day = datetime.date(1990, 1, 1)
+    days = (datetime.date(2026, 1, 1) - first_day).days
+    categories = list(CATEGORIES)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EVENT_HEADER)
+        for i in range(rows):
+            category = rng.choice(categories)
+            start = first_day + datetime.timedelta(days=rng.randrange(days))
+            # Mostly one-day events, some weeks long, a few lasting months
+            span = rng.choice([0] * 8 + [rng.randrange(1, 14), rng.randrange(30, 400)])
+            end = start + datetime.timedelta(days=span)
+            writer.writerow([category, rng.choice(CATEGORIES[category]), f"事件 {i}", start.isoformat(),
+                             end.isoformat() if span else "", "synthetic", "", ""])
+
+def random_windows(count, seed=1):
+    rng = random.Random(seed)
+    windows = []
+    for _ in range(count):
+        start = datetime.date(1990, 1, 1) + datetime.timedelta(days=rng.randrange(13000))
+        windows.append((start.isoformat(), (start + datetime.timedelta(days=rng.randrange(1, 31))).isoformat()))
+    return windows
+
+def timed(label, func, windows):
+    times = []
+    found = 0
+    for start, end in windows:
+        began = time.perf_counter()
+        found += len(func(start, end))
+        times.append(time.perf_counter() - began)
+    print(f"{label:<38} p50 {statistics.median(times) * 1000:8.2f} ms   p95 {sorted(times)[int(len(times) * 0.95)] * 1000:8.2f} ms"
+          f"   {found / len(windows):8.1f} events/query")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SQLite event store")
+    parser.add_argument("--rows", type=int, default=1000000, help="Synthetic events to generate")
+    parser.add_argument("--queries", type=int, default=200, help="Random date windows to query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, "events.csv")
+        write_synthetic_csv(csv_path, args.rows)
+        store = EventStore(os.path.join(workdir, "events.sqlite"))
+
+        began = time.perf_counter()
+        _, count, _ = store.ingest(csv_path)
+        print(f"Ingest {count} events: {time.perf_counter() - began:.2f}s")
+        began = time.perf_counter()
+        status, _, _ = store.ingest(csv_path)
+        print(f"Re-ingest ({status}): {(time.perf_counter() - began) * 1000:.2f} ms")
+        with open(csv_path, "a", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerow(["經濟數據", "CPI", "新增事件", "2026-01-13", "", "synthetic", "", ""])
+        began = time.perf_counter()
+        status, _, _ = store.ingest(csv_path)
+        print(f"Ingest after appending one row ({status}): {(time.perf_counter() - began) * 1000:.2f} ms\n")
+
+        windows = random_windows(args.queries)
+        timed("query window", lambda s, e: store.query(s, e), windows)
+        timed("query window + 類別", lambda s, e: store.query(s, e, category="經濟數據"), windows)
+        timed("query window + 子類別", lambda s, e: store.query(s, e, subcategory="CPI"), windows)
+
+        began = time.perf_counter()
+        rows, _ = read_event_file(csv_path)
+        matches = [row for row in rows if row[3] <= windows[0][1] and (row[4] or row[3]) >= windows[0][0]]
+        print(f"\nRe-parse the CSV for one window: {time.perf_counter() - began:.2f}s ({len(matches)} events)")
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import sys
+import glob
+import time
+import hashlib
+import argparse
+import statistics
+import tracemalloc
+
+# Compares the HTML-to-text backends of html_extract.py on a corpus of saved pages:
+# time per page, throughput, peak Python memory and agreement with the bs4 output.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from html_extract import BACKENDS, available_backends
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+def save_pages(urls, corpus):
+    """Downloads pages into the corpus directory."""
+    from summarize_url import create_session
+    os.makedirs(corpus, exist_ok=True)
+    session = create_session()
+    for url in urls:
+        response = session.get(url, timeout=30)
+        response.raise_for_status()
+        path = os.path.join(corpus, hashlib.sha1(url.encode("utf-8")).hexdigest()[:12] + ".html")
+        with open(path, "wb") as f:
+            f.write(response.content)
+        print(f"Saved {url} -> {path} ({len(response.content)} bytes)")
+
+def synthetic_pages():
+    """Offline stand-in corpus: article pages of increasing size with scripts, nav and styles."""
+    paragraph = "<p>融資餘額是衡量市場槓桿與散戶情緒的重要指標 &amp; margin balance data, " \
+                "<a href='#'>link</a> <b>2025-01-01</b>.</p>\n"
+    chrome = ("<header><div>Site header</div></header><nav><ul>" + "<li><a href='#'>menu</a></li>" * 50 + "</ul></nav>"
+              "<style>body { color: red; }</style><script>var data = {\"a\": \"<p>not text</p>\"};</script>")
+    pages = {}
+    for count in (50, 500, 5000):
+        body = "<article>" + paragraph * count + "</article><!-- comment --><footer>Footer</footer>"
+        html = f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Page {count}</title></head><body>{chrome}{body}</body></html>"
+        pages[f"synthetic-{count}.html"] = html.encode("utf-8")
+    return pages
+
+def load_corpus(corpus):
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(corpus, "*.htm*"))):
+        with open(path, "rb") as f:
+            pages[os.path.basename(path)] = f.read()
+    return pages
+
+def agreement(text, reference):
+    """Share of the reference's lines that the backend also produced."""
+    reference_lines = set(reference.splitlines())
+    if not reference_lines:
+        return 1.0
+    return len(reference_lines & set(text.splitlines())) / len(reference_lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the HTML-to-text backends")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Directory of saved .html pages (synthetic pages are used if empty)")
+    parser.add_argument("--save", nargs="+", metavar="URL", help="Download these pages into the corpus and exit")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per page and backend (the median is reported)")
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.save, args.corpus)
+        return
+
+    pages = load_corpus(args.corpus)
+    if not pages:
+        print(f"No pages in '{args.corpus}'; using the synthetic corpus (save real pages with --save URL ...).")
+        pages = synthetic_pages()
+    total_bytes = sum(len(html) for html in pages.values())
+    backends = available_backends()
+    print(f"{len(pages)} pages, {total_bytes / 1024:.0f} KB; backends: {', '.join(backends)}"
+          f"{'' if 'lxml' in backends else ' (pip install lxml to include lxml)'}\n")
+
+    reference = {}
+    if "bs4" in backends:
+        reference = {name: BACKENDS["bs4"][0](html) for name, html in pages.items()}
+
+    print(f"{'backend':<8} {'page':<28} {'KB':>7} {'median ms':>10} {'MB/s':>8} {'peak KB':>9} {'vs bs4':>7}")
+    for backend in backends:
+        extract = BACKENDS[backend][0]
+        total_seconds = 0.0
+        for name, html in pages.items():
+            times = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                text = extract(html)
+                times.append(time.perf_counter() - start)
+            tracemalloc.start()
+            extract(html)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            median = statistics.median(times)
+            total_seconds += median
+            match = f"{agreement(text, reference[name]):.0%}" if name in reference else "-"
+            print(f"{backend:<8} {name[:28]:<28} {len(html) / 1024:>7.0f} {median * 1000:>10.2f} "
+                  f"{len(html) / median / 1e6:>8.1f} {peak / 1024:>9.0f} {match:>7}")
+        print(f"{backend:<8} {'TOTAL':<28} {total_bytes / 1024:>7.0f} {total_seconds * 1000:>10.2f} "
+              f"{total_bytes / total_seconds / 1e6:>8.1f}\n")
+
+if __name__ == "__main__":
+    main()
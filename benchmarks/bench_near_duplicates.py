@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+import statistics
+
+# Measures the LSH filter of near_duplicates.py: how many indexed events each lookup
+# has to score exactly (candidates) against the events in its date window alone, and
+# how many planted rewordings are still found, for the chosen banding and alternatives.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import near_duplicates
+from near_duplicates import BANDS, NUM_PERM, NearDuplicateIndex
+
+COMPANIES = ["台積電 (2330)", "鴻海 (2317)", "聯發科 (2454)", "廣達 (2382)", "台達電 (2308)", "日月光 (3711)",
+             "聯電 (2303)", "中華電 (2412)", "富邦金 (2881)", "國泰金 (2882)", "大立光 (3008)", "緯創 (3231)",
+             "華碩 (2357)", "瑞昱 (2379)", "南亞科 (2408)", "奇鋐 (3017)", "可成 (2474)", "金像電 (2368)",
+             "世芯 (3661)", "智邦 (2345)", "欣興 (3037)", "英業達 (2356)", "光寶科 (2301)", "和碩 (4938)"]
+COMPANY_EVENTS = ["{} 法說會", "{} 股東常會", "{} 第4季財報發布", "{} 除息交易日", "{} 12月營收公布", "{} 董事會"]
+INDICATORS = ["CPI", "PPI", "PCE", "GDP", "ISM", "PMI", "JOLTS", "ADP"]
+MACRO_EVENTS = ["美國 {} 數據公布", "歐元區 {} 初值", "中國 {} 公布"]
+FIXED_EVENTS = ["FOMC 利率決策會議", "日本央行利率決議", "歐洲央行利率決議", "英國央行利率決議", "台灣央行理監事會",
+                "台股封關日", "MSCI 季度調整生效", "美國非農就業報告", "美國初領失業救濟金人數", "美國零售銷售"]
+
+# (indexed name, reworded name) templates; {} is a company
+REWORDINGS = [("{} 法說會", "{}舉行法說會"), ("{} 第4季財報發布", "{} 2025年第四季度財報發布"),
+              ("{} 股東常會", "{} 2026年股東常會"), ("FOMC 利率決策會議", "聯準會 FOMC 利率決策會議"),
+              ("法人說明會", "TWSE上市公司法人說明會"), ("美國非農就業報告", "美國12月非農就業報告")]
+
+BANDINGS = [(64, 1), (32, 2), (16, 4)]
+
+def event(name, day):
+    return ["經濟數據", "數據發布", name, day.isoformat(), "", "", "", ""]
+
+def synthetic_events(count, days, seed=0):
+    rng = random.Random(seed)
+    names = ([template.format(company) for template in COMPANY_EVENTS for company in COMPANIES]
+             + [template.format(indicator) for template in MACRO_EVENTS for indicator in INDICATORS] + FIXED_EVENTS)
+    first_day = datetime.date(2026, 1, 1)
+    return [event(rng.choice(names), first_day + datetime.timedelta(days=rng.randrange(days))) for _ in range(count)]
+
+def planted_pairs(events, count, seed=1):
+    """(indexed row, reworded row) pairs on days that already hold the synthetic events."""
+    rng = random.Random(seed)
+    pairs = []
+    for _ in range(count):
+        original, reworded = rng.choice(REWORDINGS)
+        company = rng.choice(COMPANIES)
+        day = datetime.date.fromisoformat(rng.choice(events)[3])
+        pairs.append((event(original.format(company), day), event(reworded.format(company), day)))
+    return pairs
+
+def measure(bands, rows_per_band, events, pairs):
+    # The banding is read from the module by band_keys(); the in-memory index is built per banding
+    near_duplicates.BANDS, near_duplicates.ROWS_PER_BAND = bands, rows_per_band
+    with NearDuplicateIndex() as index:
+        for row in events:
+            index.add(row)
+        for original, _ in pairs:
+            index.add(original)
+        window = []
+        candidates = []
+        found = 0
+        times = []
+        for original, reworded in pairs:
+            start = reworded[3]
+            window.append(index.conn.execute("SELECT COUNT(*) FROM events WHERE start_date BETWEEN ? AND ?",
+                                             (near_duplicates.shift_date(start, -index.date_tolerance),
+                                              near_duplicates.shift_date(start, index.date_tolerance))).fetchone()[0])
+            began = time.perf_counter()
+            candidates.append(len(index.candidates(reworded)))
+            match = index.find(reworded)
+            times.append(time.perf_counter() - began)
+            found += match is not None and match[0] == original[2].strip()
+    return statistics.mean(window), statistics.mean(candidates), found / len(pairs), statistics.median(times)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LSH candidate filter of near_duplicates.py")
+    parser.add_argument("--events", type=int, default=20000, help="Synthetic events to index")
+    parser.add_argument("--days", type=int, default=730, help="Days the synthetic events are spread over")
+    parser.add_argument("--lookups", type=int, default=300, help="Planted rewordings to look up")
+    args = parser.parse_args()
+
+    events = synthetic_events(args.events, args.days)
+    pairs = planted_pairs(events, args.lookups)
+    print(f"{args.events} events over {args.days} days, {args.lookups} reworded lookups\n")
+    print(f"{'banding':<12} {'in window':>10} {'candidates':>11} {'recall':>7} {'lookup p50':>11}")
+    for bands, rows_per_band in BANDINGS:
+        if bands * rows_per_band != NUM_PERM:
+            continue
+        in_window, candidates, recall, lookup = measure(bands, rows_per_band, events, pairs)
+        chosen = " (near_duplicates.py)" if bands == BANDS else ""
+        print(f"{bands:>3} x {rows_per_band:<6} {in_window:>10.1f} {candidates:>11.1f} {recall:>7.1%} {lookup * 1000:>8.2f} ms{chosen}")
+
+if __name__ == "__main__":
+    main()
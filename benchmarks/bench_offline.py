@@ -0,0 +1,206 @@
+import os
+import sys
+import csv
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+# Runs every entry point against the local mock server (no network, no API key) and
+# reports throughput, p50/p95 latency and peak memory per scenario.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_gemini_server import MockServer, MockConfig
+from event_csv import EVENT_HEADER
+
+# name -> (command line relative to the repo, mock settings, extra env)
+SCENARIOS = {
+    "genai": (["genai.py"], {}, {}),
+    "genai-warm-cache": (["genai.py"], {}, {"GEMINI_CACHE": "on", "_warmup": "1"}),
+    "genai-batch": (["genai.py", "--batch", "prompts.jsonl", "--concurrency", "8"], {"latency": 0.5}, {"_prompts": "40"}),
+    "list_models": (["list_models.py", "--refresh"], {}, {}),
+    "summarize_url": (["summarize_url.py", "--url", "{mock}/pages/1"], {"page_bytes": 200000}, {}),
+    "summarize_url-long": (["summarize_url.py", "--url", "{mock}/pages/1", "--chunk-tokens", "4000"], {"page_bytes": 400000}, {}),
+    "summarize_url-batch": (["summarize_url.py", "--batch", "urls.txt", "--output", "summaries.jsonl"], {}, {"_urls": "20"}),
+    "summarize_url-batch-unchanged": (["summarize_url.py", "--batch", "urls.txt", "--output", "summaries.jsonl"], {},
+                                      {"_urls": "20", "FETCH_CACHE": "on", "_warmup": "1"}),
+    "stock_events": (["stock_events_poc.py"], {"latency": 0.5}, {}),
+    "stock_events-sharded": (["stock_events_poc.py", "--shard-days", "7"], {"latency": 0.5}, {}),
+    "stock_events-structured": (["stock_events_poc.py", "--structured"], {"latency": 0.5}, {}),
+    "ai_events": (["fetch_ai_events.py"], {"latency": 0.5, "csv_rows": 60}, {}),
+    "ai_events-stream": (["fetch_ai_events.py", "--stream"], {"latency": 0.5, "csv_rows": 60, "chunk_chars": 120}, {}),
+    "crashes": (["fetch_historical_crashes.py"], {"latency": 0.5, "csv_rows": 100}, {}),
+    "crashes-by-decade": (["fetch_historical_crashes.py", "--by-decade"], {"latency": 0.5, "csv_rows": 25}, {}),
+    "crashes-429": (["fetch_historical_crashes.py", "--by-decade"], {"latency": 0.5, "csv_rows": 25, "rate_limit_every": 3}, {}),
+    # The mock refuses contents below gemini-2.5-flash's minimum cacheable size, like the real API
+    "crashes-prefix-cached": (["fetch_historical_crashes.py", "--by-decade", "--by-market"],
+                              {"latency": 0.2, "csv_rows": 25, "prefill_per_1k": 1.0, "min_cache_tokens": 1024}, {}),
+    "crashes-prefix-inline": (["fetch_historical_crashes.py", "--by-decade", "--by-market"], {"latency": 0.2, "csv_rows": 25, "prefill_per_1k": 1.0},
+                              {"GEMINI_CONTEXT_CACHE": "off"}),
+    "check_quota": (["check_quota.py", "--project", "mock-project"], {"metric_pages": 4}, {}),
+    "link_resolver": (["link_resolver.py", "events.csv"], {"latency": 0.05}, {"_links": "300"}),
+}
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_child(cmd, cwd, env):
+    """Runs one entry point; returns (wall seconds, peak RSS in MB or None, exit code, output)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = process.stdout.read().decode("utf-8", "replace")
+    peak = None
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    else:
+        process.wait()
+    return time.perf_counter() - started, peak, process.returncode, output
+
+def call_latencies(telemetry_file):
+    """Per-call wall times (ms) of non-cached Gemini calls from the scenario's telemetry."""
+    latencies = []
+    if os.path.exists(telemetry_file):
+        with open(telemetry_file, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if not entry.get("cached"):
+                    latencies.append(entry["wall_ms"])
+    return latencies
+
+def write_link_csv(path, server_url, rows):
+    """Event CSV whose links are mock grounding-redirect tokens (about a third shared, a few expired)."""
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EVENT_HEADER)
+        for i in range(rows):
+            token = f"{'expired' if i % 50 == 0 else 'AUZIYQ'}{'%06d' % (i * 2 // 3)}" + "x" * 300
+            writer.writerow(["經濟數據", "模擬", f"模擬事件 {i}", "2025-01-01", "", "離線基準測試資料",
+                             f"{server_url}/grounding-api-redirect/{token}", f"{server_url}/grounding-api-redirect/{token}-2"])
+
+def run_scenario(server, name, repeat, verbose=False):
+    argv, settings, extra_env = SCENARIOS[name]
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        env = dict(os.environ)
+        env.update({
+            "GEMINI_API_KEY": "mock",
+            "GEMINI_BASE_URL": server.url,
+            "GOOGLE_API_ENDPOINT_SERVICEUSAGE": server.url + "/",
+            "GCP_PROJECT_ID": "mock-project",
+            "PYTHONPATH": ROOT,
+            "PYTHONIOENCODING": "utf-8",
+            "GEMINI_CACHE": "off",
+            "GEMINI_CACHE_DIR": os.path.join(workdir, "cache"),
+            "FETCH_CACHE": "off",
+            "FETCH_CACHE_FILE": os.path.join(workdir, "fetch_cache.sqlite"),
+            "GEMINI_LEDGER_FILE": os.path.join(workdir, "ledger.json"),
+            "GEMINI_QUOTA_FILE": os.path.join(workdir, "quota_limits.json"),
+            "GEMINI_MODELS_FILE": os.path.join(workdir, "models.json"),
+            "GEMINI_TELEMETRY_FILE": os.path.join(workdir, "telemetry.jsonl"),
+            "GOOGLE_DISCOVERY_CACHE_DIR": os.path.join(workdir, "discovery"),
+            "LINKS_FILE": os.path.join(workdir, "links.sqlite"),
+            "GEMINI_CONTEXT_CACHE_FILE": os.path.join(workdir, "context_cache.json"),
+        })
+        env.pop("GEMINI_PROMETHEUS_FILE", None)
+        env.update({k: v for k, v in extra_env.items() if not k.startswith("_")})
+        if "_urls" in extra_env:
+            with open(os.path.join(workdir, "urls.txt"), "w", encoding="utf-8") as f:
+                f.write("\n".join(f"{server.url}/pages/{i}" for i in range(int(extra_env["_urls"]))) + "\n")
+
+        if "_prompts" in extra_env:
+            with open(os.path.join(workdir, "prompts.jsonl"), "w", encoding="utf-8") as f:
+                # Some items carry their config as a plain dict, as batch files written by hand do
+                configs = [None, {"temperature": 0.2}, {"system_instruction": "Answer in one sentence.", "temperature": 0.2}]
+                f.writelines(json.dumps({"id": f"p{i}", "prompt": f"Question {i}", **({"config": configs[i % 3]} if configs[i % 3] else {})}) + "\n"
+                             for i in range(int(extra_env["_prompts"])))
+        cmd = [sys.executable, os.path.join(ROOT, argv[0])] + [arg.replace("{mock}", server.url) for arg in argv[1:]]
+        server.config = MockConfig(**settings)
+        if "_warmup" in extra_env:
+            run_child(cmd, workdir, env)
+
+        walls, peaks, requests, failures = [], [], 0, 0
+        latencies = []
+        for _ in range(repeat):
+            telemetry_file = env["GEMINI_TELEMETRY_FILE"]
+            if os.path.exists(telemetry_file):
+                os.remove(telemetry_file)
+            if "_links" in extra_env:
+                # Every run starts from unresolved tokens and an empty link table
+                write_link_csv(os.path.join(workdir, "events.csv"), server.url, int(extra_env["_links"]))
+                if os.path.exists(env["LINKS_FILE"]):
+                    os.remove(env["LINKS_FILE"])
+            server.reset_stats()
+            wall, peak, code, output = run_child(cmd, workdir, env)
+            if code != 0 or "error occurred" in output.lower() or "Error fetching" in output or "] FAILED (" in output:
+                failures += 1
+                if verbose:
+                    print(output)
+            walls.append(wall)
+            if peak is not None:
+                peaks.append(peak)
+            requests += sum(count for route, count in server.stats.items() if route != "429")
+            latencies.extend(call_latencies(telemetry_file))
+
+        return {
+            "scenario": name,
+            "runs": repeat,
+            "failures": failures,
+            "wall_p50": statistics.median(walls),
+            "wall_p95": percentile(walls, 0.95),
+            "requests_per_s": requests / sum(walls) if sum(walls) else 0,
+            "call_p50_ms": percentile(latencies, 0.5),
+            "call_p95_ms": percentile(latencies, 0.95),
+            "peak_mb": max(peaks) if peaks else None,
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def fmt(value, pattern):
+    return pattern.format(value) if value is not None else "-".rjust(len(pattern.format(0)))
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against the mock Gemini / Service Usage server")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run (default: all): {', '.join(SCENARIOS)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Print the output of failed runs")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        print(f"Unknown scenario(s): {', '.join(unknown)}")
+        sys.exit(1)
+
+    server = MockServer().start()
+    results = []
+    print(f"{'scenario':<30} {'runs':>4} {'fail':>4} {'wall p50':>9} {'wall p95':>9} {'req/s':>7} {'call p50':>9} {'call p95':>9} {'peak MB':>8}")
+    try:
+        for name in args.scenarios or list(SCENARIOS):
+            result = run_scenario(server, name, args.repeat, args.verbose)
+            results.append(result)
+            print(f"{name:<30} {result['runs']:>4} {result['failures']:>4} {fmt(result['wall_p50'], '{:8.2f}s')} "
+                  f"{fmt(result['wall_p95'], '{:8.2f}s')} {result['requests_per_s']:>7.1f} "
+                  f"{fmt(result['call_p50_ms'], '{:7.0f}ms')} {fmt(result['call_p95_ms'], '{:7.0f}ms')} "
+                  f"{fmt(result['peak_mb'], '{:8.1f}')}")
+    finally:
+        server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+
+# Measures cold-start cost of `--help` for every gemini_cli.py subcommand (and the
+# matching standalone script) and breaks it down with `python -X importtime`.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gemini_cli import SUBCOMMANDS
+
+# Modules whose presence in a `--help` run means a heavy import leaked to module level
+HEAVY_MODULES = ("google.genai", "googleapiclient", "bs4", "dotenv", "pydantic", "requests")
+
+def run(cmd):
+    """Runs cmd once under -X importtime; returns (wall seconds, importtime stderr)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime"] + cmd, cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, result.stderr
+
+def parse_importtime(stderr):
+    """Returns {module: cumulative microseconds} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [part.strip() for part in line[len("import time:"):].split("|")]
+        if len(parts) != 3 or not parts[1].isdigit():
+            continue
+        modules[parts[2].strip()] = int(parts[1])
+    return modules
+
+def measure(cmd, repeat):
+    times = []
+    modules = {}
+    for _ in range(repeat):
+        elapsed, stderr = run(cmd)
+        times.append(elapsed)
+        modules = parse_importtime(stderr)
+    return statistics.median(times), modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold-start time of the CLI subcommands")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per command (the median is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest top-level imports to list per command")
+    parser.add_argument("--only", choices=list(SUBCOMMANDS), help="Benchmark a single subcommand")
+    args = parser.parse_args()
+
+    names = [args.only] if args.only else list(SUBCOMMANDS)
+    print(f"{'command':<40} {'median':>9} {'imports':>8}  heavy imports")
+    for name in names:
+        script = SUBCOMMANDS[name][0] + ".py"
+        for label, cmd in ((f"gemini_cli.py {name} --help", ["gemini_cli.py", name, "--help"]),
+                           (f"{script} --help", [script, "--help"])):
+            median, modules = measure(cmd, args.repeat)
+            heavy = sorted({m for m in modules for h in HEAVY_MODULES if m == h or m.startswith(h + ".")})
+            heavy_roots = sorted({h for h in HEAVY_MODULES if any(m == h or m.startswith(h + ".") for m in heavy)})
+            print(f"{label:<40} {median * 1000:>7.1f}ms {len(modules):>8}  {', '.join(heavy_roots) or '-'}")
+            top = sorted(((us, m) for m, us in modules.items() if "." not in m), reverse=True)[:args.top]
+            for us, module in top:
+                print(f"    {us / 1000:>8.1f}ms  {module}")
+
+if __name__ == "__main__":
+    main()
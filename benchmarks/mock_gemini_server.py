@@ -0,0 +1,442 @@
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Local stand-in for the Gemini API (generateContent, streamGenerateContent, models, cachedContents)
+# and the Service Usage API (services.get, consumerQuotaMetrics.list), plus plain
+# HTML pages for summarize_url.py and grounding-redirect tokens for link_resolver.py.
+# Point the scripts at it with:
+#   GEMINI_BASE_URL=http://127.0.0.1:PORT  GOOGLE_API_ENDPOINT_SERVICEUSAGE=http://127.0.0.1:PORT/
+
+MODELS = [
+    ("gemini-2.5-flash", "Gemini 2.5 Flash", 1048576, 65536, True),
+    ("gemini-2.5-flash-lite", "Gemini 2.5 Flash-Lite", 1048576, 65536, True),
+    ("gemini-2.5-pro", "Gemini 2.5 Pro", 1048576, 65536, True),
+    ("gemini-2.0-flash", "Gemini 2.0 Flash", 1048576, 8192, False),
+    ("gemini-3-pro-preview", "Gemini 3 Pro Preview", 1048576, 65536, True),
+    ("text-embedding-004", "Text Embedding 004", 2048, 1, False),
+]
+
+CSV_HEADER = '"類別","子類別","事件名稱","開始日期","結束日期","備註","Link1","Link2"'
+
+class MockConfig:
+    """Behaviour of the mock server; swap `server.config` between benchmark scenarios."""
+
+    def __init__(self, latency=0.05, jitter=0.0, output_tokens=None, thought_tokens=0, chunk_chars=200,
+                 chunk_delay=0.01, rate_limit_every=0, retry_delay=0.05, csv_rows=20, grounding_queries=2,
+                 page_bytes=20000, metric_pages=3, prefill_per_1k=0.0, context_cache=True, min_cache_tokens=0, seed=0):
+        self.latency = latency                      # Seconds before a response (or its first chunk)
+        self.jitter = jitter                        # Extra uniform random latency, seconds
+        self.output_tokens = output_tokens          # Reported candidate tokens (default: len(text) / 4)
+        self.thought_tokens = thought_tokens        # Reported thought tokens
+        self.chunk_chars = chunk_chars              # Characters per streamed chunk
+        self.chunk_delay = chunk_delay              # Seconds between streamed chunks
+        self.rate_limit_every = rate_limit_every    # Answer every Nth generate request with 429 (0: never)
+        self.retry_delay = retry_delay              # retryDelay sent with injected 429s, seconds
+        self.csv_rows = csv_rows                    # Rows in canned CSV / JSON event payloads
+        self.grounding_queries = grounding_queries  # webSearchQueries reported for grounded requests
+        self.page_bytes = page_bytes                # Size of the HTML served under /pages/
+        self.metric_pages = metric_pages            # Pages of consumer quota metrics
+        self.prefill_per_1k = prefill_per_1k        # Extra seconds before the first token per 1000 uncached prompt tokens
+        self.context_cache = context_cache          # Serve the cachedContents API (False: 404, like an unsupported endpoint)
+        self.min_cache_tokens = min_cache_tokens    # Refuse to cache smaller contents with 400, like the real minimum
+        self.random = random.Random(seed)
+
+def prompt_text(body):
+    texts = []
+    for content in body.get("contents", []) + [body.get("systemInstruction") or {}]:
+        for part in content.get("parts", []):
+            texts.append(part.get("text", ""))
+    return "\n".join(texts)
+
+def token_count(text):
+    return max(1, len(text) // 4)
+
+def base_date(prompt):
+    """Anchors canned events inside the period the prompt asks about."""
+    match = re.search(r"between (\d{4})", prompt) or re.search(r"\b(\d{4}-\d{2}-\d{2})\b", prompt) \
+        or re.search(r"\b((?:19|20)\d{2})\b", prompt)
+    value = match.group(1) if match else "2025-01-01"
+    if len(value) == 4:
+        value += "-01-01"
+    return datetime.date.fromisoformat(value)
+
+def canned_events(prompt, count):
+    """Deterministic event records; names are unique per prompt so shards don't collapse on dedup."""
+    tag = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:6]
+    start = base_date(prompt)
+    events = []
+    for i in range(count):
+        day = start + datetime.timedelta(days=7 * i)
+        events.append({
+            "category": "經濟數據",
+            "subcategory": "模擬",
+            "name": f"模擬事件 {tag}-{i}",
+            "start_date": day.isoformat(),
+            "end_date": "",
+            "note": "離線基準測試資料",
+            "link1": f"https://example.com/{tag}/{i}",
+            "link2": "",
+        })
+    return events
+
+def canned_text(body, config):
+    prompt = prompt_text(body)
+    generation_config = body.get("generationConfig", {})
+    if generation_config.get("responseMimeType") == "application/json":
+        return json.dumps(canned_events(prompt, config.csv_rows), ensure_ascii=False)
+    if "CSV" in prompt:
+        rows = [",".join(f'"{value}"' for value in event.values()) for event in canned_events(prompt, config.csv_rows)]
+        return "\n".join([CSV_HEADER] + rows)
+    words = max(50, (config.output_tokens or 400) * 3 // 4)
+    return " ".join(f"模擬摘要{i % 10}" if i % 7 == 0 else "lorem" for i in range(words))
+
+def response_json(text, body, config, final=True, cached_tokens=0):
+    prompt = prompt_text(body)
+    response = {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}],
+        "modelVersion": "mock-001",
+    }
+    if final:
+        response["candidates"][0]["finishReason"] = "STOP"
+        candidate_tokens = config.output_tokens or max(1, len(text) // 4)
+        prompt_tokens = token_count(prompt)
+        response["usageMetadata"] = {
+            "promptTokenCount": prompt_tokens,
+            "candidatesTokenCount": candidate_tokens,
+            "thoughtsTokenCount": config.thought_tokens,
+            "totalTokenCount": prompt_tokens + candidate_tokens + config.thought_tokens,
+        }
+        if cached_tokens:
+            response["usageMetadata"]["cachedContentTokenCount"] = cached_tokens
+        if body.get("tools") and config.grounding_queries:
+            response["candidates"][0]["groundingMetadata"] = {
+                "webSearchQueries": [f"query {i}" for i in range(config.grounding_queries)]
+            }
+    return response
+
+def model_json(name, display_name, input_limit, output_limit, thinking):
+    methods = ["embedContent"] if "embedding" in name else ["generateContent", "countTokens"]
+    return {"name": f"models/{name}", "displayName": display_name, "version": "001",
+            "inputTokenLimit": input_limit, "outputTokenLimit": output_limit,
+            "supportedGenerationMethods": methods, "thinking": thinking}
+
+def quota_metrics():
+    metrics = []
+    for name, _, _, _, _ in MODELS[:4]:
+        for metric_id, limit in (("generate_content_free_tier_requests", 10),
+                                 ("generate_content_free_tier_requests_per_day", 250),
+                                 ("generate_content_free_tier_input_token_count", 250000)):
+            metrics.append({
+                "name": f"projects/mock/services/generativelanguage.googleapis.com/consumerQuotaMetrics/{metric_id}",
+                "consumerQuotaLimits": [{"quotaBuckets": [{"effectiveLimit": str(limit), "dimensions": {"model": name}}]}],
+            })
+    return metrics
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def config(self):
+        return self.server.config
+
+    def _count(self, route):
+        with self.server.lock:
+            self.server.stats[route] = self.server.stats.get(route, 0) + 1
+            return self.server.stats[route]
+
+    def _wait(self):
+        time.sleep(self.config.latency + (self.config.random.uniform(0, self.config.jitter) if self.config.jitter else 0))
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _rate_limited(self):
+        every = self.config.rate_limit_every
+        with self.server.lock:
+            self.server.generate_requests += 1
+            limited = bool(every) and self.server.generate_requests % every == 0
+        if limited:
+            self._count("429")
+            self._send_json({"error": {
+                "code": 429, "status": "RESOURCE_EXHAUSTED", "message": "Mock quota exceeded.",
+                "details": [{"@type": "type.googleapis.com/google.rpc.RetryInfo", "retryDelay": f"{self.config.retry_delay}s"}],
+            }}, status=429)
+        return limited
+
+    def _expand_cached(self, body):
+        """
+        Merges the cached content a request references into it. Returns (body, cached
+        tokens), or (None, 0) after answering 404 for an unknown or expired cache.
+        """
+        name = body.get("cachedContent")
+        if not name:
+            return body, 0
+        with self.server.lock:
+            cached = self.server.cached_contents.get(name)
+        if cached is None or cached["expire"] < time.time():
+            self._send_json({"error": {"code": 404, "status": "NOT_FOUND",
+                                       "message": "CachedContent not found (or permission denied)"}}, status=404)
+            return None, 0
+        body = dict(body)
+        for field in ("systemInstruction", "tools", "toolConfig"):
+            if field in cached["body"]:
+                body[field] = cached["body"][field]
+        body["contents"] = cached["body"].get("contents", []) + body.get("contents", [])
+        return body, cached["tokens"]
+
+    def _prefill(self, body, cached_tokens):
+        """Sleeps in proportion to the prompt tokens that were not served from a cache."""
+        if self.config.prefill_per_1k:
+            time.sleep(max(0, token_count(prompt_text(body)) - cached_tokens) / 1000 * self.config.prefill_per_1k)
+
+    def _cached_content_json(self, name):
+        cached = self.server.cached_contents[name]
+        expire = datetime.datetime.fromtimestamp(cached["expire"], datetime.timezone.utc)
+        return {"name": name, "model": cached["body"].get("model"), "displayName": cached["body"].get("displayName", ""),
+                "expireTime": expire.isoformat().replace("+00:00", "Z"), "usageMetadata": {"totalTokenCount": cached["tokens"]}}
+
+    def do_DELETE(self):
+        path = urlparse(self.path).path
+        name = path[path.find("cachedContents/"):]
+        with self.server.lock:
+            found = self.server.cached_contents.pop(name, None)
+        if found is None:
+            self._send_json({"error": {"code": 404, "status": "NOT_FOUND", "message": f"{name} not found"}}, status=404)
+        else:
+            self._count("cachedContents.delete")
+            self._send_json({})
+
+    def _grounding_redirect(self, token):
+        """302 to a stable fake publisher URL per token; tokens starting with "expired" are 404s."""
+        self._count("redirect")
+        self._wait()
+        if token.startswith("expired"):
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        digest = hashlib.sha1(token.encode("utf-8")).hexdigest()
+        self.send_response(302)
+        self.send_header("Location", f"https://publisher{int(digest[:2], 16) % 5}.example.com/news/{digest[:12]}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        path = urlparse(self.path).path
+        if path.startswith("/grounding-api-redirect/"):
+            self._grounding_redirect(path.split("/grounding-api-redirect/", 1)[1])
+            return
+        self.send_response(405)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        query = parse_qs(url.query)
+
+        if path.startswith("/grounding-api-redirect/"):
+            self._grounding_redirect(path.split("/grounding-api-redirect/", 1)[1])
+            return
+
+        if path.startswith("/pages/"):
+            self._count("page")
+            self._wait()
+            paragraph = "<p>" + "市場資料 lorem ipsum dolor sit amet. " * 20 + "</p>\n"
+            html = "<html><head><title>Mock page</title><script>var x = 1;</script></head><body><nav>menu</nav>\n"
+            html += paragraph * max(1, self.config.page_bytes // len(paragraph.encode("utf-8"))) + "</body></html>"
+            data = html.encode("utf-8")
+            etag = '"' + hashlib.md5(data).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self._count("page.304")
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        if "/cachedContents/" in path and self.config.context_cache:
+            name = path[path.find("cachedContents/"):]
+            with self.server.lock:
+                if name in self.server.cached_contents and self.server.cached_contents[name]["expire"] >= time.time():
+                    self._send_json(self._cached_content_json(name))
+                    return
+            self._send_json({"error": {"code": 404, "status": "NOT_FOUND", "message": f"{name} not found"}}, status=404)
+            return
+
+        if path.endswith("/models"):
+            self._count("models.list")
+            self._wait()
+            page_size = int(query.get("pageSize", ["3"])[0] or 3)
+            offset = int(query.get("pageToken", ["0"])[0] or 0)
+            page = [model_json(*model) for model in MODELS[offset:offset + page_size]]
+            payload = {"models": page}
+            if offset + page_size < len(MODELS):
+                payload["nextPageToken"] = str(offset + page_size)
+            self._send_json(payload)
+            return
+
+        match = re.search(r"/models/([^/:]+)$", path)
+        if match:
+            self._count("models.get")
+            self._wait()
+            for model in MODELS:
+                if model[0] == match.group(1):
+                    self._send_json(model_json(*model))
+                    return
+            self._send_json({"error": {"code": 404, "status": "NOT_FOUND", "message": "Unknown model."}}, status=404)
+            return
+
+        if path.endswith("/consumerQuotaMetrics"):
+            self._count("quota.metrics")
+            self._wait()
+            metrics = quota_metrics()
+            pages = max(1, self.config.metric_pages)
+            per_page = -(-len(metrics) // pages)
+            offset = int(query.get("pageToken", ["0"])[0] or 0)
+            payload = {"metrics": metrics[offset:offset + per_page]}
+            if offset + per_page < len(metrics):
+                payload["nextPageToken"] = str(offset + per_page)
+            self._send_json(payload)
+            return
+
+        if re.search(r"/v1beta1/projects/[^/]+/services/[^/]+$", path):
+            self._count("services.get")
+            self._wait()
+            self._send_json({"name": path.split("/v1beta1/")[-1], "state": "ENABLED"})
+            return
+
+        self._send_json({"error": {"code": 404, "status": "NOT_FOUND", "message": f"No mock for {path}"}}, status=404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+
+        if url.path.endswith("/cachedContents") and self.config.context_cache:
+            self._count("cachedContents.create")
+            self._wait()
+            tokens = token_count(prompt_text(body))
+            if tokens < self.config.min_cache_tokens:
+                self._send_json({"error": {"code": 400, "status": "INVALID_ARGUMENT", "message":
+                                           f"Cached content is too small. total_token_count={tokens}, min_total_token_count={self.config.min_cache_tokens}"}},
+                                status=400)
+                return
+            ttl = float(str(body.get("ttl", "3600s")).rstrip("s"))
+            with self.server.lock:
+                name = f"cachedContents/mock{len(self.server.cached_contents) + 1:04d}{random.randrange(16 ** 6):06x}"
+                self.server.cached_contents[name] = {"body": body, "tokens": tokens, "expire": time.time() + ttl}
+                payload = self._cached_content_json(name)
+            self._send_json(payload)
+            return
+
+        if url.path.endswith(":generateContent"):
+            self._count("generateContent")
+            self._wait()
+            if self._rate_limited():
+                return
+            body, cached_tokens = self._expand_cached(body)
+            if body is None:
+                return
+            self._prefill(body, cached_tokens)
+            self._send_json(response_json(canned_text(body, self.config), body, self.config, cached_tokens=cached_tokens))
+            return
+
+        if url.path.endswith(":countTokens"):
+            self._count("countTokens")
+            self._wait()
+            prompt = prompt_text(body)
+            self._send_json({"totalTokens": max(1, len(prompt.encode("utf-8")) // 3)})
+            return
+
+        if url.path.endswith(":streamGenerateContent"):
+            self._count("streamGenerateContent")
+            self._wait()
+            if self._rate_limited():
+                return
+            body, cached_tokens = self._expand_cached(body)
+            if body is None:
+                return
+            self._prefill(body, cached_tokens)
+            text = canned_text(body, self.config)
+            size = max(1, self.config.chunk_chars)
+            chunks = [text[i:i + size] for i in range(0, len(text), size)] or [""]
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(self.config.chunk_delay)
+                event = response_json(chunk, body, self.config, final=i == len(chunks) - 1, cached_tokens=cached_tokens)
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+            self.close_connection = True
+            return
+
+        self._send_json({"error": {"code": 404, "status": "NOT_FOUND", "message": f"No mock for {url.path}"}}, status=404)
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, config=None):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.config = config or MockConfig()
+        self.lock = threading.Lock()
+        self.cached_contents = {}
+        self.reset_stats()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {}
+            self.generate_requests = 0
+
+    def start(self):
+        """Serves in a background thread; returns self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the mock Gemini / Service Usage server")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds before each response")
+    parser.add_argument("--chunk-chars", type=int, default=200, help="Characters per streamed chunk")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="Answer every Nth generate request with 429")
+    parser.add_argument("--csv-rows", type=int, default=20, help="Rows in canned event payloads")
+    parser.add_argument("--prefill-per-1k", type=float, default=0.0, help="Extra seconds before the first token per 1000 uncached prompt tokens")
+    parser.add_argument("--min-cache-tokens", type=int, default=0, help="Refuse cachedContents smaller than this many tokens")
+    args = parser.parse_args()
+
+    server = MockServer(args.port, MockConfig(latency=args.latency, chunk_chars=args.chunk_chars,
+                                              rate_limit_every=args.rate_limit_every, csv_rows=args.csv_rows,
+                                              prefill_per_1k=args.prefill_per_1k, min_cache_tokens=args.min_cache_tokens))
+    print(f"Mock server on {server.url}")
+    print(f"  GEMINI_BASE_URL={server.url}  GOOGLE_API_ENDPOINT_SERVICEUSAGE={server.url}/  GEMINI_API_KEY=mock")
+    server.serve_forever()
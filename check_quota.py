@@ -1,19 +1,26 @@
 import os
 import sys
-import datetime # Import datetime
-from dotenv import load_dotenv # Import load_dotenv
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from readme_writer import update_readme
+from rate_limiter import save_limits, DEFAULT_LIMITS_FILE
+from gemini_client import load_env
+from discovery_cache import build_service
+from quota_history import QuotaHistory, DEFAULT_HISTORY_FILE, format_changes
 
-# Load environment variables from .env file
-load_dotenv()
+GEMINI_SERVICE = "generativelanguage.googleapis.com"
 
-# Try to import required libraries
-try:
-    from googleapiclient.discovery import build
-    from google import auth
-except ImportError:
-    print("Error: Missing required libraries.")
-    print("Please install them using: pip install google-api-python-client google-auth")
-    sys.exit(1)
+def import_google_clients():
+    """Imports the Google API client libraries on first use (they are slow to import)."""
+    # Try to import required libraries
+    try:
+        from googleapiclient.discovery import build
+        from google import auth
+    except ImportError:
+        print("Error: Missing required libraries.")
+        print("Please install them using: pip install google-api-python-client google-auth")
+        sys.exit(1)
+    return build, auth
 
 def get_project_id():
     """Attempts to retrieve the Google Cloud Project ID."""
@@ -23,6 +30,7 @@ def get_project_id():
         return project_id
     
     # 2. Try to get from default credentials
+    _, auth = import_google_clients()
     try:
         _, project_id = auth.default()
         if project_id:
@@ -32,60 +40,92 @@ def get_project_id():
 
     return None
 
-import argparse
+def iter_quota_metrics(service, parent):
+    """Yields consumer quota metrics page by page, following nextPageToken."""
+    metrics_api = service.services().consumerQuotaMetrics()
+    request = metrics_api.list(parent=parent)
+    while request is not None:
+        response = request.execute()
+        yield from response.get('metrics', [])
+        request = metrics_api.list_next(previous_request=request, previous_response=response)
 
-def update_readme(content, start_marker, end_marker):
-    """Updates the README.md file between specific markers."""
-    readme_path = "README.md"
-    try:
-        with open(readme_path, "r", encoding="utf-8") as f:
-            readme_content = f.read()
-        
-        start_pos = readme_content.find(start_marker)
-        end_pos = readme_content.find(end_marker)
-        
-        if start_pos == -1 or end_pos == -1:
-            print(f"Warning: Markers {start_marker} and {end_marker} not found in {readme_path}")
-            return
+def add_metric_limits(limits_by_model, metric):
+    """Folds one consumer quota metric into the per-model RPM/RPD/TPM table."""
+    metric_full_name = metric.get('name', '')
+    metric_id = metric_full_name.split('/')[-1] # e.g. "generate_content_free_tier_requests"
 
-        # Generate timestamp
-        now = datetime.datetime.now()
-        timestamp_str = now.strftime("產生時間: %Y-%m-%d %H:%M:%S") + " CST"
+    # Filter for relevant generative metrics
+    if not (("generate_content" in metric_id or "generate_requests" in metric_id) and
+            ("requests" in metric_id or "token_count" in metric_id or "tokens" in metric_id)):
+        return
 
+    limit_type = ""
+    if "per_day" in metric_id:
+        limit_type = "Requests per Day"
+    elif "token_count" in metric_id or "tokens" in metric_id:
+        limit_type = "Tokens per Minute"
+    elif "requests" in metric_id:
+        limit_type = "Requests per Minute"
+    else:
+        return # Should not happen with current filter
 
-        new_content = (
-            readme_content[:start_pos + len(start_marker)]
-            + f"\n{timestamp_str}\n\n```text\n" + content + "\n```\n" # Add timestamp here
-            + readme_content[end_pos:]
-        )
-        
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_content)
+    for limit in metric.get('consumerQuotaLimits', []):
+        for bucket in limit.get('quotaBuckets', []):
+            effective_limit = bucket.get('effectiveLimit', 'N/A')
+            dims = bucket.get('dimensions', {})
+            model_name = dims.get('model', 'Global')
+
+            if effective_limit == -1: # -1 often means unlimited
+                effective_limit = "Unlimited"
             
-        print(f"Successfully updated {readme_path}")
-        
-    except Exception as e:
-        print(f"Error updating README: {e}")
+            if effective_limit == 'N/A':
+                continue # Skip entries with no effective limit
+
+            if model_name not in limits_by_model:
+                limits_by_model[model_name] = {}
+            
+            # Store the most restrictive (lowest) limit if multiple apply for a type
+            current_limit = limits_by_model[model_name].get(limit_type)
+            if current_limit is None or (isinstance(current_limit, (int, float)) and isinstance(effective_limit, (int, float)) and effective_limit < current_limit):
+                limits_by_model[model_name][limit_type] = effective_limit
+            elif isinstance(effective_limit, str) and effective_limit == "Unlimited" and current_limit != "Unlimited":
+                # "Unlimited" is always preferred over a number
+                limits_by_model[model_name][limit_type] = effective_limit
+            elif current_limit == "Unlimited" and isinstance(effective_limit, (int, float)):
+                # If current is unlimited, and new is a number, keep unlimited
+                pass # Do nothing
+            elif current_limit is None: # First entry
+                 limits_by_model[model_name][limit_type] = effective_limit
 
-def check_quota(project_id, update_readme_flag=False):
+def check_quota(project_id, update_readme_flag=False, limits_file=DEFAULT_LIMITS_FILE,
+                service_name=GEMINI_SERVICE, echo=True, history_file=DEFAULT_HISTORY_FILE):
     """
-    Fetches and displays the quota for the Generative Language API using the Service Usage API v1beta1.
+    Fetches and displays the quota for a service (the Generative Language API by default)
+    using the Service Usage API v1beta1.
+
+    Limits are appended to the quota history, and the README is only updated when an
+    effective limit changed since the last snapshot.
+
+    Returns the report lines. With echo=False nothing is printed, so several
+    projects can be checked concurrently and their reports printed whole.
     """
-    print(f"Checking quotas for Project ID: {project_id}...")
-    
     output_buffer = []
     
     def log(message):
-        print(message)
+        if echo:
+            print(message)
         output_buffer.append(message)
 
+    if echo:
+        print(f"Checking quotas for Project ID: {project_id}...")
+
     try:
         # Build the Service Usage API client
         # We need v1beta1 to access consumerQuotaMetrics nicely or we can use serviceusage v1
         # Let's try the 'serviceusage' API (v1beta1 often exposes more details for quotas)
-        service = build('serviceusage', 'v1beta1')
+        import_google_clients()
+        service = build_service('serviceusage', 'v1beta1')
         
-        service_name = "generativelanguage.googleapis.com"
         parent = f"projects/{project_id}/services/{service_name}"
 
         # 1. Check State
@@ -94,63 +134,35 @@ def check_quota(project_id, update_readme_flag=False):
         
         if response.get('state') != 'ENABLED':
             log(f"Service '{service_name}' is NOT ENABLED for this project.")
-            return
+            return output_buffer
             
         log(f"Service '{service_name}' is ENABLED. Fetching consumer quota metrics...")
 
-        request = service.services().consumerQuotaMetrics().list(parent=parent)
-        response = request.execute()
-        
-        metrics = response.get('metrics', [])
-        
+        # Metrics are folded into the table page by page as they arrive
         limits_by_model = {}
+        metric_count = 0
+        for metric in iter_quota_metrics(service, parent):
+            metric_count += 1
+            add_metric_limits(limits_by_model, metric)
+        if echo:
+            print(f"Processed {metric_count} metrics.")
+
+        # Persist the table so rate_limiter.py can enforce it on every Gemini call
+        if limits_file:
+            save_limits(limits_by_model, project_id, limits_file)
+            if echo:
+                print(f"Saved limits for {len(limits_by_model)} models to '{limits_file}'.")
 
-        for metric in metrics:
-            metric_full_name = metric.get('name', '')
-            metric_id = metric_full_name.split('/')[-1] # e.g. "generate_content_free_tier_requests"
-
-            # Filter for relevant generative metrics
-            if not (("generate_content" in metric_id or "generate_requests" in metric_id) and
-                    ("requests" in metric_id or "token_count" in metric_id or "tokens" in metric_id)):
-                continue
-
-            limit_type = ""
-            if "per_day" in metric_id:
-                limit_type = "Requests per Day"
-            elif "token_count" in metric_id or "tokens" in metric_id:
-                limit_type = "Tokens per Minute"
-            elif "requests" in metric_id:
-                limit_type = "Requests per Minute"
-            else:
-                continue # Should not happen with current filter
-
-            for limit in metric.get('consumerQuotaLimits', []):
-                for bucket in limit.get('quotaBuckets', []):
-                    effective_limit = bucket.get('effectiveLimit', 'N/A')
-                    dims = bucket.get('dimensions', {})
-                    model_name = dims.get('model', 'Global')
-
-                    if effective_limit == -1: # -1 often means unlimited
-                        effective_limit = "Unlimited"
-                    
-                    if effective_limit == 'N/A':
-                        continue # Skip entries with no effective limit
-
-                    if model_name not in limits_by_model:
-                        limits_by_model[model_name] = {}
-                    
-                    # Store the most restrictive (lowest) limit if multiple apply for a type
-                    current_limit = limits_by_model[model_name].get(limit_type)
-                    if current_limit is None or (isinstance(current_limit, (int, float)) and isinstance(effective_limit, (int, float)) and effective_limit < current_limit):
-                        limits_by_model[model_name][limit_type] = effective_limit
-                    elif isinstance(effective_limit, str) and effective_limit == "Unlimited" and current_limit != "Unlimited":
-                        # "Unlimited" is always preferred over a number
-                        limits_by_model[model_name][limit_type] = effective_limit
-                    elif current_limit == "Unlimited" and isinstance(effective_limit, (int, float)):
-                        # If current is unlimited, and new is a number, keep unlimited
-                        pass # Do nothing
-                    elif current_limit is None: # First entry
-                         limits_by_model[model_name][limit_type] = effective_limit
+        # Record the snapshot; only changed limits are appended
+        changes = None
+        if history_file and service_name == GEMINI_SERVICE:
+            changes = QuotaHistory(history_file).record(project_id, limits_by_model)
+            if echo:
+                if changes:
+                    print(f"{len(changes)} limit(s) changed since the last snapshot:")
+                    print("\n".join(format_changes(changes)))
+                else:
+                    print("No limit changes since the last snapshot.")
 
         # Define the specific models we want to see in the table
         target_models = [
@@ -190,7 +202,9 @@ def check_quota(project_id, update_readme_flag=False):
         log("RPM = Requests Per Minute, RPD = Requests Per Day, TPM = Tokens Per Minute")
         log("'-' means no specific limit found (or unlimited if not explicitly set to -1).")
 
-        if update_readme_flag:
+        if update_readme_flag and changes == []:
+            print("Skipping README update: no effective limit changed.")
+        elif update_readme_flag:
              full_output = "\n".join(output_buffer)
              # Remove the initial "Checking quotas..." and "Service ENABLED" logs for cleaner README
              clean_output = "\n".join(output_buffer[2:]) 
@@ -203,19 +217,59 @@ def check_quota(project_id, update_readme_flag=False):
         log("2. Ensure your account has 'Service Usage Consumer' role.")
         log("3. Ensure the Project ID is correct.")
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Check Gemini API Quotas")
+    return output_buffer
+
+def check_quotas(targets, update_readme_flag=False, limits_file=DEFAULT_LIMITS_FILE, workers=4,
+                 history_file=DEFAULT_HISTORY_FILE):
+    """
+    Checks several (project_id, service_name) pairs concurrently, printing each report
+    as it completes. The limits file and README only reflect the first target.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {}
+        for index, (project_id, service_name) in enumerate(targets):
+            primary = index == 0
+            future = executor.submit(check_quota, project_id,
+                                     update_readme_flag and primary,
+                                     limits_file if primary and service_name == GEMINI_SERVICE else None,
+                                     service_name, False, history_file)
+            futures[future] = (project_id, service_name)
+        for future in as_completed(futures):
+            project_id, service_name = futures[future]
+            print(f"\n=== {project_id} / {service_name} ===")
+            print("\n".join(future.result()))
+
+def add_arguments(parser):
     parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
-    args = parser.parse_args()
+    parser.add_argument("--limits-file", default=DEFAULT_LIMITS_FILE, help="Where to save the limits table used by the rate limiter")
+    parser.add_argument("--history-file", default=DEFAULT_HISTORY_FILE, help="Append-only quota snapshot history (only changed limits are written)")
+    parser.add_argument("--project", action="append", help="Project ID to check (repeatable; default: GCP_PROJECT_ID or ADC)")
+    parser.add_argument("--service", action="append", help=f"Service to check (repeatable; default: {GEMINI_SERVICE})")
+    parser.add_argument("--workers", type=int, default=4, help="Projects/services checked concurrently")
+
+def main(args):
+    # Load environment variables from .env file
+    load_env()
 
     print("--- Gemini API Quota Checker (Discovery) ---")
     
     # Prerequisite Check
-    proj_id = get_project_id()
+    project_ids = args.project or [get_project_id()]
     
-    if not proj_id:
+    if not all(project_ids):
         print("Could not automatically determine Google Cloud Project ID.")
         print("Please set the 'GCP_PROJECT_ID' environment variable.")
         sys.exit(1)
-        
-    check_quota(proj_id, args.update_readme)
\ No newline at end of file
+
+    services = args.service or [GEMINI_SERVICE]
+    targets = [(project_id, service_name) for project_id in project_ids for service_name in services]
+    if len(targets) == 1:
+        check_quota(project_ids[0], args.update_readme, args.limits_file, services[0],
+                    history_file=args.history_file)
+    else:
+        check_quotas(targets, args.update_readme, args.limits_file, args.workers, args.history_file)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check Gemini API Quotas")
+    add_arguments(parser)
+    main(parser.parse_args())
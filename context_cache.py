@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import tempfile
+import threading
+from response_cache import _to_jsonable
+
+DEFAULT_STATE_FILE = ".gemini_context_cache.json"
+DEFAULT_TTL = 60 * 60 # 1 hour
+
+# A cache this close to its expiry is replaced rather than used, so a request never races the expiry
+EXPIRY_MARGIN = 60
+
+# After the API refused an upload, the prefix is sent inline for this long before trying again
+FAILURE_BACKOFF = 24 * 60 * 60
+
+# After a rate limit (429), server error or network error, the upload is tried again this much later
+RETRY_BACKOFF = 60
+
+# Smallest prefix (in tokens) each model family accepts as cached content; prefixes below
+# it are sent inline without trying an upload that is bound to fail. The longest
+# matching prefix of the model name wins. GEMINI_CONTEXT_CACHE_MIN_TOKENS overrides it.
+MIN_CACHE_TOKENS = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.5-pro": 4096,
+}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+
+# Config fields held by the cached content; a request that references it may not set them itself
+CACHED_FIELDS = ("system_instruction", "tools", "tool_config")
+
+def as_config(config):
+    """
+    Returns `config` as a GenerateContentConfig: a plain dict (e.g. a genai.py batch
+    item's "config") is validated into one, anything else without the SDK's config
+    fields gives None.
+    """
+    if isinstance(config, dict):
+        from google.genai import types
+        return types.GenerateContentConfig.model_validate(config)
+    return config if hasattr(config, "system_instruction") else None
+
+def min_cache_tokens(model):
+    """Returns the smallest prefix size `model` can cache."""
+    if os.environ.get("GEMINI_CONTEXT_CACHE_MIN_TOKENS"):
+        return int(os.environ["GEMINI_CONTEXT_CACHE_MIN_TOKENS"])
+    name = model.split("/")[-1]
+    matches = [family for family in MIN_CACHE_TOKENS if name.startswith(family)]
+    return MIN_CACHE_TOKENS[max(matches, key=len)] if matches else DEFAULT_MIN_CACHE_TOKENS
+
+def is_missing_cache_error(error):
+    """Returns True when a request failed because its cached content expired or was deleted."""
+    return getattr(error, "code", None) in (400, 403, 404) and "cachedcontent" in str(error).lower().replace(" ", "")
+
+class ContextCache:
+    """
+    Explicit context caching for large static prompt prefixes.
+
+    A request whose config carries a system_instruction has that prefix (with the tools
+    it is used with) uploaded once as cached content; later requests reference it by
+    name instead of resending it. Handles are kept in a JSON state file so later runs
+    reuse a cache until it expires, after which a new one is created. A prefix below the
+    model's minimum cacheable size is sent inline without trying, as is one whose upload
+    was refused (a model or local stand-in without the cachedContents API).
+    """
+
+    def __init__(self, path=None, ttl=None):
+        self._path = path
+        self._ttl = ttl
+        # Guards the state file; each prefix's upload holds only its own lock in _upload_locks
+        self._lock = threading.Lock()
+        self._upload_locks = {}
+        self.reload()
+
+    def reload(self):
+        """Re-reads the GEMINI_CONTEXT_CACHE* settings and the state file (handles and upload backoffs)."""
+        with self._lock:
+            self.path = self._path or os.environ.get("GEMINI_CONTEXT_CACHE_FILE", DEFAULT_STATE_FILE)
+            self.ttl = self._ttl or int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", DEFAULT_TTL))
+            self.enabled = os.environ.get("GEMINI_CONTEXT_CACHE", "1") not in ("0", "off", "false")
+            self._entries = None
+
+    def entries(self):
+        if self._entries is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self):
+        now = time.time()
+        entries = {key: entry for key, entry in self.entries().items()
+                   if entry.get("expire_time", 0) > now or entry.get("failed_until", 0) > now}
+        self._entries = entries
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Warning: could not save context cache state: {e}")
+
+    def key(self, model, config):
+        config = as_config(config)
+        fields = {name: getattr(config, name, None) for name in CACHED_FIELDS}
+        encoded = json.dumps(_to_jsonable({"model": model, **fields}), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:32]
+
+    def attach(self, client, model, config, site=None):
+        """Returns `config` with its static prefix replaced by a cached content reference, or `config` unchanged."""
+        if not self.enabled or not config:
+            return config
+        request_config = as_config(config)
+        if request_config is None or not request_config.system_instruction or request_config.cached_content:
+            return config
+        from rate_limiter import estimate_tokens
+        if estimate_tokens(request_config.system_instruction) < min_cache_tokens(model):
+            return config
+        key = self.key(model, request_config)
+        name, blocked = self._lookup(key)
+        if name is None and not blocked:
+            # Held across the upload, so concurrent shards sharing a prefix upload it once,
+            # while requests with other prefixes go ahead
+            with self._lock:
+                upload_lock = self._upload_locks.setdefault(key, threading.Lock())
+            with upload_lock:
+                name, blocked = self._lookup(key)
+                if name is None and not blocked:
+                    name = self._create(client, model, request_config, key, site)
+        if name is None:
+            return config
+        return request_config.model_copy(update={**{field: None for field in CACHED_FIELDS}, "cached_content": name})
+
+    def _lookup(self, key):
+        """Returns (name of a live cache or None, True if uploads are backed off)."""
+        with self._lock:
+            entry = self.entries().get(key, {})
+            now = time.time()
+            if entry.get("name") and entry["expire_time"] - min(EXPIRY_MARGIN, self.ttl / 4) > now:
+                return entry["name"], False
+            return None, entry.get("failed_until", 0) > now
+
+    def _create(self, client, model, config, key, site):
+        from google.genai import errors, types
+        started = time.perf_counter()
+        try:
+            cached = client.caches.create(model=model, config=types.CreateCachedContentConfig(
+                system_instruction=config.system_instruction,
+                tools=config.tools,
+                tool_config=config.tool_config,
+                ttl=f"{self.ttl}s",
+                display_name=(site or "prompt-prefix")[:128],
+            ))
+        except Exception as e:
+            # Refusals (prefix too small, caching unsupported) hold for a day; rate limits,
+            # server and network errors are transient
+            refused = isinstance(e, errors.ClientError) and e.code != 429
+            backoff = FAILURE_BACKOFF if refused else RETRY_BACKOFF
+            print(f"(context cache {'unavailable' if refused else 'upload failed'} for {site or model}, "
+                  f"sending the prefix inline for {backoff // 60} min: {e})")
+            with self._lock:
+                self.entries()[key] = {"model": model, "site": site, "failed_until": time.time() + backoff, "error": str(e)[:200]}
+                self._save()
+            return None
+        tokens = cached.usage_metadata.total_token_count if cached.usage_metadata else None
+        expire_time = cached.expire_time.timestamp() if cached.expire_time else time.time() + self.ttl
+        with self._lock:
+            self.entries()[key] = {"name": cached.name, "model": model, "site": site, "tokens": tokens,
+                                   "created": time.time(), "expire_time": expire_time}
+            self._save()
+        print(f"(context cache: uploaded {tokens or '?'} prefix tokens for {site or model} in "
+              f"{time.perf_counter() - started:.2f}s, valid {self.ttl}s)")
+        return cached.name
+
+    def invalidate(self, model, config, name):
+        """Forgets the cache `name` of `config`'s prefix (it expired or was deleted server-side)."""
+        with self._lock:
+            key = self.key(model, config)
+            # Another thread may already have replaced it
+            if self.entries().get(key, {}).get("name") == name:
+                del self.entries()[key]
+                self._save()
+
+    def run(self, client, model, config, site, func):
+        """
+        Calls func(config) with the prefix attached from the cache. If the cache vanished
+        server-side before its recorded expiry, it is re-created and the call retried once.
+        """
+        attached = self.attach(client, model, config, site)
+        try:
+            return func(attached)
+        except Exception as e:
+            if attached is config or not is_missing_cache_error(e):
+                raise
+        self.invalidate(model, config, attached.cached_content)
+        return func(self.attach(client, model, config, site))
+
+    async def run_async(self, client, model, config, site, func):
+        """Async counterpart of run(): awaits func(config); the upload runs in a worker thread."""
+        import asyncio
+        attached = await asyncio.to_thread(self.attach, client, model, config, site)
+        try:
+            return await func(attached)
+        except Exception as e:
+            if attached is config or not is_missing_cache_error(e):
+                raise
+        self.invalidate(model, config, attached.cached_content)
+        return await func(await asyncio.to_thread(self.attach, client, model, config, site))
+
+    def clear(self, client):
+        """Deletes every live cache recorded in the state file (stops its storage billing)."""
+        with self._lock:
+            deleted = 0
+            for key, entry in list(self.entries().items()):
+                if entry.get("name"):
+                    try:
+                        client.caches.delete(name=entry["name"])
+                        deleted += 1
+                    except Exception as e:
+                        print(f"Could not delete {entry['name']}: {e}")
+                self.entries().pop(key)
+            self._save()
+        return deleted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or delete the explicit context caches of the static prompt prefixes")
+    parser.add_argument("command", choices=["list", "clear"], help="list: caches recorded in the state file, clear: delete them")
+    args = parser.parse_args()
+
+    context_cache = ContextCache()
+    if args.command == "list":
+        now = time.time()
+        if not context_cache.entries():
+            print(f"No context caches in '{context_cache.path}'.")
+        for entry in context_cache.entries().values():
+            if entry.get("name"):
+                print(f"{entry.get('site') or '-':<50} {entry['model']:<24} {entry.get('tokens') or '?':>7} tokens  "
+                      f"expires in {max(0, entry['expire_time'] - now) / 60:5.1f} min  {entry['name']}")
+            else:
+                print(f"{entry.get('site') or '-':<50} {entry['model']:<24} inline until "
+                      f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['failed_until']))}: {entry.get('error', '')[:80]}")
+    else:
+        from gemini_client import create_client, load_env
+        load_env()
+        print(f"Deleted {context_cache.clear(create_client())} context cache(s).")
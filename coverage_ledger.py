@@ -0,0 +1,108 @@
+import os
+import time
+import sqlite3
+import argparse
+import datetime
+from datetime import timedelta
+
+# Days this close to today are searched again on every run once their last search is
+# older than DEFAULT_MAX_AGE_HOURS, to catch events announced at short notice
+DEFAULT_NEAR_DAYS = 1
+DEFAULT_MAX_AGE_HOURS = 20
+
+def day_range(start_date, end_date):
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+class CoverageLedger:
+    """
+    Records, per calendar day and event family, when a grounded search last covered it
+    and how many events it returned, in a small SQLite file next to the events CSV.
+
+    A sliding-window run asks due_days() which (day, family) slots still need a search:
+    days never searched (the ones that just entered the window) and days within
+    `near_days` of today whose last search is older than `max_age_hours`. Everything
+    else was already covered by an earlier run. If the CSV is missing, so are the
+    events the ledger vouches for, and the ledger starts over.
+    """
+
+    def __init__(self, csv_path, ledger_path=None):
+        self.csv_path = csv_path
+        self.ledger_path = ledger_path or os.path.splitext(csv_path)[0] + ".coverage.sqlite"
+        self.conn = sqlite3.connect(self.ledger_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS coverage (day TEXT NOT NULL, family TEXT NOT NULL, searched_at REAL NOT NULL, "
+                          "events INTEGER NOT NULL, PRIMARY KEY (day, family)) WITHOUT ROWID")
+        if not os.path.exists(csv_path):
+            self.conn.execute("DELETE FROM coverage")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def coverage(self, start_date, end_date):
+        """Returns {(day, family): (searched_at, events)} for the days in [start_date, end_date]."""
+        rows = self.conn.execute("SELECT day, family, searched_at, events FROM coverage WHERE day BETWEEN ? AND ?",
+                                 (start_date.isoformat(), end_date.isoformat()))
+        return {(day, family): (searched_at, events) for day, family, searched_at, events in rows}
+
+    def due_days(self, start_date, end_date, families, today, near_days=DEFAULT_NEAR_DAYS, max_age_hours=DEFAULT_MAX_AGE_HOURS):
+        """Returns ({family: [days to search]}, new slots, stale slots) for the window."""
+        known = self.coverage(start_date, end_date)
+        stale_before = time.time() - max_age_hours * 60 * 60
+        due = {family: [] for family in families}
+        new = stale = 0
+        for day in day_range(start_date, end_date):
+            for family in families:
+                entry = known.get((day.isoformat(), family))
+                if entry is None:
+                    new += 1
+                elif abs((day - today).days) <= near_days and entry[0] < stale_before:
+                    stale += 1
+                else:
+                    continue
+                due[family].append(day)
+        return due, new, stale
+
+    def record(self, start_date, end_date, families, rows, searched_at=None):
+        """Marks every day of [start_date, end_date] as searched for `families`, with the events `rows` found on it."""
+        searched_at = searched_at or time.time()
+        counts = {}
+        for row in rows:
+            if len(row) > 3:
+                counts[row[3].strip()] = counts.get(row[3].strip(), 0) + 1
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO coverage (day, family, searched_at, events) VALUES (?, ?, ?, ?)",
+                [(day.isoformat(), family, searched_at, counts.get(day.isoformat(), 0))
+                 for day in day_range(start_date, end_date) for family in families])
+
+    def prune(self, before_date):
+        """Drops the slots of days before `before_date`, which have left the window for good."""
+        with self.conn:
+            self.conn.execute("DELETE FROM coverage WHERE day < ?", (before_date.isoformat(),))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show which days of the sliding window the coverage ledger has searched")
+    parser.add_argument("csv_file", nargs="?", default="market_events.csv", help="Events CSV file (default: market_events.csv)")
+    parser.add_argument("--days", type=int, default=7, help="Window half-width around today (default: 7)")
+    args = parser.parse_args()
+
+    today = datetime.date.today()
+    with CoverageLedger(args.csv_file) as ledger:
+        known = ledger.coverage(today - timedelta(days=args.days), today + timedelta(days=args.days))
+        families = sorted({family for _, family in known})
+        if not families:
+            print(f"No coverage recorded in '{ledger.ledger_path}' for the current window.")
+        else:
+            print(f"{'Day':<12} " + " ".join(f"{family:>22}" for family in families))
+            for day in day_range(today - timedelta(days=args.days), today + timedelta(days=args.days)):
+                cells = []
+                for family in families:
+                    entry = known.get((day.isoformat(), family))
+                    cells.append(f"{time.strftime('%m-%d %H:%M', time.localtime(entry[0]))} {entry[1]:>3} ev" if entry else "-")
+                print(f"{day.isoformat():<12} " + " ".join(f"{cell:>22}" for cell in cells))
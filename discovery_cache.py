@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import tempfile
+
+DEFAULT_CACHE_DIR = ".discovery_cache"
+
+# Discovery documents change rarely; re-download them weekly at most
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+DISCOVERY_URL = "https://{api}.googleapis.com/$discovery/rest?version={version}"
+
+# Parsed documents shared by every service built in this process
+_documents = {}
+
+def cache_path(api, version, cache_dir=None):
+    cache_dir = cache_dir or os.environ.get("GOOGLE_DISCOVERY_CACHE_DIR", DEFAULT_CACHE_DIR)
+    return os.path.join(cache_dir, f"{api}.{version}.json")
+
+def _download(api, version):
+    # Prefer the copy bundled with google-api-python-client 2.x; fall back to the network
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+        document = get_static_doc(api, version)
+        if document:
+            return document
+    except ImportError:
+        pass
+    import requests
+    response = requests.get(DISCOVERY_URL.format(api=api, version=version), timeout=30)
+    response.raise_for_status()
+    return response.text
+
+def load_document(api, version, cache_dir=None, ttl=DEFAULT_TTL):
+    """Returns the discovery document for api/version, downloading it only when the local copy is missing or stale."""
+    if (api, version) in _documents:
+        return _documents[(api, version)]
+
+    path = cache_path(api, version, cache_dir)
+    try:
+        if time.time() - os.path.getmtime(path) < ttl:
+            with open(path, "r", encoding="utf-8") as f:
+                _documents[(api, version)] = f.read()
+                return _documents[(api, version)]
+    except OSError:
+        pass
+
+    document = _download(api, version)
+    json.loads(document) # Don't cache an error page
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(document)
+    os.replace(tmp_path, path)
+    _documents[(api, version)] = document
+    return document
+
+def build_service(api, version, **kwargs):
+    """
+    Drop-in replacement for googleapiclient.discovery.build() that builds the client
+    from the locally cached discovery document, with no network round-trip.
+
+    Service objects are not thread-safe; build one per thread (cheap once the
+    document is cached). GOOGLE_API_ENDPOINT_<API> (e.g. GOOGLE_API_ENDPOINT_SERVICEUSAGE)
+    sends requests to another endpoint without credentials, for the offline benchmark.
+    """
+    from googleapiclient.discovery import build_from_document
+    endpoint = os.environ.get(f"GOOGLE_API_ENDPOINT_{api.upper()}")
+    if endpoint:
+        from google.auth.credentials import AnonymousCredentials
+        kwargs.setdefault("client_options", {"api_endpoint": endpoint})
+        if "developerKey" not in kwargs:
+            kwargs.setdefault("credentials", AnonymousCredentials())
+    return build_from_document(load_document(api, version), **kwargs)
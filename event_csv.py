@@ -0,0 +1,152 @@
+import csv
+import io
+import datetime
+
+# Column layout shared by market_events.csv, AI-event-gemini3.csv and historical_crashes-gemini3.csv
+EVENT_HEADER = ["類別", "子類別", "事件名稱", "開始日期", "結束日期", "備註", "Link1", "Link2"]
+
+def is_header_row(row):
+    """Returns True if a parsed row is the CSV header (possibly with chat text glued in front)."""
+    return len(row) >= 4 and "事件名稱" in row[2] and "開始日期" in row[3]
+
+def is_valid_date(value):
+    try:
+        datetime.datetime.strptime(value.strip(), "%Y-%m-%d")
+        return True
+    except ValueError:
+        return False
+
+def normalize_row(row):
+    """Strips cells and pads/truncates a row to the EVENT_HEADER width."""
+    row = [cell.strip() for cell in row]
+    if len(row) < len(EVENT_HEADER):
+        row += [""] * (len(EVENT_HEADER) - len(row))
+    return row[:len(EVENT_HEADER)]
+
+def validate_row(row, require_link=True):
+    """Returns a list of problems with an event row (empty if the row is valid)."""
+    problems = []
+    # Rows may omit the Link columns, but anything shorter is not an event
+    if len(row) < 6:
+        return [f"expected {len(EVENT_HEADER)} columns, got {len(row)}"]
+    if len(row) > len(EVENT_HEADER) and any(cell.strip() for cell in row[len(EVENT_HEADER):]):
+        problems.append(f"expected {len(EVENT_HEADER)} columns, got {len(row)}")
+    if not row[2].strip():
+        problems.append("missing 事件名稱")
+    if not is_valid_date(row[3]):
+        problems.append(f"invalid 開始日期 '{row[3]}'")
+    if row[4].strip() and not is_valid_date(row[4]):
+        problems.append(f"invalid 結束日期 '{row[4]}'")
+    if require_link and (len(row) < 7 or not row[6].strip()):
+        problems.append("missing Link1")
+    return problems
+
+class StreamingCsvParser:
+    """
+    Incremental CSV parser for text that arrives in arbitrary chunks.
+
+    feed() returns the records completed by each chunk. A record is only emitted once
+    its closing newline has arrived and its quotes are balanced, so quoted fields that
+    span chunks or lines are handled. Markdown fences and the header row are dropped.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pending = ""
+
+    def feed(self, text):
+        # Split once per chunk; the last piece is an incomplete line kept for the next feed()
+        *lines, self._buffer = (self._buffer + text).split("\n")
+        rows = []
+        for line in lines:
+            rows.extend(self._add_line(line))
+        return rows
+
+    def close(self):
+        """Flushes whatever is left once the stream has ended."""
+        rows = []
+        if self._buffer:
+            rows.extend(self._add_line(self._buffer))
+            self._buffer = ""
+        if self._pending:
+            rows.extend(self._parse(self._pending))
+            self._pending = ""
+        return rows
+
+    def _add_line(self, line):
+        record = self._pending + "\n" + line if self._pending else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2 == 1:
+            self._pending = record
+            return []
+        self._pending = ""
+        return self._parse(record)
+
+    def _parse(self, record):
+        stripped = record.strip()
+        if not stripped or stripped.startswith("```"):
+            return []
+        try:
+            rows = list(csv.reader(io.StringIO(stripped)))
+        except csv.Error:
+            return []
+        return [row for row in rows if row and not is_header_row(row)]
+
+def parse_event_rows(text):
+    """Parses every event row out of a complete model answer (preamble, fences and header dropped)."""
+    parser = StreamingCsvParser()
+    return parser.feed(text) + parser.close()
+
+def dedup_rows(rows):
+    """Drops rows whose (事件名稱, 開始日期) was already seen, keeping the first occurrence."""
+    seen = set()
+    unique = []
+    for row in rows:
+        key = (row[2].strip(), row[3].strip())
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append(row)
+    return unique
+
+def write_event_csv(output_file, rows, encoding="utf-8-sig"):
+    """Writes EVENT_HEADER plus normalized rows to output_file."""
+    with open(output_file, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EVENT_HEADER)
+        writer.writerows(normalize_row(row) for row in rows)
+
+def stream_rows_to_csv(chunks, output_file, encoding="utf-8-sig", require_link=True):
+    """
+    Parses CSV rows out of streamed response chunks and writes each valid row to
+    output_file as soon as it is complete.
+
+    Returns (rows_written, rows_skipped).
+    """
+    parser = StreamingCsvParser()
+    written = 0
+    skipped = 0
+
+    with open(output_file, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(EVENT_HEADER)
+        f.flush()
+
+        def handle(rows):
+            nonlocal written, skipped
+            for row in rows:
+                problems = validate_row(row, require_link)
+                if problems:
+                    skipped += 1
+                    print(f"  Skipped row ({'; '.join(problems)}): {','.join(row)[:80]}")
+                    continue
+                writer.writerow(normalize_row(row))
+                f.flush()
+                written += 1
+                print(f"  [{written}] {row[3].strip()} {row[2].strip()}")
+
+        for chunk in chunks:
+            handle(parser.feed(getattr(chunk, "text", None) or ""))
+        handle(parser.close())
+
+    return written, skipped
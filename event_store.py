@@ -0,0 +1,317 @@
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import datetime
+from event_csv import EVENT_HEADER, normalize_row, parse_event_rows, validate_row
+
+DEFAULT_STORE_FILE = ".events.sqlite"
+
+# The event CSVs written by the workspace scripts
+DEFAULT_SOURCES = ["market_events.csv", "AI-event-gemini3.csv", "historical_crashes-gemini3.csv"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY, name TEXT, size INTEGER, mtime_ns INTEGER, sha256 TEXT, rows INTEGER, loaded_at REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    category TEXT,        -- 類別
+    subcategory TEXT,     -- 子類別
+    name TEXT NOT NULL,   -- 事件名稱
+    start_date TEXT NOT NULL, -- 開始日期 (YYYY-MM-DD)
+    end_date TEXT NOT NULL,   -- 結束日期, or 開始日期 when empty
+    span_days INTEGER NOT NULL,
+    note TEXT,
+    link1 TEXT,
+    link2 TEXT,
+    UNIQUE (source, name, start_date)
+);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events (start_date);
+CREATE INDEX IF NOT EXISTS idx_events_category ON events (category, start_date);
+CREATE INDEX IF NOT EXISTS idx_events_subcategory ON events (subcategory, start_date);
+-- Longest span_days per source and 類別: how far before a window a query has to start scanning
+CREATE TABLE IF NOT EXISTS spans (
+    source TEXT NOT NULL, category TEXT NOT NULL, max_span INTEGER NOT NULL, PRIMARY KEY (source, category)
+);
+"""
+
+COLUMNS = ("category", "subcategory", "name", "start_date", "end_date", "note", "link1", "link2")
+
+BLOCK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def appended_tail(path, size, sha256):
+    """
+    Returns (bytes after the first `size`, sha256 of the whole file) when the file only
+    grew since it was `size` bytes hashing to `sha256` and those ended a line, or
+    (None, None) when anything before the tail changed.
+    """
+    digest = hashlib.sha256()
+    last = b""
+    with open(path, "rb") as f:
+        remaining = size
+        while remaining:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                return None, None
+            digest.update(block)
+            remaining -= len(block)
+            last = block
+        if digest.hexdigest() != sha256 or not last.endswith(b"\n"):
+            return None, None
+        tail = f.read()
+    digest.update(tail)
+    return tail, digest.hexdigest()
+
+def parse_rows(text):
+    """Returns (valid normalized rows, skipped) of CSV text."""
+    rows = []
+    skipped = 0
+    for row in parse_event_rows(text):
+        if validate_row(row, require_link=False):
+            skipped += 1
+            continue
+        rows.append(normalize_row(row))
+    return rows, skipped
+
+def read_event_file(path):
+    """
+    Parses an event CSV whatever its flavour (BOM or not, quoted or not, with or
+    without Link columns, chat text before the header). Returns (rows, skipped).
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return parse_rows(f.read())
+
+def event_record(source, row):
+    """Turns a normalized EVENT_HEADER row into an events table tuple."""
+    category, subcategory, name, start, end, note, link1, link2 = row
+    end = end if end and end >= start else start
+    span = (datetime.date.fromisoformat(end) - datetime.date.fromisoformat(start)).days
+    return (source, category, subcategory, name, start, end, span, note, link1, link2)
+
+class EventStore:
+    """
+    SQLite index over the event CSVs.
+
+    ingest() reads a file only when its size / mtime and then its hash changed. A file
+    that only grew (the append-only CSVs) has just its new tail parsed and added;
+    any other change replaces that file's rows in one transaction. Sources are keyed
+    by absolute path throughout. query() finds the events that
+    overlap a date window with an index range scan: an event overlapping [start, end]
+    begins no earlier than start minus the longest span of its 類別 in the sources
+    queried (kept per source and 類別 in the spans table), so only that slice of each
+    類別's (類別, 開始日期) index is read.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("EVENT_STORE_FILE", DEFAULT_STORE_FILE)
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def ingest(self, path, force=False):
+        """Loads one CSV if it changed since the last load. Returns (status, rows, skipped)."""
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self.conn.execute("SELECT size, mtime_ns, sha256, rows FROM sources WHERE path = ?", (key,)).fetchone()
+        if known and not force and (known[0], known[1]) == (stat.st_size, stat.st_mtime_ns):
+            return "unchanged", known[3], 0
+
+        if known and not force and stat.st_size > known[0] > 0:
+            tail, sha256 = appended_tail(path, known[0], known[2])
+            if tail is not None:
+                rows, skipped = parse_rows(tail.decode("utf-8", "replace"))
+                return "appended", self._store(key, path, stat, sha256, rows), skipped
+
+        sha256 = file_sha256(path)
+        if known and not force and known[2] == sha256:
+            # Touched but identical: only remember the new mtime
+            with self.conn:
+                self.conn.execute("UPDATE sources SET size = ?, mtime_ns = ? WHERE path = ?",
+                                  (stat.st_size, stat.st_mtime_ns, key))
+            return "unchanged", known[3], 0
+
+        rows, skipped = read_event_file(path)
+        return ("reloaded" if known else "loaded"), self._store(key, path, stat, sha256, rows, replace=True), skipped
+
+    def _store(self, key, path, stat, sha256, rows, replace=False):
+        """Adds (or with `replace`, replaces) a source's rows and records its state. Returns its event count."""
+        records = [event_record(key, row) for row in rows]
+        spans = {}
+        for record in records:
+            spans[record[1]] = max(spans.get(record[1], 0), record[6])
+        with self.conn:
+            if replace:
+                self.conn.execute("DELETE FROM events WHERE source = ?", (key,))
+                self.conn.execute("DELETE FROM spans WHERE source = ?", (key,))
+            # Duplicate (事件名稱, 開始日期) rows keep the first occurrence, as dedup_rows does
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO events (source, " + ", ".join(COLUMNS[:5]) + ", span_days, " + ", ".join(COLUMNS[5:]) + ") "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+            self.conn.executemany(
+                "INSERT INTO spans (source, category, max_span) VALUES (?, ?, ?) "
+                "ON CONFLICT (source, category) DO UPDATE SET max_span = MAX(max_span, excluded.max_span)",
+                [(key, category, span) for category, span in spans.items()])
+            count = self.conn.execute("SELECT COUNT(*) FROM events WHERE source = ?", (key,)).fetchone()[0]
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sources (path, name, size, mtime_ns, sha256, rows, loaded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, os.path.basename(path), stat.st_size, stat.st_mtime_ns, sha256, count, time.time()))
+        return count
+
+    def sources(self):
+        return [row[0] for row in self.conn.execute("SELECT path FROM sources ORDER BY path")]
+
+    def sync(self):
+        """Re-ingests every known source that changed on disk (a stat() per file when nothing did)."""
+        for path in self.sources():
+            if os.path.exists(path):
+                self.ingest(path)
+
+    def query(self, start=None, end=None, category=None, subcategory=None, name=None, source=None, limit=None):
+        """Returns event dicts overlapping [start, end] (either bound optional), ordered by 開始日期."""
+        clauses = []
+        params = []
+        # Filters shared by the events and the spans they bound
+        filters = []
+        filter_params = []
+        if category:
+            filters.append("category = ?")
+            filter_params.append(category)
+        if source:
+            # A file name matches every ingested file of that name, a path only that file
+            filters.append("source IN (SELECT path FROM sources WHERE name = ? OR path = ?)")
+            filter_params.extend([source, os.path.abspath(source)])
+        if end:
+            clauses.append("start_date <= ?")
+            params.append(end)
+        if start:
+            # Each 類別 is scanned from start minus its own longest span (among the sources
+            # queried), so a years-long crash only widens the scan of its own 類別
+            sql = "SELECT category, MAX(max_span) FROM spans" + (" WHERE " + " AND ".join(filters) if filters else "") + " GROUP BY category"
+            ranges = self.conn.execute(sql, filter_params).fetchall()
+            first_day = datetime.date.fromisoformat(start)
+            if subcategory or len(ranges) <= 1:
+                # One bound, so the (子類別, 開始日期) or (類別, 開始日期) index still applies
+                max_span = max((span for _, span in ranges), default=0)
+                clauses.append("start_date >= ?")
+                params.append((first_day - datetime.timedelta(days=max_span)).isoformat())
+            else:
+                clauses.append("(" + " OR ".join(["(category = ? AND start_date >= ?)"] * len(ranges)) + ")")
+                for range_category, max_span in ranges:
+                    params.extend([range_category, (first_day - datetime.timedelta(days=max_span)).isoformat()])
+            clauses.append("end_date >= ?")
+            params.append(start)
+        clauses.extend(filters)
+        params.extend(filter_params)
+        if subcategory:
+            clauses.append("subcategory = ?")
+            params.append(subcategory)
+        if name:
+            clauses.append("name LIKE ?")
+            params.append(f"%{name}%")
+        sql = "SELECT source, " + ", ".join(COLUMNS) + " FROM events"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY start_date, end_date"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        keys = ("source",) + COLUMNS
+        return [dict(zip(keys, row)) for row in self.conn.execute(sql, params)]
+
+    def stats(self):
+        """Returns [(source, rows, first 開始日期, last 開始日期)] and the counts per 類別."""
+        per_source = self.conn.execute(
+            "SELECT source, COUNT(*), MIN(start_date), MAX(start_date) FROM events GROUP BY source ORDER BY source").fetchall()
+        per_category = self.conn.execute(
+            "SELECT category, COUNT(*) FROM events GROUP BY category ORDER BY COUNT(*) DESC").fetchall()
+        return per_source, per_category
+
+def print_events(events, output_format):
+    if output_format == "csv":
+        writer = csv.writer(sys.stdout)
+        writer.writerow(EVENT_HEADER)
+        writer.writerows([event[column] for column in COLUMNS] for event in events)
+    elif output_format == "json":
+        for event in events:
+            print(json.dumps(event, ensure_ascii=False))
+    else:
+        for event in events:
+            dates = event["start_date"] if event["end_date"] == event["start_date"] else f"{event['start_date']} ~ {event['end_date']}"
+            print(f"{dates:<23} {event['category']}/{event['subcategory']:<12} {event['name']}")
+
+def add_arguments(parser):
+    parser.add_argument("command", choices=["ingest", "query", "stats"], help="ingest: load changed CSVs into the store, query: events overlapping a date window, stats: rows per source and category")
+    parser.add_argument("files", nargs="*", help=f"CSV files to ingest (default: {', '.join(DEFAULT_SOURCES)})")
+    parser.add_argument("--store", help=f"SQLite store file (default: EVENT_STORE_FILE or {DEFAULT_STORE_FILE})")
+    parser.add_argument("--force", action="store_true", help="Reload files even if they are unchanged")
+    parser.add_argument("--from", dest="start", help="Window start, YYYY-MM-DD (events ending on or after it)")
+    parser.add_argument("--to", dest="end", help="Window end, YYYY-MM-DD (events starting on or before it)")
+    parser.add_argument("--category", help="Only this 類別")
+    parser.add_argument("--subcategory", help="Only this 子類別")
+    parser.add_argument("--name", help="Only events whose 事件名稱 contains this text")
+    parser.add_argument("--source", help="Only events from this CSV (file name or path)")
+    parser.add_argument("--limit", type=int, help="Return at most this many events")
+    parser.add_argument("--format", choices=["table", "csv", "json"], default="table", help="Query output format")
+
+def main(args):
+    for value in (args.start, args.end):
+        if value:
+            try:
+                datetime.date.fromisoformat(value)
+            except ValueError:
+                print(f"Error: '{value}' is not a YYYY-MM-DD date.")
+                exit(1)
+
+    store = EventStore(args.store)
+
+    if args.command == "ingest":
+        files = args.files or [path for path in DEFAULT_SOURCES if os.path.exists(path)]
+        for path in files:
+            try:
+                status, rows, skipped = store.ingest(path, force=args.force)
+            except OSError as e:
+                print(f"Error reading '{path}': {e}")
+                continue
+            note = f", {skipped} invalid rows skipped" if skipped else ""
+            print(f"{path}: {status}, {rows} events{note}")
+    elif args.command == "query":
+        if not store.sources():
+            print(f"The event store '{store.path}' is empty. Run `event_store.py ingest` first.")
+            exit(1)
+        started = time.perf_counter()
+        store.sync()
+        events = store.query(args.start, args.end, args.category, args.subcategory, args.name, args.source, args.limit)
+        elapsed = time.perf_counter() - started
+        print_events(events, args.format)
+        if args.format == "table":
+            print(f"\n{len(events)} events in {elapsed * 1000:.1f} ms.")
+    else:
+        per_source, per_category = store.stats()
+        for source, rows, first, last in per_source:
+            print(f"{os.path.relpath(source):<34} {rows:>8} events  {first} .. {last}")
+        print()
+        for category, rows in per_category:
+            print(f"{category:<20} {rows:>8}")
+
+    store.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index the event CSVs in SQLite and query them by date window")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -1,75 +1,93 @@
 import os
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+import argparse
+from gemini_client import add_cache_arguments, configure_cache, create_client, generate_content, generate_content_stream, load_env
+from event_csv import stream_rows_to_csv, write_event_csv
+from prompt_templates import EVENT_RESEARCH_PREFIX, register_template
 
-# Load environment variables
-load_dotenv()
+# Grounded search over historical events; results are reused for 6 hours
+CACHE_TTL = 6 * 60 * 60
 
-def generate_ai_events():
+OUTPUT_FILE = "AI-event-gemini3.csv"
+
+# The column spec and category guides are the shared system instruction; the role, focus and task are sent per call
+PROMPT = register_template("ai_events", prefix=EVENT_RESEARCH_PREFIX, template="""
+    You are a Financial Technology Analyst. Use the category guide "AI 市場事件".
+
+    Focus on events that:
+    1. Caused noticeable stock price movements (e.g., NVIDIA, Microsoft, Google, TSM).
+    2. Triggered major M&A (Mergers & Acquisitions) or huge Venture Capital investments.
+    3. Launched products that disrupted industries or created new revenue streams.
+    4. Influenced market sentiment or regulatory environments affecting business operations (e.g., Chip bans).
+
+    In "備註", explain the *Business/Market Impact* (e.g., "NVIDIA股價當日上漲24%", "微軟市值超越蘋果", "引發AI軍備競賽").
+
+    Task: Search for and extract a list of the TOP 50-100 CRITICAL Artificial Intelligence events that significantly impacted the **Stock Market, Corporate Valuations, or the Business Landscape**.
+
+    Quantity: Aim for ~40-50 distinct high-impact events.
+    """)
+
+def generate_ai_events(stream=False, structured=False):
+    # Load environment variables
+    load_env()
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         print("Error: GEMINI_API_KEY environment variable not set.")
         return
 
-    client = genai.Client(api_key=api_key)
+    client = create_client(api_key)
 
     print("Fetching major AI events (Market & Business Impact)...")
 
-    prompt = """
-    You are a Financial Technology Analyst.
-    
-    Task: Search for and extract a list of the TOP 50-100 CRITICAL Artificial Intelligence events that significantly impacted the **Stock Market, Corporate Valuations, or the Business Landscape**.
-    
-    Focus on events that:
-    1. Caused noticeable stock price movements (e.g., NVIDIA, Microsoft, Google, TSM).
-    2. Triggered major M&A (Mergers & Acquisitions) or huge Venture Capital investments.
-    3. Launched products that disrupted industries or created new revenue streams.
-    4. Influenced market sentiment or regulatory environments affecting business operations (e.g., Chip bans).
+    output_file = OUTPUT_FILE
+    from google.genai import types
+    prompt = PROMPT.render()
+    config = PROMPT.config(types.GenerateContentConfig(
+        tools=[types.Tool(google_search=types.GoogleSearch())],
+        response_modalities=["TEXT"]
+    ))
 
-    Focus on these specific Categories (類別) and Sub-categories (子類別):
-    
-    1. 市場與資本 (Market & Capital):
-       - 市值里程碑 (Market Cap Milestones) - e.g., NVIDIA hits $3T, Microsoft overtakes Apple due to AI.
-       - 併購與投資 (M&A & Investment) - e.g., Microsoft invests $10B in OpenAI, Google buys DeepMind.
-       - 股價波動 (Stock Movement) - e.g., Super Micro Computer surge, Chegg crash due to ChatGPT.
-
-    2. 產品發布與商業化 (Product & Commercialization):
-       - 生成式AI應用 (Generative AI Apps) - e.g., ChatGPT launch (sparked AI arms race), Copilot launch.
-       - 企業級解決方案 (Enterprise Solutions) - e.g., Salesforce AI integration.
-       - 硬體與基礎設施 (Hardware & Infra) - e.g., H100 announcement (AI gold rush), AMD MI300.
-
-    3. 技術突破與轉折點 (Tech Breakthroughs as Market Catalysts):
-       - 關鍵論文 (Seminal Papers) - e.g., "Attention Is All You Need" (foundation of modern value creation).
-       - 模型發布 (Model Releases) - e.g., GPT-4 (set new industry standard).
-
-    4. 政策與監管衝擊 (Regulation & Policy Impact):
-       - 貿易限制 (Trade Restrictions) - e.g., US bans AI chip exports to China (impacted NVIDIA/AMD stocks).
-       - 監管審查 (Regulation Scrutiny) - e.g., Antitrust investigations into AI partnerships.
-    
-    Output Format:
-    Produce a valid CSV file content with the following headers:
-    "類別", "子類別", "事件名稱", "開始日期", "結束日期", "備註", "Link1", "Link2"
-    
-    Requirements:
-    - Language: All text must be in Traditional Chinese (繁體中文).
-    - Dates: Format YYYY-MM-DD.
-    - "備註" (Note): **Crucial**: Explain the *Business/Market Impact* (e.g., "NVIDIA股價當日上漲24%", "微軟市值超越蘋果", "引發AI軍備競賽").
-    - "Link1": MANDATORY. Provide a reliable source URL (Bloomberg, CNBC, Reuters, TechCrunch).
-    - Quantity: Aim for ~40-50 distinct high-impact events.
-    - Do not include markdown code block markers.
-    """
+    if structured:
+        # Typed JSON records validated in one pass; only invalid rows are re-requested
+        from structured_events import generate_structured_rows
+        print("Requesting structured event records from Gemini 2.5 Flash...")
+        try:
+            rows = generate_structured_rows(client, prompt, config, ttl=CACHE_TTL, site="fetch_ai_events.generate_ai_events")
+            write_event_csv(output_file, rows)
+            print(f"Successfully generated '{output_file}' with {len(rows)} events.")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        return
+
+    if stream:
+        # Streaming mode: validate and flush each CSV row as soon as it arrives,
+        # so a failure late in the generation keeps everything written so far.
+        print("Streaming response from Gemini 2.5 Flash...")
+        try:
+            chunks = generate_content_stream(
+                client,
+                model="gemini-2.5-flash",
+                contents=prompt,
+                config=config,
+                ttl=CACHE_TTL,
+                site="fetch_ai_events.generate_ai_events",
+            )
+            written, skipped = stream_rows_to_csv(chunks, output_file)
+            print(f"Successfully streamed {written} events to '{output_file}' ({skipped} invalid rows skipped).")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            print(f"Rows received before the error were kept in '{output_file}'.")
+        return
 
     print("Sending request to Gemini 2.5 Flash...")
     
     try:
-        response = client.models.generate_content(
+        response = generate_content(
+            client,
             model="gemini-2.5-flash",
             contents=prompt,
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(google_search=types.GoogleSearch())],
-                response_modalities=["TEXT"]
-            )
+            config=config,
+            ttl=CACHE_TTL,
+            site="fetch_ai_events.generate_ai_events",
         )
         
         csv_content = response.text.strip()
@@ -77,8 +95,6 @@ def generate_ai_events():
         # Clean up markdown
         if csv_content.startswith("```"):
             csv_content = csv_content.strip("`").replace("csv\n", "", 1)
-
-        output_file = "AI-event-gemini3.csv"
         
         with open(output_file, "w", encoding="utf-8-sig", newline="") as f:
             f.write(csv_content)
@@ -91,5 +107,22 @@ def generate_ai_events():
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def add_arguments(parser):
+    parser.add_argument("--stream", action="store_true", help="Stream the response and write each validated row as it arrives")
+    parser.add_argument("--structured", action="store_true", help="Request typed JSON records instead of free-text CSV and re-request only invalid rows")
+    parser.add_argument("--resolve-links", action="store_true", help="Afterwards replace grounding-redirect links with the publisher URLs (link_resolver.py)")
+    add_cache_arguments(parser)
+
+def main(args):
+    configure_cache(args)
+
+    generate_ai_events(args.stream, args.structured)
+
+    if args.resolve_links and os.path.exists(OUTPUT_FILE):
+        from link_resolver import resolve_files
+        resolve_files([OUTPUT_FILE])
+
 if __name__ == "__main__":
-    generate_ai_events()
+    parser = argparse.ArgumentParser(description="Fetch Major AI Events")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,124 @@
+import os
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_CACHE_FILE = ".fetch_cache.sqlite"
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class TeeResponse:
+    """Wraps a streamed requests.Response, keeping a copy of every chunk read from it."""
+
+    def __init__(self, response):
+        self.response = response
+        self.headers = response.headers
+        self.url = response.url
+        self.chunks = []
+
+    def iter_content(self, chunk_size):
+        for chunk in self.response.iter_content(chunk_size):
+            self.chunks.append(chunk)
+            yield chunk
+
+    @property
+    def body(self):
+        return b"".join(self.chunks)
+
+class FetchCache:
+    """
+    Per-URL store of validators (ETag / Last-Modified), the compressed page body,
+    the hash of the extracted text and the summary produced from it.
+
+    headers_for() turns the next fetch into a conditional request; a 304 is answered
+    from the stored body. When the extracted text hashes the same as last time, the
+    stored summary can be reused without calling Gemini. One SQLite file, shared by
+    the batch threads under a lock.
+    """
+
+    def __init__(self, path=None, enabled=True, refresh=False):
+        self.path = path or os.environ.get("FETCH_CACHE_FILE", DEFAULT_CACHE_FILE)
+        self.enabled = enabled and os.environ.get("FETCH_CACHE", "1") not in ("0", "off", "false")
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        self.conn = None
+        if self.enabled:
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "content_type TEXT, body BLOB, text_hash TEXT, summary_key TEXT, summary TEXT, fetched_at REAL)"
+            )
+            self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def get(self, url):
+        """Returns the stored row for url as a dict, or None."""
+        if self.conn is None:
+            return None
+        with self._lock:
+            cursor = self.conn.execute(
+                "SELECT etag, last_modified, content_type, body, text_hash, summary_key, summary FROM pages WHERE url = ?",
+                (url,))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ("etag", "last_modified", "content_type", "body", "text_hash", "summary_key", "summary")
+        return dict(zip(keys, row))
+
+    def headers_for(self, entry):
+        """Conditional request headers for a stored entry."""
+        if entry is None or self.refresh:
+            return {}
+        headers = {}
+        if entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def body_of(self, entry):
+        return zlib.decompress(entry["body"]) if entry and entry["body"] else b""
+
+    def store_page(self, url, response, body, extracted_hash):
+        """Records a 200 response: its validators, compressed body and extracted-text hash."""
+        if self.conn is None:
+            return
+        with self._lock:
+            # The stored summary survives only while the extracted text is unchanged
+            # (SET expressions see the row's old values)
+            self.conn.execute(
+                "INSERT INTO pages (url, etag, last_modified, content_type, body, text_hash, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, "
+                "last_modified = excluded.last_modified, content_type = excluded.content_type, body = excluded.body, "
+                "summary = CASE WHEN text_hash = excluded.text_hash THEN summary END, "
+                "summary_key = CASE WHEN text_hash = excluded.text_hash THEN summary_key END, "
+                "text_hash = excluded.text_hash, fetched_at = excluded.fetched_at",
+                (url, response.headers.get("ETag"), response.headers.get("Last-Modified"),
+                 response.headers.get("Content-Type"), zlib.compress(body), extracted_hash, time.time()))
+            self.conn.commit()
+
+    def cached_summary(self, entry, extracted_hash, summary_key):
+        """Returns the stored summary if it was made from the same text with the same settings."""
+        if entry is None or self.refresh or not entry["summary"]:
+            return None
+        if entry["text_hash"] == extracted_hash and entry["summary_key"] == summary_key:
+            return entry["summary"]
+        return None
+
+    def store_summary(self, url, extracted_hash, summary_key, summary):
+        if self.conn is None:
+            return
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO pages (url, text_hash, summary_key, summary, fetched_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET text_hash = excluded.text_hash, "
+                "summary_key = excluded.summary_key, summary = excluded.summary",
+                (url, extracted_hash, summary_key, summary, time.time()))
+            self.conn.commit()
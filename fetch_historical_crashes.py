@@ -1,79 +1,187 @@
 import os
+import argparse
 import csv
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from gemini_client import add_cache_arguments, configure_cache, create_client, generate_content, generate_content_stream, load_env
+from event_csv import stream_rows_to_csv, parse_event_rows, validate_row, dedup_rows, write_event_csv
+from near_duplicates import near_dedup_rows
+from prompt_templates import EVENT_RESEARCH_PREFIX, register_template
 
-# Load environment variables
-load_dotenv()
+# Grounded search over historical events; results are reused for 6 hours
+CACHE_TTL = 6 * 60 * 60
 
-def generate_historical_crashes():
+OUTPUT_FILE = "historical_crashes-gemini3.csv"
+
+# The column spec and category guides are the shared system instruction; the role, scope and quantity are sent per call
+PROMPT = register_template("historical_crashes", prefix=EVENT_RESEARCH_PREFIX, template="""
+    You are a financial historian. Use the category guide "歷史市場崩跌".
+
+    Task: Search for and extract a list of the {scope}
+
+    {quantity}
+    """)
+
+# Decade shards: (label, first year, last year)
+DECADES = [
+    ("1990-1999", 1990, 1999),
+    ("2000-2009", 2000, 2009),
+    ("2010-2019", 2010, 2019),
+    ("2020-Present", 2020, None),
+]
+
+MARKETS = {
+    "us": "Global (US)",
+    "tw": "Taiwan",
+}
+
+DEFAULT_SCOPE = "TOP 100 CRITICAL historical events from 1990 to the present that caused significant stock market drops (crashes, corrections, or bear markets) in either the Global (US) or Taiwan markets."
+
+DEFAULT_QUANTITY = """Quantity & Distribution: Find roughly 40 events in total, distributed as follows:
+    * 1990-1999: ~10 events
+    * 2000-2009: ~10 events
+    * 2010-2019: ~10 events
+    * 2020-Present: ~10 events"""
+
+def build_prompt(decade=None, market=None, count=None):
+    """Builds the per-call part of the prompt for the whole history, or for one decade and/or market shard."""
+    if decade is None and market is None:
+        return PROMPT.render(scope=DEFAULT_SCOPE, quantity=DEFAULT_QUANTITY)
+
+    period = f"between {decade[1]} and {decade[2] or 'the present'}" if decade else "from 1990 to the present"
+    markets = f"the {MARKETS[market]} market" if market else "either the Global (US) or Taiwan markets"
+    scope = (f"TOP {count} CRITICAL historical events {period} that caused significant stock market drops "
+             f"(crashes, corrections, or bear markets) in {markets}.")
+    quantity = f"Quantity: Find roughly {count} distinct events, all starting {period}."
+    return PROMPT.render(scope=scope, quantity=quantity)
+
+def build_shards(by_decade=True, by_market=False):
+    """Returns the (decade, market) combinations to query."""
+    decades = DECADES if by_decade else [None]
+    markets = list(MARKETS) if by_market else [None]
+    return [(decade, market) for decade in decades for market in markets]
+
+def in_decade(row, decade):
+    """Returns True if the row's 開始日期 falls inside the decade shard."""
+    year = int(row[3].strip()[:4])
+    return year >= decade[1] and (decade[2] is None or year <= decade[2])
+
+def generate_sharded(client, config, output_file, by_decade=True, by_market=False, target=100, workers=4, structured=False):
+    """Queries each decade/market shard concurrently, then merges, dedups and sorts the results by 開始日期."""
+    shards = build_shards(by_decade, by_market)
+    per_shard = math.ceil(target / len(shards))
+    print(f"Sending {len(shards)} shard requests (~{per_shard} events each, {workers} at a time)...")
+    results = [[] for _ in shards]
+
+    def run_shard(i):
+        decade, market = shards[i]
+        label = " / ".join(x for x in ((decade[0] if decade else None), (MARKETS[market] if market else None)) if x)
+        started = time.perf_counter()
+        try:
+            if structured:
+                from structured_events import generate_structured_rows
+                rows = generate_structured_rows(client, build_prompt(decade, market, per_shard), config,
+                                                ttl=CACHE_TTL, site="fetch_historical_crashes.generate_sharded")
+            else:
+                response = generate_content(
+                    client,
+                    model="gemini-2.5-flash",
+                    contents=build_prompt(decade, market, per_shard),
+                    config=config,
+                    ttl=CACHE_TTL,
+                    site="fetch_historical_crashes.generate_sharded",
+                )
+                rows = [row for row in parse_event_rows(response.text or "") if not validate_row(row, require_link=False)]
+        except Exception as e:
+            print(f"  Shard {label} failed after {time.perf_counter() - started:.1f}s: {e}")
+            return
+        if decade:
+            rows = [row for row in rows if in_decade(row, decade)]
+        print(f"  Shard {label}: {len(rows)} events in {time.perf_counter() - started:.1f}s")
+        results[i] = rows
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run_shard, range(len(shards))))
+
+    merged = dedup_rows(row for rows in results for row in rows)
+    # Shards overlap at decade and market edges, where the same crash comes back reworded
+    merged = near_dedup_rows(merged)
+    merged.sort(key=lambda row: row[3])
+    write_event_csv(output_file, merged)
+    print(f"Successfully generated '{output_file}' with {len(merged)} events.")
+
+def generate_historical_crashes(stream=False, by_decade=False, by_market=False, target=100, workers=4, structured=False):
+    # Load environment variables
+    load_env()
     api_key = os.environ.get("GEMINI_API_KEY")
     if not api_key:
         print("Error: GEMINI_API_KEY environment variable not set.")
         return
 
-    client = genai.Client(api_key=api_key)
+    client = create_client(api_key)
 
     print("Fetching historical market crash events (1990-Present)...")
 
-    prompt = """
-    You are a financial historian.
-    
-    Task: Search for and extract a list of the TOP 100 CRITICAL historical events from 1990 to the present that caused significant stock market drops (crashes, corrections, or bear markets) in either the Global (US) or Taiwan markets.
-    
-    Focus on these specific Categories (類別) and Sub-categories (子類別):
-    
-    1. 金融危機 (Financial Crisis):
-       - 亞洲金融風暴 (Asian Financial Crisis)
-       - 網路泡沫 (Dot-com Bubble)
-       - 次貸危機 (Subprime Crisis / Global Financial Crisis)
-       - 歐債危機 (European Debt Crisis)
-       - 銀行倒閉 (Bank Failure)
-    
-    2. 公共衛生 (Public Health):
-       - 傳染病爆發 (Pandemic) - e.g., SARS, COVID-19
-    
-    3. 地緣政治 (Geopolitics):
-       - 恐怖攻擊 (Terrorist Attack) - e.g., 911
-       - 戰爭衝突 (War & Conflict) - e.g., Persian Gulf War, Russia-Ukraine
-       - 貿易戰 (Trade War)
-       - 政治黑天鵝 (Political Black Swan) - e.g., Brexit, 1996 Taiwan Strait Crisis (台海飛彈危機)
-    
-    4. 自然災害 (Natural Disaster):
-       - 重大震災 (Major Earthquake) - e.g., 921 Earthquake, 311 Japan Earthquake
-    
-    5. 政策衝擊 (Policy Shock):
-       - 貨幣政策 (Monetary Policy) - e.g., Aggressive Rate Hikes
-       - 證所稅事件 (Stock Transaction Tax) - Specific to Taiwan (1990)
-    
-    Output Format:
-    Produce a valid CSV file content with the following headers:
-    "類別", "子類別", "事件名稱", "開始日期", "結束日期", "備註", "Link1", "Link2"
-    
-    Requirements:
-    - Language: All text must be in Traditional Chinese (繁體中文).
-    - Dates: Format YYYY-MM-DD.
-    - "備註" (Note): Briefly explain the impact (e.g., "跌幅達...").
-    - "Link1": MANDATORY. Provide a reliable source URL.
-    - Quantity & Distribution: Find roughly 40 events in total, distributed as follows:
-        * 1990-1999: ~10 events
-        * 2000-2009: ~10 events
-        * 2010-2019: ~10 events
-        * 2020-Present: ~10 events
-    - Do not include markdown code block markers.
-    """
+    prompt = build_prompt()
+
+    output_file = OUTPUT_FILE
+    from google.genai import types
+    config = PROMPT.config(types.GenerateContentConfig(
+        tools=[types.Tool(google_search=types.GoogleSearch())],
+        response_modalities=["TEXT"]
+    ))
+
+    if by_decade or by_market:
+        # Sharded mode: smaller concurrent requests per decade and/or market
+        try:
+            generate_sharded(client, config, output_file, by_decade, by_market, target, workers, structured)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        return
+
+    if structured:
+        # Typed JSON records validated in one pass; only invalid rows are re-requested
+        from structured_events import generate_structured_rows
+        print("Requesting structured event records from Gemini 2.5 Flash...")
+        try:
+            rows = generate_structured_rows(client, prompt, config, ttl=CACHE_TTL, site="fetch_historical_crashes.generate_historical_crashes")
+            write_event_csv(output_file, rows)
+            print(f"Successfully generated '{output_file}' with {len(rows)} events.")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+        return
+
+    if stream:
+        # Streaming mode: validate and flush each CSV row as soon as it arrives,
+        # so a failure late in the generation keeps everything written so far.
+        print("Streaming response from Gemini 2.5 Flash...")
+        try:
+            chunks = generate_content_stream(
+                client,
+                model="gemini-2.5-flash",
+                contents=prompt,
+                config=config,
+                ttl=CACHE_TTL,
+                site="fetch_historical_crashes.generate_historical_crashes",
+            )
+            written, skipped = stream_rows_to_csv(chunks, output_file)
+            print(f"Successfully streamed {written} events to '{output_file}' ({skipped} invalid rows skipped).")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            print(f"Rows received before the error were kept in '{output_file}'.")
+        return
 
     print("Sending request to Gemini 2.5 Flash...")
     
     try:
-        response = client.models.generate_content(
+        response = generate_content(
+            client,
             model="gemini-2.5-flash",
             contents=prompt,
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(google_search=types.GoogleSearch())],
-                response_modalities=["TEXT"]
-            )
+            config=config,
+            ttl=CACHE_TTL,
+            site="fetch_historical_crashes.generate_historical_crashes",
         )
         
         csv_content = response.text.strip()
@@ -81,8 +189,6 @@ def generate_historical_crashes():
         # Clean up markdown
         if csv_content.startswith("```"):
             csv_content = csv_content.strip("`").replace("csv\n", "", 1)
-
-        output_file = "historical_crashes-gemini3.csv"
         
         with open(output_file, "w", encoding="utf-8-sig", newline="") as f:
             f.write(csv_content)
@@ -95,5 +201,26 @@ def generate_historical_crashes():
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def add_arguments(parser):
+    parser.add_argument("--stream", action="store_true", help="Stream the response and write each validated row as it arrives")
+    parser.add_argument("--structured", action="store_true", help="Request typed JSON records instead of free-text CSV and re-request only invalid rows")
+    parser.add_argument("--by-decade", action="store_true", help="Issue one concurrent request per decade and merge the results")
+    parser.add_argument("--by-market", action="store_true", help="Also split each request by market (US / Taiwan)")
+    parser.add_argument("--target", type=int, default=100, help="Total number of events to aim for in sharded mode")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent shard requests")
+    parser.add_argument("--resolve-links", action="store_true", help="Afterwards replace grounding-redirect links with the publisher URLs (link_resolver.py)")
+    add_cache_arguments(parser)
+
+def main(args):
+    configure_cache(args)
+
+    generate_historical_crashes(args.stream, args.by_decade, args.by_market, args.target, args.workers, args.structured)
+
+    if args.resolve_links and os.path.exists(OUTPUT_FILE):
+        from link_resolver import resolve_files
+        resolve_files([OUTPUT_FILE])
+
 if __name__ == "__main__":
-    generate_historical_crashes()
+    parser = argparse.ArgumentParser(description="Fetch Historical Market Crashes")
+    add_arguments(parser)
+    main(parser.parse_args())
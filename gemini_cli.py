@@ -0,0 +1,48 @@
+import sys
+import argparse
+import importlib
+
+# Subcommand -> (script module, help). Script modules keep google-genai, googleapiclient,
+# bs4 and dotenv imports inside the functions that use them, so importing one to
+# register its arguments is cheap and `--help` never loads the SDKs.
+SUBCOMMANDS = {
+    "models": ("list_models", "List the Gemini models available to your API key"),
+    "quota": ("check_quota", "Show Gemini API quotas for a Google Cloud project"),
+    "summarize": ("summarize_url", "Summarize one web page or a batch of URLs"),
+    "events": ("stock_events_poc", "Extract market events into market_events.csv"),
+    "crashes": ("fetch_historical_crashes", "Generate historical_crashes-gemini3.csv"),
+    "ai-events": ("fetch_ai_events", "Generate AI-event-gemini3.csv"),
+    "generate": ("genai", "Run the basic generation demo"),
+    "store": ("event_store", "Index the event CSVs and query them by date window"),
+    "links": ("link_resolver", "Resolve grounding-redirect links in the event CSVs"),
+    "daemon": ("gemini_daemon", "Run the scheduled jobs in one resident process"),
+}
+
+def build_parser(selected=None):
+    """
+    Builds the top-level parser. When `selected` names a subcommand only that
+    script module is imported; otherwise every subcommand is registered.
+    """
+    parser = argparse.ArgumentParser(prog="gemini-cli", description="Gemini workspace command line")
+    subparsers = parser.add_subparsers(dest="command", metavar="command")
+    for name, (module_name, help_text) in SUBCOMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        if selected is None or name == selected:
+            module = importlib.import_module(module_name)
+            module.add_arguments(subparser)
+            subparser.set_defaults(handler=module.main)
+    return parser
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    selected = next((arg for arg in argv if arg in SUBCOMMANDS), None)
+    parser = build_parser(selected)
+    args = parser.parse_args(argv)
+    if not getattr(args, "handler", None):
+        parser.print_help()
+        return 1
+    args.handler(args)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
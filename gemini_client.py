@@ -0,0 +1,230 @@
+import os
+import time
+import itertools
+import threading
+from response_cache import ResponseCache
+from rate_limiter import RateLimiter, estimate_tokens
+from telemetry import Telemetry
+from context_cache import ContextCache
+
+# Shared response cache used by every generate_content call in the workspace
+response_cache = ResponseCache()
+
+# Shared client-side limiter fed by the limits check_quota.py saves
+rate_limiter = RateLimiter()
+
+# Per-call token / latency log (.gemini_telemetry.jsonl)
+telemetry = Telemetry()
+
+# Explicit context caches for system-instruction prefixes (.gemini_context_cache.json)
+context_cache = ContextCache()
+
+_env_loaded = False
+
+# Variables set before .env was first loaded; a reload never overrides them
+_outside_env = None
+
+# (API key, base URL) -> client, once share_clients() has been called
+_shared_clients = None
+_clients_lock = threading.Lock()
+
+def load_env(reload=False):
+    """
+    Loads environment variables from .env once (python-dotenv is imported on first use).
+    `reload` re-reads the file, still leaving variables set outside it alone.
+    """
+    global _env_loaded, _outside_env
+    if _env_loaded and not reload:
+        return
+    from dotenv import dotenv_values
+    if _outside_env is None:
+        _outside_env = set(os.environ)
+    for name, value in dotenv_values().items():
+        if name not in _outside_env and value is not None:
+            os.environ[name] = value
+    _env_loaded = True
+
+def share_clients():
+    """
+    Makes create_client return one client per (API key, endpoint) for the rest of the
+    process, so a long-running host (gemini_daemon.py) reuses its connection pool across jobs.
+    """
+    global _shared_clients
+    with _clients_lock:
+        if _shared_clients is None:
+            _shared_clients = {}
+
+def _build_client(api_key, base_url):
+    from google import genai
+    http_options = None
+    if base_url:
+        from google.genai import types
+        http_options = types.HttpOptions(base_url=base_url)
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+def create_client(api_key=None):
+    """
+    Builds a genai.Client, deferring the google-genai import until a client is needed.
+
+    GEMINI_BASE_URL points the client at another endpoint (e.g. the offline benchmark's mock server).
+    After share_clients() an existing client for the same key and endpoint is returned instead.
+    """
+    api_key = api_key or os.environ.get("GEMINI_API_KEY")
+    base_url = os.environ.get("GEMINI_BASE_URL")
+    if _shared_clients is None:
+        return _build_client(api_key, base_url)
+    with _clients_lock:
+        if (api_key, base_url) not in _shared_clients:
+            _shared_clients[(api_key, base_url)] = _build_client(api_key, base_url)
+        return _shared_clients[(api_key, base_url)]
+
+def is_shared(client):
+    """True for a client handed out by create_client after share_clients(); its owner is the process, so callers must not close it."""
+    with _clients_lock:
+        return _shared_clients is not None and any(shared is client for shared in _shared_clients.values())
+
+def reload_shared_state():
+    """
+    Re-reads .env and the settings of the shared response cache, rate limiter and context
+    cache, and clears the --no-cache / --refresh switches of the previous run. Used by
+    gemini_daemon.py between jobs; telemetry settings are kept.
+    """
+    load_env(reload=True)
+    response_cache.reload()
+    rate_limiter.reload()
+    context_cache.reload()
+
+def add_cache_arguments(parser):
+    """Adds the --no-cache / --refresh switches to an argparse parser."""
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the local Gemini response cache")
+    parser.add_argument("--refresh", action="store_true", help="Ignore cached responses and overwrite them with fresh ones")
+
+def configure_cache(args):
+    """Applies the parsed --no-cache / --refresh switches to the shared cache."""
+    if getattr(args, "no_cache", False):
+        response_cache.enabled = False
+    if getattr(args, "refresh", False):
+        response_cache.refresh = True
+
+def request_tokens(contents, config=None):
+    """Estimated prompt tokens of a request, including its system instruction."""
+    instruction = config.get("system_instruction") if isinstance(config, dict) else getattr(config, "system_instruction", None)
+    return estimate_tokens(contents) + (estimate_tokens(instruction) if instruction else 0)
+
+def report_prefix_cache(response, site, model, wall_time, first_chunk_time=None):
+    """Prints how much of the prompt was served from a context cache, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    cached = getattr(usage, "cached_content_token_count", None) if usage is not None else None
+    if cached:
+        first = f", first chunk {first_chunk_time:.2f}s" if first_chunk_time is not None else ""
+        print(f"(context cache: {cached} of {usage.prompt_token_count} input tokens cached for {site or model}, "
+              f"{wall_time:.2f}s{first})")
+
+def generate_content(client, model, contents, config=None, ttl=None, site=None):
+    """
+    Calls client.models.generate_content through the shared response cache and rate limiter.
+
+    `ttl` is how long (in seconds) a response stays valid for this call site;
+    `site` is a short label stored with the entry and in the telemetry log.
+    A system instruction in `config` is sent through the shared context cache.
+    """
+    started = time.perf_counter()
+    key = response_cache.make_key(model, contents, config)
+    cached = response_cache.get(key)
+    if cached is not None:
+        print(f"(cache hit: {site or model})")
+        telemetry.record(model, site, wall_time=time.perf_counter() - started, cached=True)
+        return cached
+
+    try:
+        response, retries = rate_limiter.call(
+            model,
+            lambda: context_cache.run(client, model, config, site, lambda request_config:
+                                      client.models.generate_content(model=model, contents=contents, config=request_config)),
+            estimated_tokens=request_tokens(contents, config),
+        )
+    except Exception as e:
+        telemetry.record(model, site, wall_time=time.perf_counter() - started, error=e)
+        raise
+    telemetry.record(model, site, response, time.perf_counter() - started, retries)
+    report_prefix_cache(response, site, model, time.perf_counter() - started)
+    if response.candidates:
+        response_cache.put(key, response, ttl=ttl, site=site)
+    return response
+
+async def generate_content_async(client, model, contents, config=None, ttl=None, site=None):
+    """
+    Async counterpart of generate_content through client.aio, sharing its cache,
+    rate limiter and telemetry.
+    """
+    started = time.perf_counter()
+    key = response_cache.make_key(model, contents, config)
+    cached = response_cache.get(key)
+    if cached is not None:
+        print(f"(cache hit: {site or model})")
+        telemetry.record(model, site, wall_time=time.perf_counter() - started, cached=True)
+        return cached
+
+    try:
+        response, retries = await rate_limiter.call_async(
+            model,
+            lambda: context_cache.run_async(client, model, config, site, lambda request_config:
+                                            client.aio.models.generate_content(model=model, contents=contents, config=request_config)),
+            estimated_tokens=request_tokens(contents, config),
+        )
+    except Exception as e:
+        telemetry.record(model, site, wall_time=time.perf_counter() - started, error=e)
+        raise
+    telemetry.record(model, site, response, time.perf_counter() - started, retries)
+    report_prefix_cache(response, site, model, time.perf_counter() - started)
+    if response.candidates:
+        response_cache.put(key, response, ttl=ttl, site=site)
+    return response
+
+def generate_content_stream(client, model, contents, config=None, ttl=None, site=None):
+    """
+    Streaming counterpart of generate_content: yields response chunks as they arrive.
+
+    Shares cache entries with generate_content (a hit is yielded as a single chunk,
+    a completed stream is stored as one response). The rate limiter only retries
+    429s raised before the first chunk, since a partial stream cannot be replayed.
+    """
+    started = time.perf_counter()
+    key = response_cache.make_key(model, contents, config)
+    cached = response_cache.get(key)
+    if cached is not None:
+        print(f"(cache hit: {site or model})")
+        telemetry.record(model, site, wall_time=time.perf_counter() - started, cached=True)
+        yield cached
+        return
+
+    def start(request_config):
+        stream = client.models.generate_content_stream(model=model, contents=contents, config=request_config)
+        return next(stream, None), stream
+
+    try:
+        (first, stream), retries = rate_limiter.call(model, lambda: context_cache.run(client, model, config, site, start),
+                                                     estimated_tokens=request_tokens(contents, config))
+    except Exception as e:
+        telemetry.record(model, site, wall_time=time.perf_counter() - started, error=e)
+        raise
+    first_chunk_time = time.perf_counter() - started
+    if first is None:
+        return
+
+    texts = []
+    last = first
+    for chunk in itertools.chain([first], stream):
+        last = chunk
+        if chunk.text:
+            texts.append(chunk.text)
+        yield chunk
+    telemetry.record(model, site, last, time.perf_counter() - started, retries, first_chunk_time=first_chunk_time)
+    report_prefix_cache(last, site, model, time.perf_counter() - started, first_chunk_time)
+
+    from google.genai import types
+    response_cache.put(key, types.GenerateContentResponse(
+        candidates=[types.Candidate(content=types.Content(role="model", parts=[types.Part(text="".join(texts))]))],
+        usage_metadata=last.usage_metadata,
+        model_version=last.model_version,
+    ), ttl=ttl, site=site)
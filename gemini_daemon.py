@@ -0,0 +1,366 @@
+import json
+import time
+import shlex
+import signal
+import argparse
+import datetime
+import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from gemini_client import load_env, reload_shared_state, share_clients
+from readme_writer import defer_updates, flush_updates
+from gemini_cli import SUBCOMMANDS
+
+DEFAULT_PORT = 8765
+
+# Job -> (gemini_cli subcommand, arguments, schedule). Schedules are UTC cron expressions,
+# like the GitHub workflows (check_quota.yml, stock_events.yml) they stand in for.
+DEFAULT_JOBS = {
+    "events": ("events", ["--update-readme"], "0 1 * * 1"),
+    "quota": ("quota", ["--update-readme"], "0 0 * * 1"),
+    "models": ("models", ["--update-readme"], "30 0 * * *"),
+    "ai-events": ("ai-events", [], "0 2 * * 1"),
+    "crashes": ("crashes", [], "0 3 * * 1"),
+}
+
+ALIASES = {"@hourly": "0 * * * *", "@daily": "0 0 * * *", "@weekly": "0 0 * * 0", "@monthly": "0 0 1 * *"}
+
+# (low, high) of minute, hour, day of month, month, day of week (0 = Sunday; 7 is accepted too)
+FIELD_RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+UNITS = {"s": 1, "m": 60, "h": 3600}
+
+def parse_field(text, low, high):
+    """Returns the set of values matched by one cron field (`*`, `*/n`, `a`, `a-b`, `a-b/n`, comma lists)."""
+    values = set()
+    for part in text.split(","):
+        spec, _, step = part.partition("/")
+        if spec == "*":
+            first, last = low, high
+        elif "-" in spec:
+            first, last = (int(value) for value in spec.split("-", 1))
+        else:
+            first = last = int(spec)
+            if step:
+                last = high
+        step = int(step) if step else 1
+        if not (low <= first <= last <= high) or step < 1:
+            raise ValueError(f"'{part}' is out of range {low}-{high}")
+        values.update(range(first, last + 1, step))
+    return values
+
+class Schedule:
+    """
+    A five-field cron expression (evaluated in UTC), one of @hourly / @daily / @weekly /
+    @monthly, or `@every <n>s|m|h` for a fixed interval.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.interval = None
+        text = ALIASES.get(expression.strip(), expression.strip())
+        if text.startswith("@every"):
+            value = text[len("@every"):].strip()
+            if not value or value[-1] not in UNITS or not value[:-1].isdigit() or int(value[:-1]) < 1:
+                raise ValueError(f"'{expression}' is not '@every <n>s|m|h'")
+            self.interval = int(value[:-1]) * UNITS[value[-1]]
+            return
+        fields = text.split()
+        if len(fields) != 5:
+            raise ValueError(f"'{expression}' does not have 5 fields")
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_field(field, low, high) for field, (low, high) in zip(fields, FIELD_RANGES))
+        self.weekdays = {day % 7 for day in weekdays}
+        # As in cron, a restricted day of month and day of week match when either does
+        self.any_day = fields[2] == "*" or fields[4] == "*"
+
+    def _day_matches(self, moment):
+        if moment.month not in self.months:
+            return False
+        in_month = moment.day in self.days
+        in_week = (moment.weekday() + 1) % 7 in self.weekdays
+        return (in_month and in_week) if self.any_day else (in_month or in_week)
+
+    def next_after(self, timestamp):
+        """Returns the first time after `timestamp` (epoch seconds) the schedule fires."""
+        if self.interval:
+            return timestamp + self.interval
+        moment = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(second=0, microsecond=0)
+        moment += datetime.timedelta(minutes=1)
+        limit = moment + datetime.timedelta(days=5 * 366)
+        while moment < limit:
+            if not self._day_matches(moment):
+                moment = (moment + datetime.timedelta(days=1)).replace(hour=0, minute=0)
+            elif moment.hour not in self.hours:
+                moment = (moment + datetime.timedelta(hours=1)).replace(minute=0)
+            elif moment.minute not in self.minutes:
+                moment += datetime.timedelta(minutes=1)
+            else:
+                return moment.timestamp()
+        raise ValueError(f"'{self.expression}' never fires")
+
+class Job:
+    """One scheduled subcommand and its run history."""
+
+    def __init__(self, name, command, argv, schedule):
+        self.name = name
+        self.command = command
+        self.argv = argv
+        self.schedule = schedule
+        module_name = SUBCOMMANDS[command][0]
+        self.module = importlib.import_module(module_name)
+        parser = argparse.ArgumentParser(prog=f"{module_name}.py")
+        self.module.add_arguments(parser)
+        # Parse once up front so a bad argument fails at startup, not at 1 a.m. on Monday
+        self.args = parser.parse_args(argv)
+        # --no-cache / --refresh switch the shared response cache, so such a job runs alone
+        self.exclusive = bool(getattr(self.args, "no_cache", False) or getattr(self.args, "refresh", False))
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started = None
+        self.last_finished = None
+        self.last_status = None
+        self.last_error = None
+        self.next_run = schedule.next_after(time.time())
+
+    def run(self):
+        """Runs the subcommand in this thread; returns (status, error)."""
+        try:
+            self.module.main(self.args)
+            return "ok", None
+        except SystemExit as e:
+            # The scripts exit(1) on configuration errors
+            return ("ok", None) if not e.code else ("failed", f"exit status {e.code}")
+        except Exception as e:
+            return "failed", f"{type(e).__name__}: {e}"
+
+    def status(self):
+        def iso(timestamp):
+            return datetime.datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+        duration = self.last_finished - self.last_started if self.last_finished and not self.running else None
+        return {
+            "command": " ".join([self.command] + self.argv),
+            "schedule": self.schedule.expression,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_started": iso(self.last_started),
+            "last_finished": iso(self.last_finished),
+            "last_duration": round(duration, 2) if duration is not None else None,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "next_run": iso(self.next_run),
+        }
+
+class Scheduler:
+    """
+    Runs jobs on their schedules in a thread pool, so independent jobs overlap. A job
+    that is still running when it comes due again is skipped rather than queued.
+    All jobs share this process's Gemini client, caches, rate limiter and telemetry;
+    a job starting while no other job runs first reloads .env and their settings, and
+    a job with --no-cache / --refresh waits for the others and runs alone. README
+    sections the jobs update are queued and written in one pass whenever the last
+    running job finishes.
+    """
+
+    def __init__(self, jobs, workers=None):
+        self.jobs = {job.name: job for job in jobs}
+        self.pool = ThreadPoolExecutor(max_workers=workers or len(jobs), thread_name_prefix="job")
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.active = 0
+        self.exclusive_active = False
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.started = time.time()
+
+    def trigger(self, name):
+        """Starts a job now; returns False if it is already running."""
+        job = self.jobs[name]
+        with self.lock:
+            if job.running:
+                return False
+            job.running = True
+            job.runs += 1
+            job.last_started = time.time()
+        print(f"[daemon] {name}: started ({job.status()['command']})")
+        self.pool.submit(self._run, job)
+        return True
+
+    def _start(self, job):
+        """Waits until `job` may run alongside the active ones, reloading the shared state when none are."""
+        with self.idle:
+            while self.exclusive_active or (job.exclusive and self.active):
+                self.idle.wait()
+            if not self.active:
+                reload_shared_state()
+            self.active += 1
+            self.exclusive_active = job.exclusive
+
+    def _run(self, job):
+        self._start(job)
+        try:
+            status, error = job.run()
+        finally:
+            with self.idle:
+                self.active -= 1
+                self.exclusive_active = False
+                idle = not self.active
+                self.idle.notify_all()
+            if idle:
+                flush_updates()
+        with self.lock:
+            job.running = False
+            job.last_finished = time.time()
+            job.last_status = status
+            job.last_error = error
+            if status != "ok":
+                job.failures += 1
+        suffix = f": {error}" if error else ""
+        print(f"[daemon] {job.name}: {status} in {job.last_finished - job.last_started:.1f}s{suffix}")
+
+    def status(self):
+        with self.lock:
+            return {
+                "started": datetime.datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+                "jobs": {name: job.status() for name, job in self.jobs.items()},
+            }
+
+    def stop(self):
+        self.stopping.set()
+        self.wakeup.set()
+
+    def run_forever(self):
+        while not self.stopping.is_set():
+            now = time.time()
+            for job in self.jobs.values():
+                if job.next_run > now:
+                    continue
+                job.next_run = job.schedule.next_after(now)
+                if not self.trigger(job.name):
+                    with self.lock:
+                        job.skipped += 1
+                    print(f"[daemon] {job.name}: still running, skipped this run")
+            self.wakeup.wait(max(0, min(job.next_run for job in self.jobs.values()) - time.time()))
+            self.wakeup.clear()
+        print("[daemon] Stopping; waiting for running jobs...")
+        self.pool.shutdown(wait=True)
+        flush_updates()
+
+class ControlHandler(BaseHTTPRequestHandler):
+    """GET /status, POST /jobs/<name>/run, POST /shutdown."""
+
+    scheduler = None
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") in ("", "/status"):
+            self._reply(200, self.scheduler.status())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        if parts == ["shutdown"]:
+            self._reply(202, {"stopping": True})
+            self.scheduler.stop()
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "run":
+            if parts[1] not in self.scheduler.jobs:
+                self._reply(404, {"error": f"unknown job '{parts[1]}'"})
+            elif self.scheduler.trigger(parts[1]):
+                self._reply(202, {"started": parts[1]})
+            else:
+                self._reply(409, {"error": f"'{parts[1]}' is already running"})
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def log_message(self, format, *args):
+        pass
+
+def parse_assignments(values, option):
+    """Turns ['name=value', ...] into a dict, checking the job names."""
+    result = {}
+    for value in values or []:
+        name, sep, rest = value.partition("=")
+        if not sep or name not in DEFAULT_JOBS:
+            print(f"Error: {option} expects JOB=VALUE with JOB one of {', '.join(DEFAULT_JOBS)} (got '{value}').")
+            exit(1)
+        result[name] = rest
+    return result
+
+def add_arguments(parser):
+    parser.add_argument("--jobs", help=f"Comma-separated jobs to host (default: {','.join(DEFAULT_JOBS)})")
+    parser.add_argument("--schedule", action="append", metavar="JOB=EXPR", help="Override a job's schedule: cron fields (UTC), @daily etc. or '@every 30m' (repeatable)")
+    parser.add_argument("--job-args", action="append", metavar="JOB=ARGS", help="Replace a job's subcommand arguments, e.g. events='--shard-days 7' (repeatable)")
+    parser.add_argument("--workers", type=int, help="Jobs run concurrently at most (default: one per job)")
+    parser.add_argument("--host", default="127.0.0.1", help="Control endpoint address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Control endpoint port; 0 disables it (default: {DEFAULT_PORT})")
+    parser.add_argument("--run-now", action="store_true", help="Run every job once at startup, then follow the schedules")
+
+def main(args):
+    names = [name.strip() for name in args.jobs.split(",")] if args.jobs else list(DEFAULT_JOBS)
+    unknown = [name for name in names if name not in DEFAULT_JOBS]
+    if unknown:
+        print(f"Error: unknown job(s) {', '.join(unknown)}; choose from {', '.join(DEFAULT_JOBS)}.")
+        exit(1)
+    schedules = parse_assignments(args.schedule, "--schedule")
+    job_args = parse_assignments(args.job_args, "--job-args")
+
+    jobs = []
+    for name in names:
+        command, argv, expression = DEFAULT_JOBS[name]
+        try:
+            schedule = Schedule(schedules.get(name, expression))
+        except ValueError as e:
+            print(f"Error: bad schedule for '{name}': {e}")
+            exit(1)
+        try:
+            argv = shlex.split(job_args[name]) if name in job_args else argv
+            jobs.append(Job(name, command, argv, schedule))
+        except ValueError as e:
+            print(f"Error: job '{name}': {e}")
+            exit(1)
+
+    # One .env load and one Gemini client (and connection pool) for every job;
+    # their README sections go through one shared writer
+    load_env()
+    share_clients()
+    defer_updates()
+
+    scheduler = Scheduler(jobs, args.workers)
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: scheduler.stop())
+
+    server = None
+    if args.port:
+        ControlHandler.scheduler = scheduler
+        server = ThreadingHTTPServer((args.host, args.port), ControlHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[daemon] Control endpoint on http://{args.host}:{server.server_address[1]}/status")
+
+    for job in jobs:
+        print(f"[daemon] {job.name}: '{job.schedule.expression}', next run {job.status()['next_run']}")
+    if args.run_now:
+        for job in jobs:
+            scheduler.trigger(job.name)
+
+    scheduler.run_forever()
+    if server:
+        server.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Host the workspace jobs on an in-process scheduler with a local control endpoint")
+    add_arguments(parser)
+    main(parser.parse_args())
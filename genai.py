@@ -1,71 +1,192 @@
-import os
-import argparse
-import datetime # Import datetime
-from google import genai
-from dotenv import load_dotenv # Import load_dotenv
-
-def update_readme(content, start_marker, end_marker):
-    """Updates the README.md file between specific markers."""
-    readme_path = "README.md"
-    try:
-        with open(readme_path, "r", encoding="utf-8") as f:
-            readme_content = f.read()
-        
-        start_pos = readme_content.find(start_marker)
-        end_pos = readme_content.find(end_marker)
-        
-        if start_pos == -1 or end_pos == -1:
-            print(f"Warning: Markers {start_marker} and {end_marker} not found in {readme_path}")
-            return
-
-        # Generate timestamp
-        now = datetime.datetime.now()
-        timestamp_str = now.strftime("產生時間: %Y-%m-%d %H:%M:%S") + " CST"
-
-
-        new_content = (
-            readme_content[:start_pos + len(start_marker)]
-            + f"\n{timestamp_str}\n\n```text\n" + content + "\n```\n"
-            + readme_content[end_pos:]
-        )
-        
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_content)
-            
-        print(f"Successfully updated {readme_path}")
-        
-    except Exception as e:
-        print(f"Error updating README: {e}")
-
-# Load environment variables from .env file
-load_dotenv()
-
-# Retrieve API key from environment variable
-api_key = os.environ.get("GEMINI_API_KEY")
-if not api_key:
-    raise ValueError("GEMINI_API_KEY environment variable not set")
-
-client = genai.Client(api_key=api_key)
-
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Basic GenAI Test")
-    parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
-    args = parser.parse_args()
-    
-    output_buffer = []
-
-    response1 = client.models.generate_content(
-        model="gemini-2.5-flash", contents="Explain how AI works in a 100+ words in traditional chinese"
-    )
-    print(response1.text)
-    output_buffer.append("--- AI Explanation ---\n" + response1.text)
-
-    response2 = client.models.generate_content(
-        model="gemini-2.5-flash", contents="provide python code how to know the quota of google genai api"
-    )
-    print(response2.text)
-    output_buffer.append("\n--- Quota Code Example ---\n" + response2.text)
-    
-    if args.update_readme:
-        full_output = "\n".join(output_buffer)
-        update_readme(full_output, "<!-- START_GENAI_OUTPUT -->", "<!-- END_GENAI_OUTPUT -->")
\ No newline at end of file
+import os
+import json
+import time
+import asyncio
+import argparse
+from readme_writer import update_readme
+from gemini_client import add_cache_arguments, configure_cache, create_client, generate_content_async, is_shared, load_env
+
+# The demo prompts are static, so their responses can be reused for days
+CACHE_TTL = 3 * 24 * 60 * 60
+
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# (call site, README heading, prompt) for the demo run
+DEMO_PROMPTS = [
+    ("genai.explain", "--- AI Explanation ---", "Explain how AI works in a 100+ words in traditional chinese"),
+    ("genai.quota_code", "--- Quota Code Example ---", "provide python code how to know the quota of google genai api"),
+]
+
+def add_arguments(parser):
+    parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
+    parser.add_argument("--batch", metavar="FILE", help="JSONL file of prompts to run instead of the demo prompts")
+    parser.add_argument("--output", default="genai_results.jsonl", help="JSONL file for batch results")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Model for batch items that do not name one")
+    parser.add_argument("--concurrency", type=int, default=8, help="Batch requests in flight at once")
+    parser.add_argument("--ordered", action="store_true", help="Write batch results in input order instead of as they complete")
+    parser.add_argument("--resume", action="store_true", help="Keep the results already in --output and only run the missing or failed items")
+    add_cache_arguments(parser)
+
+def read_prompts(path):
+    """
+    Reads batch items from JSONL. A line is either a JSON string (the prompt) or an
+    object with "prompt" (or "contents") and optional "id", "model" and "config".
+    Items without an id are numbered by line.
+    """
+    items = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON ({e})")
+            if isinstance(item, str):
+                item = {"prompt": item}
+            contents = item.get("prompt", item.get("contents"))
+            if not contents:
+                raise ValueError(f"{path}:{number}: missing \"prompt\"")
+            items.append({
+                "id": str(item.get("id", number)),
+                "index": len(items),
+                "contents": contents,
+                "model": item.get("model"),
+                "config": item.get("config"),
+            })
+    return items
+
+def load_finished(path):
+    """
+    Returns the ids that already have a successful result in `path`.
+
+    A line cut off by an interrupted run is dropped from the file so new results
+    can be appended after it.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return set()
+    if data and not data.endswith(b"\n"):
+        data = data[:data.rfind(b"\n") + 1]
+        with open(path, "wb") as f:
+            f.write(data)
+    finished = set()
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if "error" not in record:
+            finished.add(record.get("id"))
+    return finished
+
+async def run_item(client, item, semaphore, default_model):
+    """Runs one batch item and returns its result record."""
+    model = item["model"] or default_model
+    record = {"id": item["id"], "index": item["index"], "model": model}
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            response = await generate_content_async(client, model, item["contents"], item["config"], site="genai.batch")
+        except Exception as e:
+            record["error"] = str(e)
+            return record
+    candidate = response.candidates[0] if response.candidates else None
+    usage = response.usage_metadata
+    record.update({
+        "seconds": round(time.perf_counter() - start, 3),
+        "finish_reason": getattr(candidate.finish_reason, "value", candidate.finish_reason) if candidate else None,
+        "usage": usage.model_dump(mode="json", exclude_none=True) if usage else None,
+        "text": response.text,
+    })
+    return record
+
+async def run_batch(client, items, output_file, default_model=DEFAULT_MODEL, concurrency=8, ordered=False, resume=False):
+    """
+    Runs batch items concurrently through client.aio, at most `concurrency` at a time.
+
+    Each result is appended to `output_file` as soon as it can be written: as it
+    completes, or, with `ordered`, once every earlier item has been written.
+    With `resume`, items that already succeeded in `output_file` are skipped.
+    """
+    finished = load_finished(output_file) if resume else set()
+    pending = [item for item in items if item["id"] not in finished]
+    if finished:
+        print(f"Resuming: {len(items) - len(pending)} of {len(items)} items already done.")
+    counts = {"ok": 0, "failed": 0}
+    batch_start = time.perf_counter()
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [asyncio.create_task(run_item(client, item, semaphore, default_model)) for item in pending]
+    with open(output_file, "a" if resume else "w", encoding="utf-8") as out:
+
+        def emit(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts["failed" if "error" in record else "ok"] += 1
+            status = f"FAILED ({record['error']})" if "error" in record else "OK"
+            print(f"[{counts['ok'] + counts['failed']}/{len(pending)}] {status} {record['id']}")
+
+        # In order, later items keep running while an earlier one is awaited
+        for next_result in (tasks if ordered else asyncio.as_completed(tasks)):
+            emit(await next_result)
+
+    elapsed = time.perf_counter() - batch_start
+    print(f"\nBatch complete: {counts['ok']} succeeded, {counts['failed']} failed in {elapsed:.1f}s. Results: '{output_file}'")
+
+async def run_demo(client):
+    """Runs the demo prompts concurrently; returns their responses in order."""
+    return await asyncio.gather(*[
+        generate_content_async(client, model=DEFAULT_MODEL, contents=prompt, ttl=CACHE_TTL, site=site)
+        for site, _, prompt in DEMO_PROMPTS
+    ])
+
+async def run(args, client):
+    try:
+        if args.batch:
+            items = read_prompts(args.batch)
+            await run_batch(client, items, args.output, args.model, args.concurrency, args.ordered, args.resume)
+            return None
+        return await run_demo(client)
+    finally:
+        # A shared client (gemini_daemon.py) keeps its connection pool for the next job
+        if not is_shared(client):
+            await client.aio.aclose()
+
+def main(args):
+    configure_cache(args)
+
+    # Load environment variables from .env file
+    load_env()
+
+    # Retrieve API key from environment variable
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY environment variable not set")
+
+    client = create_client(api_key)
+
+    if args.batch:
+        try:
+            asyncio.run(run(args, client))
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            exit(1)
+        return
+
+    output_buffer = []
+    responses = asyncio.run(run(args, client))
+    for (_, heading, _), response in zip(DEMO_PROMPTS, responses):
+        print(response.text)
+        output_buffer.append(("\n" if output_buffer else "") + heading + "\n" + response.text)
+
+    if args.update_readme:
+        full_output = "\n".join(output_buffer)
+        update_readme(full_output, "<!-- START_GENAI_OUTPUT -->", "<!-- END_GENAI_OUTPUT -->")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Basic GenAI Test")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,172 @@
+import re
+import codecs
+import importlib.util
+from html.parser import HTMLParser
+
+# Subtrees whose text is never part of the article
+SKIP_TAGS = ("script", "style", "header", "footer", "nav")
+
+# Pages are cut off after this many bytes while streaming
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([A-Za-z0-9_-]+)""", re.IGNORECASE)
+
+def clean_text(text):
+    """Strips every line, splits on double spaces and drops empty phrases (one pass)."""
+    phrases = []
+    for line in text.splitlines():
+        for phrase in line.strip().split("  "):
+            phrase = phrase.strip()
+            if phrase:
+                phrases.append(phrase)
+    return "\n".join(phrases)
+
+def sniff_encoding(head, declared=None):
+    """Picks the encoding from a BOM, the Content-Type charset or a <meta charset>, defaulting to UTF-8."""
+    if head.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    match = None if declared else META_CHARSET.search(head[:4096])
+    candidate = declared or (match.group(1).decode("ascii") if match else "utf-8")
+    try:
+        return codecs.lookup(candidate).name
+    except LookupError:
+        return "utf-8"
+
+def declared_charset(content_type):
+    """Returns the charset of a Content-Type header value, or None."""
+    match = re.search(r"charset=([\w-]+)", content_type or "", re.IGNORECASE)
+    return match.group(1) if match else None
+
+def decode_html(data, declared=None):
+    if isinstance(data, str):
+        return data
+    return data.decode(sniff_encoding(data, declared), errors="replace")
+
+class StreamingTextExtractor(HTMLParser):
+    """
+    Event-based extractor: collects text nodes as the HTML is fed in, skipping
+    everything inside SKIP_TAGS, without building a document tree.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip_depth = 0
+        self._new_node = True
+
+    def handle_starttag(self, tag, attrs):
+        self._new_node = True
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        self._new_node = True
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_comment(self, data):
+        self._new_node = True
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        # A text node cut by a feed() boundary arrives in several calls; keep it whole
+        if self._new_node or not self.parts:
+            self.parts.append(data)
+        else:
+            self.parts[-1] += data
+        self._new_node = False
+
+    def text(self):
+        return clean_text("\n".join(self.parts))
+
+def extract_stream(html):
+    extractor = StreamingTextExtractor()
+    extractor.feed(decode_html(html))
+    extractor.close()
+    return extractor.text()
+
+def extract_lxml(html):
+    import lxml.html
+    from lxml import etree
+    parser = lxml.html.HTMLParser(encoding="utf-8", remove_comments=True)
+    root = lxml.html.document_fromstring(decode_html(html).encode("utf-8"), parser=parser)
+    etree.strip_elements(root, *SKIP_TAGS, with_tail=False)
+    return clean_text("\n".join(root.itertext()))
+
+def extract_bs4(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    for element in soup(list(SKIP_TAGS)):
+        element.extract()
+    return clean_text(soup.get_text(separator="\n"))
+
+# Backend name -> (extract function, module it needs)
+BACKENDS = {
+    "stream": (extract_stream, None),
+    "lxml": (extract_lxml, "lxml"),
+    "bs4": (extract_bs4, "bs4"),
+}
+
+def available_backends():
+    return [name for name, (_, module) in BACKENDS.items()
+            if module is None or importlib.util.find_spec(module) is not None]
+
+def resolve_backend(backend="auto"):
+    """Returns the backend to use: "auto" prefers lxml and falls back to the streaming parser."""
+    if backend == "auto":
+        return "lxml" if "lxml" in available_backends() else "stream"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown HTML extractor '{backend}' (choose from {', '.join(BACKENDS)})")
+    return backend
+
+def extract_text(html, backend="auto"):
+    """Extracts readable text from an HTML document (bytes or str)."""
+    return BACKENDS[resolve_backend(backend)][0](html)
+
+def extract_response(response, backend="auto", max_bytes=MAX_PAGE_BYTES):
+    """
+    Extracts text from a streamed requests.Response, reading at most `max_bytes`.
+
+    The streaming backend parses each chunk as it arrives; the others collect the
+    (capped) body first.
+    """
+    backend = resolve_backend(backend)
+    declared = declared_charset(response.headers.get("Content-Type"))
+
+    received = 0
+    truncated = False
+    if backend == "stream":
+        extractor = StreamingTextExtractor()
+        decoder = None
+        for chunk in response.iter_content(STREAM_CHUNK_BYTES):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(sniff_encoding(chunk, declared))(errors="replace")
+            if received + len(chunk) > max_bytes:
+                chunk = chunk[:max_bytes - received]
+                truncated = True
+            received += len(chunk)
+            extractor.feed(decoder.decode(chunk))
+            if truncated:
+                break
+        if decoder is not None:
+            extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        text = extractor.text()
+    else:
+        chunks = []
+        for chunk in response.iter_content(STREAM_CHUNK_BYTES):
+            if received + len(chunk) > max_bytes:
+                chunks.append(chunk[:max_bytes - received])
+                truncated = True
+                break
+            chunks.append(chunk)
+            received += len(chunk)
+        data = b"".join(chunks)
+        text = BACKENDS[backend][0](decode_html(data, declared))
+
+    if truncated:
+        print(f"Page truncated at {max_bytes} bytes: {response.url}")
+    return text
@@ -0,0 +1,148 @@
+import os
+import csv
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+
+# Columns that identify an event: 事件名稱 (index 2) and 開始日期 (index 3)
+NAME_COLUMN = 2
+START_DATE_COLUMN = 3
+
+# Bytes at the end of the CSV hashed into the index's consistency signature
+SIGNATURE_TAIL_BYTES = 4096
+
+def csv_signature(path):
+    """
+    Size plus a hash of the file's tail: O(1) to compute, survives fresh checkouts
+    (unlike mtime) and changes whenever rows are appended, edited or truncated.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            f.seek(max(0, size - SIGNATURE_TAIL_BYTES))
+            tail = f.read()
+    except OSError:
+        return "missing"
+    return f"{size}:{hashlib.sha1(tail).hexdigest()}"
+
+def event_key(row):
+    """Returns the dedup key (事件名稱, 開始日期) for a CSV row, or None if the row is too short."""
+    if len(row) <= START_DATE_COLUMN:
+        return None
+    return (row[NAME_COLUMN].strip(), row[START_DATE_COLUMN].strip())
+
+class KeyIndex:
+    """
+    Persistent sidecar index of the event keys already present in a CSV file.
+
+    Keys live in a small SQLite database next to the CSV, so membership checks and
+    appends are O(1) regardless of how much history the CSV holds. The index records
+    the CSV's size and a hash of its tail after every sync; when they no longer match
+    (the CSV was edited, replaced or an append was interrupted) it is rebuilt from the CSV.
+    """
+
+    def __init__(self, csv_path, index_path=None):
+        self.csv_path = csv_path
+        self.index_path = index_path or os.path.splitext(csv_path)[0] + ".keys.sqlite"
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS keys (name TEXT NOT NULL, start_date TEXT NOT NULL, PRIMARY KEY (name, start_date)) WITHOUT ROWID")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+        if not self.is_consistent():
+            self.rebuild()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _csv_signature(self):
+        return csv_signature(self.csv_path)
+
+    def is_consistent(self):
+        """Returns True if the index was last synced against the CSV as it is now."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'csv_signature'").fetchone()
+        return row is not None and row[0] == self._csv_signature()
+
+    def mark_synced(self):
+        """Records the CSV's current signature; call after appending rows to the CSV."""
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_signature', ?)", (self._csv_signature(),))
+        self.conn.commit()
+
+    def rebuild(self):
+        """Re-reads every key from the CSV."""
+        self.conn.execute("DELETE FROM keys")
+        if os.path.exists(self.csv_path):
+            print(f"Rebuilding key index for '{self.csv_path}'...")
+            with open(self.csv_path, "r", encoding="utf-8-sig", newline="") as f:
+                reader = csv.reader(f)
+                next(reader, None) # Skip header
+                keys = (event_key(row) for row in reader)
+                self.conn.executemany("INSERT OR IGNORE INTO keys (name, start_date) VALUES (?, ?)", (k for k in keys if k))
+        self.mark_synced()
+
+    def __contains__(self, key):
+        return self.conn.execute("SELECT 1 FROM keys WHERE name = ? AND start_date = ?", key).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def add_many(self, keys):
+        """Adds keys for rows that were just appended to the CSV."""
+        self.conn.executemany("INSERT OR IGNORE INTO keys (name, start_date) VALUES (?, ?)", keys)
+        self.conn.commit()
+
+    def compact(self):
+        """
+        Rewrites the CSV without duplicate keys, then rebuilds and vacuums the index.
+
+        Returns the number of duplicate rows removed.
+        """
+        if not os.path.exists(self.csv_path):
+            return 0
+        with open(self.csv_path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.reader(f))
+        if not rows:
+            return 0
+
+        header, body = rows[0], rows[1:]
+        seen = set()
+        kept = []
+        for row in body:
+            key = event_key(row)
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+            kept.append(row)
+
+        directory = os.path.dirname(os.path.abspath(self.csv_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(kept)
+        os.replace(tmp_path, self.csv_path)
+
+        self.rebuild()
+        self.conn.execute("VACUUM")
+        return len(body) - len(kept)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the dedup key index of an events CSV")
+    parser.add_argument("command", choices=["stats", "rebuild", "compact"], help="stats: show index size, rebuild: re-read keys from the CSV, compact: drop duplicate CSV rows and vacuum the index")
+    parser.add_argument("csv_file", nargs="?", default="market_events.csv", help="Events CSV file (default: market_events.csv)")
+    args = parser.parse_args()
+
+    with KeyIndex(args.csv_file) as index:
+        if args.command == "rebuild":
+            index.rebuild()
+        elif args.command == "compact":
+            removed = index.compact()
+            print(f"Removed {removed} duplicate rows from '{args.csv_file}'.")
+        print(f"Index '{index.index_path}' holds {len(index)} keys.")
@@ -0,0 +1,233 @@
+import io
+import os
+import re
+import csv
+import time
+import codecs
+import sqlite3
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlparse
+
+DEFAULT_LINKS_FILE = ".links.sqlite"
+
+# Event files whose Link1 / Link2 come from grounded search
+DEFAULT_FILES = ["AI-event-gemini3.csv", "historical_crashes-gemini3.csv", "market_events.csv"]
+
+# Path of the vertexaisearch.cloud.google.com redirect tokens found in grounded answers
+REDIRECT_PATH = "/grounding-api-redirect/"
+
+# Answers that mean a token will never resolve (expired); other failures are retried next run
+PERMANENT_FAILURES = (400, 404, 410)
+
+def is_grounding_redirect(url):
+    return url.startswith(("http://", "https://")) and REDIRECT_PATH in urlparse(url).path
+
+class LinkTable:
+    """
+    Deduplicated link storage: every distinct URL is stored once in `links` and
+    referenced by its ID, and every grounding-redirect token maps to the ID of the
+    URL it resolved to (NULL once it is known to be dead). A token is therefore only
+    requested once, however many files and runs it appears in.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("LINKS_FILE", DEFAULT_LINKS_FILE)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS links (id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS redirects (redirect TEXT PRIMARY KEY, link_id INTEGER REFERENCES links (id), "
+                          "status INTEGER, resolved_at REAL)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def link_id(self, url):
+        """Returns the ID of url, adding it to the table if it is new."""
+        with self._lock:
+            self.conn.execute("INSERT OR IGNORE INTO links (url) VALUES (?)", (url,))
+            self.conn.commit()
+            return self.conn.execute("SELECT id FROM links WHERE url = ?", (url,)).fetchone()[0]
+
+    def url(self, link_id):
+        with self._lock:
+            row = self.conn.execute("SELECT url FROM links WHERE id = ?", (link_id,)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, redirect):
+        """Returns (url or None, status) for a token seen before, or None for a new one."""
+        with self._lock:
+            return self.conn.execute(
+                "SELECT links.url, redirects.status FROM redirects LEFT JOIN links ON links.id = redirects.link_id "
+                "WHERE redirects.redirect = ?", (redirect,)).fetchone()
+
+    def record(self, redirect, url, status):
+        link_id = self.link_id(url) if url else None
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO redirects (redirect, link_id, status, resolved_at) VALUES (?, ?, ?, ?)",
+                              (redirect, link_id, status, time.time()))
+            self.conn.commit()
+
+    def stats(self):
+        with self._lock:
+            links = self.conn.execute("SELECT COUNT(*) FROM links").fetchone()[0]
+            resolved, dead = self.conn.execute(
+                "SELECT COUNT(link_id), COUNT(*) - COUNT(link_id) FROM redirects").fetchone()
+        return {"links": links, "resolved": resolved, "dead": dead}
+
+def resolve_redirect(session, url, timeout=15):
+    """
+    Returns (target URL or None, HTTP status) for one redirect token.
+
+    Only the first hop is read (HEAD, or a streamed GET if HEAD is refused), so the
+    publisher's page itself is never downloaded.
+    """
+    response = session.head(url, allow_redirects=False, timeout=timeout)
+    if response.status_code in (403, 405, 501):
+        response = session.get(url, allow_redirects=False, timeout=timeout, stream=True)
+        response.close()
+    location = response.headers.get("Location")
+    if response.is_redirect and location:
+        return urljoin(url, location), response.status_code
+    return None, response.status_code
+
+def resolve_links(redirects, table, workers=16, per_host=8, retry_failed=False):
+    """
+    Resolves redirect tokens concurrently over one pooled session (at most `per_host`
+    requests in flight per host), skipping tokens already in the link table.
+
+    Returns ({redirect: url}, counts).
+    """
+    from summarize_url import HostLimiter, create_session
+
+    resolved = {}
+    counts = {"cached": 0, "resolved": 0, "dead": 0, "failed": 0}
+    pending = []
+    for redirect in sorted(set(redirects)):
+        known = table.lookup(redirect)
+        if known and (known[0] or not retry_failed):
+            counts["cached" if known[0] else "dead"] += 1
+            if known[0]:
+                resolved[redirect] = known[0]
+        else:
+            pending.append(redirect)
+
+    session = create_session(pool_size=workers)
+    host_limiter = HostLimiter(per_host)
+    counts_lock = threading.Lock()
+
+    def resolve_job(redirect):
+        try:
+            with host_limiter.slot(redirect):
+                url, status = resolve_redirect(session, redirect)
+        except Exception as e:
+            # Network errors are not recorded, so the token is tried again next run
+            print(f"  Failed to resolve {redirect[:80]}...: {e}")
+            with counts_lock:
+                counts["failed"] += 1
+            return
+        if url or status in PERMANENT_FAILURES:
+            table.record(redirect, url, status)
+        with counts_lock:
+            if url:
+                resolved[redirect] = url
+                counts["resolved"] += 1
+            else:
+                counts["dead" if status in PERMANENT_FAILURES else "failed"] += 1
+
+    if pending:
+        print(f"Resolving {len(pending)} redirect links ({workers} workers, {per_host} per host)...")
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(resolve_job, pending))
+    session.close()
+    return resolved, counts
+
+def read_event_file(path):
+    """Returns (text, encoding) of an event CSV."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return data.decode("utf-8-sig"), "utf-8-sig" if data.startswith(codecs.BOM_UTF8) else "utf-8"
+
+def link_cells(text):
+    """Returns the grounding-redirect tokens of a CSV text; any cell holding one counts, whatever its column."""
+    return {cell for row in csv.reader(io.StringIO(text, newline="")) for cell in row if is_grounding_redirect(cell)}
+
+def replace_links(text, resolved):
+    """
+    Returns (text, replacements) with every cell that is exactly a resolved token
+    replaced by its URL. Only those cells change: header, chat text, quoting and
+    malformed rows are kept byte for byte, so a rewrite can never lose an event.
+    """
+    if not resolved:
+        return text, 0
+    # A token only matches as a whole cell, never as the prefix of a longer token
+    pattern = re.compile('(?<![^,"\\n])(' + "|".join(re.escape(token) for token in sorted(resolved, key=len, reverse=True))
+                         + ')(?=[,"\\r\\n]|$)')
+    # Unquoted cells cannot hold a comma or quote, so those are percent-encoded
+    return pattern.subn(lambda match: resolved[match.group(1)].replace('"', "%22").replace(",", "%2C"), text)
+
+def write_event_file(path, text, encoding):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def resolve_files(paths, workers=16, per_host=8, links_file=None, retry_failed=False):
+    """
+    Replaces the grounding-redirect links in event CSVs with the publisher URLs they
+    point to. Tokens shared between files are resolved once; links that cannot be
+    resolved are left as they are.
+    """
+    files = {}
+    for path in paths:
+        try:
+            text, encoding = read_event_file(path)
+        except OSError as e:
+            print(f"Error reading '{path}': {e}")
+            continue
+        files[path] = (text, encoding, link_cells(text))
+    redirects = set().union(*(tokens for _, _, tokens in files.values()))
+    if not redirects:
+        print("No grounding-redirect links to resolve.")
+        return
+
+    table = LinkTable(links_file)
+    started = time.perf_counter()
+    resolved, counts = resolve_links(redirects, table, workers, per_host, retry_failed)
+    print(f"{len(redirects)} redirect links: {counts['resolved']} resolved, {counts['cached']} from the link table, "
+          f"{counts['dead']} expired, {counts['failed']} failed in {time.perf_counter() - started:.1f}s.")
+
+    for path, (text, encoding, tokens) in files.items():
+        text, replaced = replace_links(text, {token: resolved[token] for token in tokens if token in resolved})
+        if not replaced:
+            continue
+        before = os.path.getsize(path)
+        write_event_file(path, text, encoding)
+        print(f"'{path}': {replaced} links replaced, {before / 1024:.1f} KB -> {os.path.getsize(path) / 1024:.1f} KB")
+    table.close()
+
+def add_arguments(parser):
+    parser.add_argument("files", nargs="*", help=f"Event CSV files to rewrite (default: {', '.join(DEFAULT_FILES)})")
+    parser.add_argument("--workers", type=int, default=16, help="Concurrent resolution requests")
+    parser.add_argument("--per-host", type=int, default=8, help="Maximum concurrent requests per host")
+    parser.add_argument("--links-file", help=f"SQLite link table (default: LINKS_FILE or {DEFAULT_LINKS_FILE})")
+    parser.add_argument("--retry-failed", action="store_true", help="Request tokens that were recorded as expired again")
+    parser.add_argument("--stats", action="store_true", help="Show the size of the link table and exit")
+
+def main(args):
+    if args.stats:
+        table = LinkTable(args.links_file)
+        stats = table.stats()
+        print(f"'{table.path}': {stats['links']} distinct links, {stats['resolved']} resolved tokens, {stats['dead']} expired tokens.")
+        table.close()
+        return
+    files = args.files or [path for path in DEFAULT_FILES if os.path.exists(path)]
+    resolve_files(files, args.workers, args.per_host, args.links_file, args.retry_failed)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resolve grounding-redirect links in event CSVs to publisher URLs")
+    add_arguments(parser)
+    main(parser.parse_args())
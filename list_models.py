@@ -1,74 +1,73 @@
 import os
 import argparse
-import datetime # Import datetime
-from google import genai
-from dotenv import load_dotenv # Import load_dotenv
+from readme_writer import update_readme
+from gemini_client import create_client, load_env
+from model_catalog import ModelCatalog
 
-def update_readme(content, start_marker, end_marker):
-    """Updates the README.md file between specific markers."""
-    readme_path = "README.md"
-    try:
-        with open(readme_path, "r", encoding="utf-8") as f:
-            readme_content = f.read()
-        
-        start_pos = readme_content.find(start_marker)
-        end_pos = readme_content.find(end_marker)
-        
-        if start_pos == -1 or end_pos == -1:
-            print(f"Warning: Markers {start_marker} and {end_marker} not found in {readme_path}")
-            return
+def add_arguments(parser):
+    parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
+    parser.add_argument("--refresh", action="store_true", help="Re-fetch every model's details instead of only new or changed ones")
+    parser.add_argument("--max-age", type=float, default=24, help="Hours before the cached catalog is re-listed (default: 24)")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent model detail requests")
+    parser.add_argument("--pick", choices=["cheapest", "fastest"], help="Print the cheapest or fastest model meeting --min-input-tokens / --min-output-tokens")
+    parser.add_argument("--min-input-tokens", type=int, default=0, help="Required input context size for --pick")
+    parser.add_argument("--min-output-tokens", type=int, default=0, help="Required output size for --pick")
 
-        # Generate timestamp
-        now = datetime.datetime.now()
-        timestamp_str = now.strftime("產生時間: %Y-%m-%d %H:%M:%S") + " CST"
+def format_model(record):
+    thinking = "yes" if record.get("thinking") else "no"
+    return (
+        f"Model Name: {record['name']}\n"
+        f"Display Name: {record['display_name']}\n"
+        f"Tokens (input/output): {record.get('input_token_limit')} / {record.get('output_token_limit')}\n"
+        f"Methods: {', '.join(record.get('supported_actions') or [])}\n"
+        f"Thinking: {thinking}\n"
+        f"{'-' * 20}"
+    )
 
+def main(args):
+    catalog = ModelCatalog(ttl=args.max_age * 60 * 60)
 
-        new_content = (
-            readme_content[:start_pos + len(start_marker)]
-            + f"\n{timestamp_str}\n\n```text\n" + content + "\n```\n"
-            + readme_content[end_pos:]
-        )
-        
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_content)
-            
-        print(f"Successfully updated {readme_path}")
-        
-    except Exception as e:
-        print(f"Error updating README: {e}")
+    if not catalog.is_fresh() or args.refresh:
+        # Load environment variables from .env file
+        load_env()
 
-# Load environment variables from .env file
-load_dotenv()
+        # Retrieve API key from environment variable
+        api_key = os.environ.get("GEMINI_API_KEY")
+        if not api_key:
+            print("Error: GEMINI_API_KEY environment variable not set.")
+            exit(1)
 
-# Retrieve API key from environment variable
-api_key = os.environ.get("GEMINI_API_KEY")
-if not api_key:
-    print("Error: GEMINI_API_KEY environment variable not set.")
-    exit(1)
+        client = create_client(api_key)
 
-client = genai.Client(api_key=api_key)
+        try:
+            print("Fetching available models...")
+            fetched, removed = catalog.refresh(client, force=args.refresh, workers=args.workers)
+            print(f"Catalog updated: {fetched} model(s) fetched, {removed} removed.")
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            if not catalog.models:
+                return
+            print("Using the cached catalog.")
+    else:
+        print(f"Using cached model catalog '{catalog.path}'.")
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="List Gemini Models")
-    parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
-    args = parser.parse_args()
+    if args.pick:
+        model = catalog.pick(args.min_input_tokens, args.min_output_tokens, args.pick)
+        print(model or "No model meets the requirements.")
+        return
 
+    # We'll buffer the output for the README
     output_buffer = []
+    for name in sorted(catalog.models):
+        model_info = format_model(catalog.models[name])
+        print(model_info)
+        output_buffer.append(model_info)
 
-    try:
-        # Attempt to list models
-        print("Fetching available models...")
-        
-        # We'll buffer the output for the README
-        
-        for model in client.models.list():
-            model_info = f"Model Name: {model.name}\nDisplay Name: {model.display_name}\n{'-' * 20}"
-            print(model_info)
-            output_buffer.append(model_info)
+    if args.update_readme:
+        full_output = "\n".join(output_buffer)
+        update_readme(full_output, "<!-- START_MODELS_OUTPUT -->", "<!-- END_MODELS_OUTPUT -->")
 
-        if args.update_readme:
-             full_output = "\n".join(output_buffer)
-             update_readme(full_output, "<!-- START_MODELS_OUTPUT -->", "<!-- END_MODELS_OUTPUT -->")
-
-    except Exception as e:
-        print(f"An error occurred: {e}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List Gemini Models")
+    add_arguments(parser)
+    main(parser.parse_args())
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CATALOG_FILE = ".gemini_models.json"
+
+# The catalog is re-listed at most once a day; only new or changed models are re-fetched
+DEFAULT_TTL = 24 * 60 * 60
+
+# Relative cost of each model family (lower is cheaper). The API publishes no prices,
+# so this follows the public price list: flash-lite < flash < pro.
+FAMILY_COST = (("flash-lite", 0), ("flash", 1), ("pro", 3))
+
+# Thinking adds latency before the first token; "fastest" avoids it when it can
+THINKING_LATENCY_PENALTY = 1
+
+# Fields copied from types.Model into the catalog
+MODEL_FIELDS = ("name", "display_name", "description", "version", "input_token_limit",
+                "output_token_limit", "supported_actions", "thinking", "temperature",
+                "max_temperature", "top_p", "top_k")
+
+def model_record(model):
+    """Returns the catalog entry for a types.Model."""
+    record = {field: getattr(model, field, None) for field in MODEL_FIELDS}
+    record["supported_actions"] = list(record["supported_actions"] or [])
+    return record
+
+def fingerprint(model):
+    """Cheap per-model change marker taken from the list response."""
+    return f"{model.version}|{model.display_name}|{model.input_token_limit}|{model.output_token_limit}"
+
+def family_cost(name):
+    short = name.split("/")[-1]
+    for family, cost in FAMILY_COST:
+        if family in short:
+            return cost
+    return len(FAMILY_COST)
+
+def generation(name):
+    """Returns the model generation as a float ("models/gemini-2.5-flash" -> 2.5), or 0."""
+    parts = name.split("/")[-1].split("-")
+    try:
+        return float(parts[1]) if parts[0] == "gemini" else 0.0
+    except (IndexError, ValueError):
+        return 0.0
+
+def is_preview(name):
+    return any(tag in name for tag in ("preview", "exp"))
+
+class ModelCatalog:
+    """
+    Local, TTL-bound catalog of the Gemini models available to an API key.
+
+    refresh() lists the models and fetches full details (token limits, generation
+    methods, thinking support) concurrently, but only for models that are new or
+    whose fingerprint changed since the last refresh. pick() chooses a model that
+    meets a context-size requirement.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        self.path = path or os.environ.get("GEMINI_MODELS_FILE", DEFAULT_CATALOG_FILE)
+        self.ttl = ttl
+        self.updated = 0
+        self.models = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.updated = data.get("updated", 0)
+        self.models = data.get("models", {})
+
+    def save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"updated": self.updated, "models": self.models}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def is_fresh(self):
+        return bool(self.models) and time.time() - self.updated < self.ttl
+
+    def refresh(self, client, force=False, workers=8):
+        """
+        Brings the catalog up to date. Returns (fetched, removed) model counts.
+
+        Nothing is requested while the catalog is within its TTL unless `force` is set.
+        """
+        if self.is_fresh() and not force:
+            return 0, 0
+
+        listed = {model.name: model for model in client.models.list()}
+        stale = [name for name, model in listed.items()
+                 if force or name not in self.models or self.models[name].get("fingerprint") != fingerprint(model)]
+        removed = [name for name in self.models if name not in listed]
+
+        def fetch(name):
+            try:
+                return model_record(client.models.get(model=name))
+            except Exception as e:
+                # Fall back to the list entry, which carries most fields already
+                print(f"Could not fetch details for {name}: {e}")
+                return model_record(listed[name])
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for name, record in zip(stale, executor.map(fetch, stale)):
+                record["fingerprint"] = fingerprint(listed[name])
+                self.models[name] = record
+        for name in removed:
+            del self.models[name]
+
+        self.updated = time.time()
+        self.save()
+        return len(stale), len(removed)
+
+    def get(self, name):
+        """Looks up a model by full ("models/gemini-2.5-flash") or short name."""
+        return self.models.get(name) or self.models.get(f"models/{name}")
+
+    def candidates(self, min_input_tokens=0, min_output_tokens=0, method="generateContent",
+                   thinking=None, allow_preview=False):
+        """Returns the catalog entries meeting the given requirements."""
+        matches = []
+        for name, record in self.models.items():
+            if method and method not in record.get("supported_actions", []):
+                continue
+            if (record.get("input_token_limit") or 0) < min_input_tokens:
+                continue
+            if (record.get("output_token_limit") or 0) < min_output_tokens:
+                continue
+            if thinking is not None and bool(record.get("thinking")) != thinking:
+                continue
+            if not allow_preview and is_preview(name):
+                continue
+            matches.append(record)
+        return matches
+
+    def pick(self, min_input_tokens=0, min_output_tokens=0, prefer="cheapest", **requirements):
+        """
+        Returns the short name of the cheapest or fastest model meeting the requirements,
+        or None. Ties go to the newest generation.
+        """
+        def rank(record):
+            cost = family_cost(record["name"])
+            if prefer == "fastest" and record.get("thinking"):
+                cost += THINKING_LATENCY_PENALTY
+            return (cost, -generation(record["name"]), record["name"])
+
+        matches = self.candidates(min_input_tokens, min_output_tokens, **requirements)
+        if not matches:
+            return None
+        return min(matches, key=rank)["name"].split("/")[-1]
+
+def pick_model(min_input_tokens=0, min_output_tokens=0, prefer="cheapest", default="gemini-2.5-flash", **requirements):
+    """
+    Picks a model from the on-disk catalog without touching the network.
+
+    Returns `default` when the catalog is missing (run list_models.py to build it)
+    or no model meets the requirements.
+    """
+    catalog = ModelCatalog()
+    return catalog.pick(min_input_tokens, min_output_tokens, prefer, **requirements) or default
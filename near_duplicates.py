@@ -0,0 +1,283 @@
+import os
+import re
+import array
+import random
+import sqlite3
+import hashlib
+import argparse
+import datetime
+import unicodedata
+from event_csv import parse_event_rows, validate_row
+from key_index import csv_signature
+
+# MinHash signature length and LSH banding, picked from DEFAULT_THRESHOLD. A name
+# whose containment in one L times its size is c has Jaccard similarity s >= c / (1 + L - c):
+# at c = 0.75 that is 0.60 for rewordings of equal length, 0.33 at twice the length
+# ("法人說明會" in "TWSE上市公司法人說明會") and 0.23 at three times. With 32 bands of
+# 2 rows a pair shares a bucket with probability 1 - (1 - s^2)^32: 0.9999 at 0.60,
+# 0.98 at 0.33 and 0.82 at 0.23, but 0.27 at 0.10 and 0.08 at 0.05, so names sharing
+# only a bigram or two with the row are mostly not candidates.
+# benchmarks/bench_near_duplicates.py compares candidate counts with other bandings.
+NUM_PERM = 64
+BANDS = 32
+ROWS_PER_BAND = NUM_PERM // BANDS
+
+# Character n-gram size; bigrams suit short Chinese names
+SHINGLE_SIZE = 2
+
+# Share of the shorter name's bigrams found in the other name. Tuned on pairs from the
+# event CSVs: rewordings score 0.75-1.0 ("法人說明會" in "TWSE上市公司法人說明會" 1.0,
+# "美國FOMC利率決議" vs "聯準會 FOMC 利率決議" 0.75), distinct events built from one
+# template at most 0.71 ("日本央行利率決議" vs "歐洲央行利率決議"; 0.67 for 法說會 of two
+# companies, 0.62 for "美國消費者物價指數" vs "美國生產者物價指數").
+DEFAULT_THRESHOLD = 0.75
+DEFAULT_DATE_TOLERANCE = 3
+
+# Names shorter than this many bigrams ("除權息", "股東會") are too generic to be
+# contained in another name; their score is divided by this instead of their size
+MIN_SHINGLES = 3
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+# Fixed seed: signatures must be comparable across runs and machines
+_rng = random.Random(1)
+PERMUTATIONS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(0, MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+
+NON_WORD = re.compile(r"[\W_]+")
+
+# Dates ("2025年12月", "2026-01-13") and other numbers say which release or period a
+# name refers to, not what the event is; the start date already carries that
+NUMBERS = re.compile(r"\d+\s*[年月日號号]?")
+
+# Stock codes such as "(2330)" or "(00715L)", in the name or the note
+TICKER = re.compile(r"\((\d{4,6}[a-z]?)\)")
+
+# Latin words of a name: indicator and company names such as CPI, PPI, FOMC, TSMC
+LATIN_WORD = re.compile(r"[a-z]{2,}")
+
+# What separates the runs of a name that are shingled
+SEGMENT_BREAKS = re.compile(r"[a-z]+|\d+\s*[年月日號号]?|[\W_]+")
+
+def normalize(text):
+    """NFKC (full-width to half-width), lowercase, punctuation and whitespace removed."""
+    return NON_WORD.sub("", unicodedata.normalize("NFKC", text).lower())
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = normalize(text)
+    if len(text) <= size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+def name_shingles(row):
+    """
+    The n-grams compared for an event row: those of each run of its 事件名稱 between
+    Latin words (compared as tags), dates, numbers and punctuation, so no n-gram spans
+    a removed word. A name with no such run (e.g. only "CPI") keeps its Latin letters.
+    The 備註 is left out: notes of distinct events share boilerplate (the CPI and PPI
+    rows both read "美國勞工統計局公布"), while rewordings of one event often come with
+    unrelated notes; only its stock codes count, through event_tags.
+    """
+    name = unicodedata.normalize("NFKC", row[2]).lower()
+    tokens = set()
+    for segment in SEGMENT_BREAKS.split(name):
+        if len(segment) >= SHINGLE_SIZE:
+            tokens |= shingles(segment)
+    return tokens or shingles(NUMBERS.sub("", name))
+
+def event_tags(row):
+    """
+    The identifiers two rewordings of one event must agree on: the Latin words of the
+    事件名稱 (CPI vs PPI) and, marked with "#", the stock codes in the 事件名稱 and 備註.
+    """
+    name = unicodedata.normalize("NFKC", row[2]).lower()
+    note = unicodedata.normalize("NFKC", row[5]).lower() if len(row) > 5 else ""
+    return set(LATIN_WORD.findall(name)) | {"#" + code for code in TICKER.findall(name + " " + note)}
+
+def containment(tokens, other):
+    """Share of the smaller set found in the larger one (sets under MIN_SHINGLES count as MIN_SHINGLES)."""
+    if not tokens or not other:
+        return 0.0
+    return len(tokens & other) / max(min(len(tokens), len(other)), MIN_SHINGLES)
+
+def tags_agree(tags, other):
+    """Of each kind of identifier, one row may name fewer than the other, but not different ones."""
+    for kind in (lambda tag: not tag.startswith("#"), lambda tag: tag.startswith("#")):
+        mine, theirs = set(filter(kind, tags)), set(filter(kind, other))
+        if not (mine <= theirs or theirs <= mine):
+            return False
+    return True
+
+def minhash(tokens):
+    """Returns the MinHash signature (NUM_PERM 32-bit values) of a set of strings."""
+    hashes = [int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little") for token in tokens]
+    if not hashes:
+        return [MAX_HASH] * NUM_PERM
+    return [min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes) for a, b in PERMUTATIONS]
+
+def band_keys(signature):
+    """One bucket key per band (a signed 64-bit hash of the band's rows)."""
+    keys = []
+    for band in range(BANDS):
+        chunk = array.array("I", signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]).tobytes()
+        keys.append(int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True))
+    return keys
+
+def shift_date(value, days):
+    return (datetime.date.fromisoformat(value) + datetime.timedelta(days=days)).isoformat()
+
+class NearDuplicateIndex:
+    """
+    Persistent MinHash / LSH index of the events in a CSV, for catching rephrased duplicates.
+
+    Each event's 事件名稱 (dates and numbers removed) is reduced to a MinHash signature
+    over normalized character n-grams and stored in BANDS buckets, keyed by start date,
+    in a SQLite file next to the CSV. A lookup reads only the events sharing a bucket
+    with the new row and starting within `date_tolerance` days of it: the date window
+    keeps the cost from growing with the history, the bands cut it within the window. Those candidates are scored exactly: the containment of
+    one name's n-grams in the other's, provided the rows name no conflicting
+    identifiers (event_tags). Like KeyIndex, it is rebuilt from the CSV when the CSV
+    changed behind its back. With csv_path=None the index lives in memory (for
+    deduplicating a list of rows).
+    """
+
+    def __init__(self, csv_path=None, index_path=None, threshold=DEFAULT_THRESHOLD, date_tolerance=DEFAULT_DATE_TOLERANCE):
+        self.csv_path = csv_path
+        self.threshold = threshold
+        self.date_tolerance = date_tolerance
+        if csv_path is None:
+            self.index_path = ":memory:"
+        else:
+            self.index_path = index_path or os.path.splitext(csv_path)[0] + ".lsh.sqlite"
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        if csv_path is None:
+            self._create_tables()
+        elif not self.is_consistent():
+            self.rebuild()
+
+    def _create_tables(self):
+        self.conn.execute("CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, name TEXT, start_date TEXT, shingles TEXT, tags TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS buckets (band INTEGER, bucket INTEGER, start_date TEXT, event_id INTEGER)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_bucket_dates ON buckets (band, bucket, start_date)")
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _settings(self):
+        # Indexes built with other parameters (or an older layout) are not comparable
+        return f"{NUM_PERM}:{BANDS}:{SHINGLE_SIZE}:names-tags"
+
+    def is_consistent(self):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'csv_signature'").fetchone()
+        return row is not None and row[0] == f"{self._settings()}|{csv_signature(self.csv_path)}"
+
+    def mark_synced(self):
+        """Commits pending adds and records the CSV's current signature."""
+        if self.csv_path is not None:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('csv_signature', ?)",
+                              (f"{self._settings()}|{csv_signature(self.csv_path)}",))
+        self.conn.commit()
+
+    def rebuild(self):
+        """Re-reads every event from the CSV."""
+        self.conn.execute("DROP TABLE IF EXISTS events")
+        self.conn.execute("DROP TABLE IF EXISTS buckets")
+        self._create_tables()
+        if os.path.exists(self.csv_path):
+            print(f"Rebuilding near-duplicate index for '{self.csv_path}'...")
+            with open(self.csv_path, "r", encoding="utf-8-sig") as f:
+                rows = parse_event_rows(f.read())
+            for row in rows:
+                if not validate_row(row, require_link=False):
+                    self.add(row)
+        self.mark_synced()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def add(self, row, tokens=None):
+        """Indexes an event row (uncommitted until mark_synced())."""
+        tokens = name_shingles(row) if tokens is None else tokens
+        start = row[3].strip()
+        cursor = self.conn.execute("INSERT INTO events (name, start_date, shingles, tags) VALUES (?, ?, ?, ?)",
+                                   (row[2].strip(), start, " ".join(sorted(tokens)), " ".join(sorted(event_tags(row)))))
+        self.conn.executemany("INSERT INTO buckets (band, bucket, start_date, event_id) VALUES (?, ?, ?, ?)",
+                              [(band, key, start, cursor.lastrowid) for band, key in enumerate(band_keys(minhash(tokens)))])
+
+    def candidates(self, row, tokens=None):
+        """Ids of the indexed events sharing an LSH bucket with the row and starting within date_tolerance days of it."""
+        tokens = name_shingles(row) if tokens is None else tokens
+        start = row[3].strip()
+        window = (shift_date(start, -self.date_tolerance), shift_date(start, self.date_tolerance))
+        candidates = set()
+        for band, key in enumerate(band_keys(minhash(tokens))):
+            candidates.update(event_id for (event_id,) in self.conn.execute(
+                "SELECT event_id FROM buckets WHERE band = ? AND bucket = ? AND start_date BETWEEN ? AND ?", (band, key) + window))
+        return candidates
+
+    def find(self, row, tokens=None):
+        """
+        Returns (name, start_date, score) of the most similar indexed event starting
+        within date_tolerance days of the row, or None if none reaches the threshold.
+        """
+        tokens = name_shingles(row) if tokens is None else tokens
+        if not tokens:
+            return None
+        tags = event_tags(row)
+        best = None
+        for event_id in self.candidates(row, tokens):
+            name, start_date, other, other_tags = self.conn.execute(
+                "SELECT name, start_date, shingles, tags FROM events WHERE id = ?", (event_id,)).fetchone()
+            if not tags_agree(tags, set(other_tags.split())):
+                continue
+            score = containment(tokens, set(other.split()))
+            if score >= self.threshold and (best is None or score > best[2]):
+                best = (name, start_date, score)
+        return best
+
+    def add_if_new(self, row):
+        """Returns the near-duplicate match of `row`, or indexes it and returns None."""
+        tokens = name_shingles(row)
+        match = self.find(row, tokens)
+        if match is None:
+            self.add(row, tokens)
+        return match
+
+def near_dedup_rows(rows, threshold=DEFAULT_THRESHOLD, date_tolerance=DEFAULT_DATE_TOLERANCE, verbose=True):
+    """Drops rows that near-duplicate an earlier row (first occurrence kept), like dedup_rows."""
+    kept = []
+    with NearDuplicateIndex(threshold=threshold, date_tolerance=date_tolerance) as index:
+        for row in rows:
+            match = index.add_if_new(row)
+            if match is None:
+                kept.append(row)
+            elif verbose:
+                print(f"  Near-duplicate ({match[2]:.2f}): '{row[2].strip()}' ~ '{match[0]}' ({match[1]})")
+    return kept
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate events in an events CSV with MinHash / LSH")
+    parser.add_argument("command", choices=["stats", "rebuild", "find"], help="stats: show index size, rebuild: re-read the CSV, find: list near-duplicate rows in the CSV")
+    parser.add_argument("csv_file", nargs="?", default="market_events.csv", help="Events CSV file (default: market_events.csv)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum share of the shorter 事件名稱's n-grams found in the other")
+    parser.add_argument("--date-tolerance", type=int, default=DEFAULT_DATE_TOLERANCE, help="Only compare events whose 開始日期 is at most this many days apart")
+    args = parser.parse_args()
+
+    if args.command == "find":
+        with open(args.csv_file, "r", encoding="utf-8-sig") as f:
+            rows = [row for row in parse_event_rows(f.read()) if not validate_row(row, require_link=False)]
+        kept = near_dedup_rows(rows, args.threshold, args.date_tolerance)
+        print(f"{len(rows) - len(kept)} of {len(rows)} rows are near-duplicates of an earlier row.")
+    else:
+        with NearDuplicateIndex(args.csv_file, threshold=args.threshold, date_tolerance=args.date_tolerance) as index:
+            if args.command == "rebuild":
+                index.rebuild()
+            print(f"Index '{index.index_path}' holds {len(index)} events.")
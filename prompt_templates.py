@@ -0,0 +1,136 @@
+import argparse
+import importlib
+import textwrap
+from rate_limiter import estimate_tokens
+
+# Modules that register their templates on import (listed by `python prompt_templates.py`)
+TEMPLATE_MODULES = ["fetch_ai_events", "fetch_historical_crashes"]
+
+_templates = {}
+
+# System instruction shared by every event-CSV template: one identical prefix (with the same
+# Google Search tool) means one cached content serves every script and shard, and together
+# the column spec and category guides clear the explicit-cache minimum of gemini-2.5-flash
+EVENT_RESEARCH_PREFIX = """
+    You research market-moving events for a dataset read by Taiwan stock investors. Each request
+    names its subject and one of the category guides below. Find the events with Google Search
+    and answer with the rows of one CSV file.
+
+    Columns, in this order; every row has exactly these 8 fields:
+    1. "類別" (Category): a category of the guide named in the request, written exactly as listed (the Chinese name only, without the English gloss).
+    2. "子類別" (Sub-category): a sub-category listed under that category, written exactly as listed (Chinese name only).
+    3. "事件名稱" (Event name): a short, specific name in Traditional Chinese that identifies the event on its own, e.g. "NVIDIA市值突破3兆美元", "雷曼兄弟破產". Name the company, country or market involved; do not put dates in the name.
+    4. "開始日期" (Start date): the day the event began or was announced, YYYY-MM-DD. If only the month is known, use the first day of that month.
+    5. "結束日期" (End date): YYYY-MM-DD for events lasting several days (a crash, a crisis, a war, a bear market); empty for single-day events. Never earlier than 開始日期.
+    6. "備註" (Note): one or two sentences on the market impact, with figures where known (index or stock moves in %, market value, deal size), e.g. "NVIDIA股價當日上漲24%", "道瓊指數單日重挫22.6%", "加權指數跌幅達...". Name the listed companies affected, with Taiwan stock codes in parentheses where relevant, e.g. "台積電 (2330)".
+    7. "Link1": MANDATORY. The URL of a reliable source article (Reuters, Bloomberg, CNBC, Financial Times, TechCrunch, the company's own announcement, a central bank or regulator page, 中央社, 經濟日報). Use the article's own URL rather than a search results page.
+    8. "Link2": a second, independent source URL; empty if there is none.
+
+    CSV rules:
+    - The first line is the header row, exactly: "類別","子類別","事件名稱","開始日期","結束日期","備註","Link1","Link2"
+    - Then one line per event. Enclose every field in double quotes, write a double quote inside a field as two double quotes, and write an empty field as "".
+    - Do not add commentary, headings, numbering, blank lines or markdown code block markers before, between or after the rows.
+    - Each event appears once; merge reports of the same event from different sources into one row.
+    - Language: all text except URLs, tickers and company names usually written in English must be in Traditional Chinese (繁體中文), never Simplified Chinese.
+    - Only include events you found sources for; do not invent events, dates or figures.
+
+    Category guide "AI 市場事件" (AI events that moved the stock market or the business landscape):
+
+    1. 市場與資本 (Market & Capital):
+       - 市值里程碑 (Market Cap Milestones) - e.g., NVIDIA hits $3T, Microsoft overtakes Apple due to AI.
+       - 併購與投資 (M&A & Investment) - e.g., Microsoft invests $10B in OpenAI, Google buys DeepMind.
+       - 股價波動 (Stock Movement) - e.g., Super Micro Computer surge, Chegg crash due to ChatGPT.
+
+    2. 產品發布與商業化 (Product & Commercialization):
+       - 生成式AI應用 (Generative AI Apps) - e.g., ChatGPT launch (sparked AI arms race), Copilot launch.
+       - 企業級解決方案 (Enterprise Solutions) - e.g., Salesforce AI integration.
+       - 硬體與基礎設施 (Hardware & Infra) - e.g., H100 announcement (AI gold rush), AMD MI300.
+
+    3. 技術突破與轉折點 (Tech Breakthroughs as Market Catalysts):
+       - 關鍵論文 (Seminal Papers) - e.g., "Attention Is All You Need" (foundation of modern value creation).
+       - 模型發布 (Model Releases) - e.g., GPT-4 (set new industry standard).
+
+    4. 政策與監管衝擊 (Regulation & Policy Impact):
+       - 貿易限制 (Trade Restrictions) - e.g., US bans AI chip exports to China (impacted NVIDIA/AMD stocks).
+       - 監管審查 (Regulation Scrutiny) - e.g., Antitrust investigations into AI partnerships.
+
+    Category guide "歷史市場崩跌" (events that caused significant drops in the Global (US) or Taiwan stock markets):
+
+    1. 金融危機 (Financial Crisis):
+       - 亞洲金融風暴 (Asian Financial Crisis)
+       - 網路泡沫 (Dot-com Bubble)
+       - 次貸危機 (Subprime Crisis / Global Financial Crisis)
+       - 歐債危機 (European Debt Crisis)
+       - 銀行倒閉 (Bank Failure)
+
+    2. 公共衛生 (Public Health):
+       - 傳染病爆發 (Pandemic) - e.g., SARS, COVID-19
+
+    3. 地緣政治 (Geopolitics):
+       - 恐怖攻擊 (Terrorist Attack) - e.g., 911
+       - 戰爭衝突 (War & Conflict) - e.g., Persian Gulf War, Russia-Ukraine
+       - 貿易戰 (Trade War)
+       - 政治黑天鵝 (Political Black Swan) - e.g., Brexit, 1996 Taiwan Strait Crisis (台海飛彈危機)
+
+    4. 自然災害 (Natural Disaster):
+       - 重大震災 (Major Earthquake) - e.g., 921 Earthquake, 311 Japan Earthquake
+
+    5. 政策衝擊 (Policy Shock):
+       - 貨幣政策 (Monetary Policy) - e.g., Aggressive Rate Hikes
+       - 證所稅事件 (Stock Transaction Tax) - Specific to Taiwan (1990)
+    """
+
+class PromptTemplate:
+    """
+    A prompt split into its static prefix (instructions, taxonomy, output rules) and a
+    str.format template for the part that changes between calls.
+
+    The prefix is sent as the system instruction, which lets gemini_client upload it
+    once as cached content (context_cache.py) instead of resending it with every request.
+    """
+
+    def __init__(self, name, prefix, template):
+        self.name = name
+        self.prefix = textwrap.dedent(prefix).strip()
+        self.template = textwrap.dedent(template).strip()
+
+    def render(self, **values):
+        """Returns the per-call contents."""
+        return self.template.format(**values)
+
+    def config(self, base=None):
+        """Returns a copy of the GenerateContentConfig `base` with the prefix as its system instruction."""
+        from google.genai import types
+        if base is None:
+            return types.GenerateContentConfig(system_instruction=self.prefix)
+        return base.model_copy(update={"system_instruction": self.prefix})
+
+def register_template(name, prefix, template):
+    """Registers and returns a PromptTemplate; the name must be unique."""
+    if name in _templates:
+        raise ValueError(f"Prompt template '{name}' is already registered")
+    _templates[name] = PromptTemplate(name, prefix, template)
+    return _templates[name]
+
+def get_template(name):
+    return _templates[name]
+
+def templates():
+    return dict(_templates)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the registered prompt templates and the size of their static prefixes")
+    parser.add_argument("name", nargs="?", help="Print this template's prefix and per-call template")
+    args = parser.parse_args()
+
+    for module_name in TEMPLATE_MODULES:
+        importlib.import_module(module_name)
+    # The scripts registered into the imported module, not into __main__
+    registry = importlib.import_module("prompt_templates")
+    if args.name:
+        template = registry.get_template(args.name)
+        print(f"--- prefix (system instruction) ---\n{template.prefix}\n\n--- per-call template ---\n{template.template}")
+    else:
+        print(f"{'Template':<24} {'Prefix chars':>12} {'~tokens':>8} {'Per-call chars':>15}")
+        for name, template in sorted(registry.templates().items()):
+            print(f"{name:<24} {len(template.prefix):>12} {estimate_tokens(template.prefix):>8} {len(template.template):>15}")
@@ -0,0 +1,142 @@
+import os
+import json
+import argparse
+import datetime
+import threading
+
+DEFAULT_HISTORY_FILE = "quota_history.jsonl"
+
+# Serializes appends when several projects are checked concurrently
+_append_lock = threading.Lock()
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+def utc_now():
+    return datetime.datetime.now(datetime.timezone.utc).strftime(TIME_FORMAT)
+
+def parse_time(value, end=False):
+    """
+    Turns a date or ISO-8601 time into the history's timestamp format (UTC). A date
+    alone means the start of that day, or with `end` its last second, so an --until
+    date includes the changes made on it. Raises ValueError for anything else.
+    """
+    if value is None:
+        return None
+    if len(value) == 10:
+        day = datetime.date.fromisoformat(value)
+        moment = datetime.datetime.combine(day, datetime.time(23, 59, 59) if end else datetime.time())
+    else:
+        moment = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+        if moment.tzinfo is not None:
+            moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return moment.strftime(TIME_FORMAT)
+
+class QuotaHistory:
+    """
+    Append-only history of effective quota limits.
+
+    Each JSONL line is one change keyed by (time, project, model, limit) with the new
+    value (null when the limit disappeared). Only changes are written, so the file stays
+    small and a week without changes adds nothing. Snapshots at any time are rebuilt by
+    replaying the lines up to that time; timestamps are ISO-8601 UTC, so they compare
+    as strings.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_FILE):
+        self.path = path
+        self.records = []
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.records.append(json.loads(line))
+
+    def projects(self):
+        return sorted({record["project"] for record in self.records})
+
+    def changes(self, project=None, since=None, until=None):
+        """Returns the change records for a project (or all) with since <= time <= until (dates or ISO-8601 times)."""
+        since = parse_time(since)
+        until = parse_time(until, end=True)
+        return [record for record in self.records
+                if (project is None or record["project"] == project)
+                and (since is None or record["time"] >= since)
+                and (until is None or record["time"] <= until)]
+
+    def snapshot(self, project, at=None):
+        """Returns limits_by_model ({model: {limit: value}}) as of `at` (default: latest)."""
+        limits_by_model = {}
+        for record in self.changes(project, until=at):
+            limits = limits_by_model.setdefault(record["model"], {})
+            if record["value"] is None:
+                limits.pop(record["limit"], None)
+                if not limits:
+                    del limits_by_model[record["model"]]
+            else:
+                limits[record["limit"]] = record["value"]
+        return limits_by_model
+
+    def diff(self, project, start=None, end=None):
+        """Returns [(model, limit, old, new)] for every limit that differs between two times."""
+        return diff_limits(self.snapshot(project, start) if start else {}, self.snapshot(project, end))
+
+    def record(self, project, limits_by_model, timestamp=None):
+        """Appends the limits that changed since the latest snapshot; returns those changes."""
+        changes = diff_limits(self.snapshot(project), limits_by_model)
+        if not changes:
+            return []
+        timestamp = timestamp or utc_now()
+        records = [{"time": timestamp, "project": project, "model": model, "limit": limit, "value": new}
+                   for model, limit, _, new in changes]
+        with _append_lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records))
+        self.records.extend(records)
+        return changes
+
+def diff_limits(old, new):
+    """Returns [(model, limit, old_value, new_value)] between two limits_by_model tables."""
+    changes = []
+    for model in sorted(set(old) | set(new)):
+        old_limits = old.get(model, {})
+        new_limits = new.get(model, {})
+        for limit in sorted(set(old_limits) | set(new_limits)):
+            if old_limits.get(limit) != new_limits.get(limit):
+                changes.append((model, limit, old_limits.get(limit), new_limits.get(limit)))
+    return changes
+
+def format_changes(changes):
+    return [f"{model:<30} | {limit:<20} | {str(old if old is not None else '-'):>12} -> {str(new if new is not None else '-')}"
+            for model, limit, old, new in changes]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the quota snapshot history written by check_quota.py")
+    parser.add_argument("command", choices=["show", "diff", "log"], help="show: limits at a point in time, diff: changes between two times, log: change records in a time range")
+    parser.add_argument("--project", help="Project ID (default: the only/first project in the history)")
+    parser.add_argument("--since", help="Start time, ISO-8601 UTC (e.g. 2025-01-01 or 2025-01-01T00:00:00Z)")
+    parser.add_argument("--until", help="End time / snapshot time; a date alone includes that whole day (default: latest)")
+    parser.add_argument("--history-file", default=DEFAULT_HISTORY_FILE, help="History file to read")
+    args = parser.parse_args()
+
+    for value in (args.since, args.until):
+        try:
+            parse_time(value)
+        except ValueError:
+            print(f"Error: '{value}' is not a date (YYYY-MM-DD) or ISO-8601 time.")
+            exit(1)
+
+    history = QuotaHistory(args.history_file)
+    project = args.project or next(iter(history.projects()), None)
+    if project is None:
+        print(f"No quota history in '{args.history_file}'. Run check_quota.py first.")
+        exit(1)
+
+    if args.command == "show":
+        for model, limits in sorted(history.snapshot(project, args.until).items()):
+            print(f"{model:<30} | " + " | ".join(f"{limit}: {value}" for limit, value in sorted(limits.items())))
+    elif args.command == "diff":
+        changes = history.diff(project, args.since, args.until)
+        print("\n".join(format_changes(changes)) if changes else "No changes.")
+    else:
+        for record in history.changes(project, args.since, args.until):
+            print(f"{record['time']}  {record['model']:<30} {record['limit']:<20} {record['value']}")
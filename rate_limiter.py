@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import random
+import datetime
+import tempfile
+import threading
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles") # Gemini daily quotas reset at midnight Pacific time
+except Exception:
+    QUOTA_TZ = datetime.timezone.utc
+
+DEFAULT_LIMITS_FILE = "quota_limits.json"
+DEFAULT_LEDGER_FILE = ".gemini_ledger.json"
+LEDGER_KEEP_DAYS = 7
+
+RPM = "Requests per Minute"
+RPD = "Requests per Day"
+TPM = "Tokens per Minute"
+
+class DailyQuotaExceeded(Exception):
+    """Raised when the per-day request ledger shows a model's RPD is used up."""
+
+def parse_limit(value):
+    """Converts a stored limit ("15", 15, "-1", "Unlimited", "-") into an int, or None for no limit."""
+    if value is None or value in ("Unlimited", "-", "N/A"):
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+def save_limits(limits_by_model, project_id=None, path=DEFAULT_LIMITS_FILE):
+    """Persists the limits table built by check_quota so the rate limiter can use it."""
+    data = {
+        "project_id": project_id,
+        "limits": limits_by_model,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+def load_limits(path=DEFAULT_LIMITS_FILE):
+    """Loads the persisted limits table, returning {} when it does not exist."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("limits", {})
+    except (OSError, ValueError):
+        return {}
+
+def estimate_tokens(contents):
+    """Roughly estimates the prompt tokens of `contents` (about 4 UTF-8 bytes per token)."""
+    if isinstance(contents, str):
+        return max(1, len(contents.encode("utf-8")) // 4)
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(c) for c in contents)
+    text = getattr(contents, "text", None)
+    if isinstance(text, str):
+        return estimate_tokens(text)
+    parts = getattr(contents, "parts", None)
+    if parts:
+        return sum(estimate_tokens(getattr(p, "text", "") or "") for p in parts)
+    return 1
+
+def is_rate_limit_error(error):
+    """Returns True for 429 / RESOURCE_EXHAUSTED errors from the GenAI SDK."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if code == 429:
+        return True
+    return "RESOURCE_EXHAUSTED" in str(error)
+
+def retry_delay_hint(error):
+    """Extracts the server-suggested retryDelay (seconds) from a 429 error, if any."""
+    details = getattr(error, "details", None)
+    try:
+        for detail in details["error"]["details"]:
+            delay = detail.get("retryDelay")
+            if delay and delay.endswith("s"):
+                return float(delay[:-1])
+    except (TypeError, KeyError, ValueError, AttributeError):
+        pass
+    return None
+
+class TokenBucket:
+    """Thread-safe token bucket that refills `capacity` units every minute."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.rate = capacity / 60.0
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Blocks until `amount` units are available, then takes them."""
+        # Never wait for more than a full bucket, otherwise oversized requests would block forever
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, amount):
+        """Debits (positive) or credits (negative) units after the real cost is known."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - amount)
+
+class RateLimiter:
+    """
+    Client-side limiter for Gemini calls.
+
+    Enforces RPM and TPM per model with token buckets built from the limits saved by
+    check_quota.py, keeps a per-day request ledger checked against RPD, and retries
+    429 responses with jittered exponential backoff.
+    """
+
+    def __init__(self, limits_file=None, ledger_file=None, max_retries=5, base_delay=2.0, max_delay=60.0):
+        self._limits_file = limits_file
+        self._ledger_file = ledger_file
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._limits = None
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._ledger_lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """
+        Re-reads the GEMINI_QUOTA_FILE / GEMINI_LEDGER_FILE / GEMINI_RATE_LIMIT settings and,
+        if the saved limits changed (e.g. check_quota.py ran since), rebuilds the token buckets.
+        The request ledger lives on disk, so the RPD count carries over.
+        """
+        with self._lock:
+            self.limits_file = self._limits_file or os.environ.get("GEMINI_QUOTA_FILE", DEFAULT_LIMITS_FILE)
+            self.ledger_file = self._ledger_file or os.environ.get("GEMINI_LEDGER_FILE", DEFAULT_LEDGER_FILE)
+            self.enabled = os.environ.get("GEMINI_RATE_LIMIT", "1") not in ("0", "off", "false")
+            if self._limits is not None and load_limits(self.limits_file) != self._limits:
+                self._limits = None
+                self._buckets = {}
+
+    def limits_for(self, model):
+        """Returns the limits entry that applies to `model` (exact, longest prefix, then Global)."""
+        if self._limits is None:
+            self._limits = load_limits(self.limits_file)
+        name = model.split("/")[-1]
+        if name in self._limits:
+            return self._limits[name]
+        prefixes = [m for m in self._limits if name.startswith(m)]
+        if prefixes:
+            return self._limits[max(prefixes, key=len)]
+        return self._limits.get("Global", {})
+
+    def _buckets_for(self, model):
+        with self._lock:
+            if model not in self._buckets:
+                limits = self.limits_for(model)
+                rpm = parse_limit(limits.get(RPM))
+                tpm = parse_limit(limits.get(TPM))
+                self._buckets[model] = (
+                    TokenBucket(rpm) if rpm else None,
+                    TokenBucket(tpm) if tpm else None,
+                )
+            return self._buckets[model]
+
+    def _today(self):
+        return datetime.datetime.now(QUOTA_TZ).date().isoformat()
+
+    def _read_ledger(self):
+        try:
+            with open(self.ledger_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def requests_today(self, model):
+        """Returns how many requests the ledger has recorded for `model` today."""
+        return self._read_ledger().get(self._today(), {}).get(model, 0)
+
+    def _record_request(self, model):
+        with self._ledger_lock:
+            ledger = self._read_ledger()
+            today = self._today()
+            day = ledger.setdefault(today, {})
+            day[model] = day.get(model, 0) + 1
+            # Keep only the most recent days
+            for old_day in sorted(ledger)[:-LEDGER_KEEP_DAYS]:
+                del ledger[old_day]
+            try:
+                directory = os.path.dirname(os.path.abspath(self.ledger_file))
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(ledger, f, indent=2, sort_keys=True)
+                os.replace(tmp_path, self.ledger_file)
+            except OSError as e:
+                print(f"Warning: Could not update request ledger: {e}")
+
+    def _check_daily(self, model):
+        rpd = parse_limit(self.limits_for(model).get(RPD))
+        if rpd and self.requests_today(model) >= rpd:
+            raise DailyQuotaExceeded(f"Daily request quota ({rpd}) for {model} is used up.")
+
+    def _retry_delay(self, model, error, retries):
+        """Returns how long to wait before retrying `error`, re-raising it when it is not retryable."""
+        if not is_rate_limit_error(error) or retries >= self.max_retries:
+            raise error
+        delay = retry_delay_hint(error)
+        if delay is None:
+            # Full jitter: a random wait up to the exponential backoff ceiling
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** retries)))
+        print(f"Rate limited on {model}; retry {retries + 1}/{self.max_retries} in {delay:.1f}s...")
+        return delay
+
+    def _settle(self, token_bucket, response, estimated_tokens):
+        """Corrects the token bucket with the real usage of a response."""
+        if token_bucket:
+            usage = getattr(response, "usage_metadata", None)
+            actual = getattr(usage, "total_token_count", None) if usage else None
+            if actual:
+                token_bucket.adjust(actual - min(estimated_tokens, token_bucket.capacity))
+
+    def call(self, model, func, estimated_tokens=0):
+        """
+        Runs `func()` (one Gemini request for `model`) under the limits.
+
+        Returns (response, retries), where retries is the number of 429 retries it took.
+        """
+        if not self.enabled:
+            return func(), 0
+
+        self._check_daily(model)
+        request_bucket, token_bucket = self._buckets_for(model)
+        retries = 0
+        while True:
+            if request_bucket:
+                request_bucket.acquire(1)
+            if token_bucket:
+                token_bucket.acquire(estimated_tokens)
+            self._record_request(model)
+            try:
+                response = func()
+            except Exception as e:
+                delay = self._retry_delay(model, e, retries)
+                retries += 1
+                time.sleep(delay)
+                continue
+            self._settle(token_bucket, response, estimated_tokens)
+            return response, retries
+
+    async def call_async(self, model, func, estimated_tokens=0):
+        """
+        Async counterpart of call(): awaits `func()` (a coroutine factory) under the same limits.
+
+        Bucket waits and ledger writes run in worker threads so the event loop keeps
+        serving the other requests.
+        """
+        import asyncio
+        if not self.enabled:
+            return await func(), 0
+
+        await asyncio.to_thread(self._check_daily, model)
+        request_bucket, token_bucket = self._buckets_for(model)
+        retries = 0
+        while True:
+            if request_bucket:
+                await asyncio.to_thread(request_bucket.acquire, 1)
+            if token_bucket:
+                await asyncio.to_thread(token_bucket.acquire, estimated_tokens)
+            await asyncio.to_thread(self._record_request, model)
+            try:
+                response = await func()
+            except Exception as e:
+                delay = self._retry_delay(model, e, retries)
+                retries += 1
+                await asyncio.sleep(delay)
+                continue
+            self._settle(token_bucket, response, estimated_tokens)
+            return response, retries
@@ -0,0 +1,125 @@
+import os
+import hashlib
+import datetime
+import tempfile
+import threading
+
+README_PATH = "README.md"
+HASH_PREFIX = "<!-- payload-hash: "
+HASH_SUFFIX = " -->"
+
+# Serializes read-modify-writes of README.md between jobs running in one process (gemini_daemon.py)
+_apply_lock = threading.Lock()
+
+# Shared writer that update_readme() queues into once defer_updates() was called
+_deferred = None
+
+def payload_hash(content, fence):
+    return hashlib.sha256(f"{fence}\n{content}".encode("utf-8")).hexdigest()[:16]
+
+class ReadmeWriter:
+    """
+    Collects README section updates and applies them in one read-modify-write.
+
+    Each section lives between a start and end marker. A hash of the section's payload
+    is stored in the block, so sections whose content has not changed keep their old
+    timestamp and, if nothing changed at all, the file is not rewritten. The new file
+    is written to a temp file and renamed over README.md.
+    """
+
+    def __init__(self, readme_path=README_PATH):
+        self.readme_path = readme_path
+        self.sections = []
+        self._lock = threading.Lock()
+
+    def add(self, content, start_marker, end_marker, fence="text"):
+        """Queues `content` for the block between start_marker and end_marker (a later add of the same block wins)."""
+        with self._lock:
+            self.sections = [section for section in self.sections if section[1] != start_marker]
+            self.sections.append((content, start_marker, end_marker, fence))
+
+    def apply(self):
+        """Applies all queued sections; returns True if README.md was rewritten."""
+        with self._lock:
+            sections, self.sections = self.sections, []
+        if not sections:
+            return False
+        with _apply_lock:
+            return self._apply(sections)
+
+    def _apply(self, sections):
+        try:
+            with open(self.readme_path, "r", encoding="utf-8", newline="") as f:
+                readme_content = f.read()
+        except OSError as e:
+            print(f"Error updating README: {e}")
+            return False
+
+        # Generate timestamp
+        now = datetime.datetime.now()
+        timestamp_str = now.strftime("產生時間: %Y-%m-%d %H:%M:%S") + " CST"
+
+        changed = []
+        new_content = readme_content
+        for content, start_marker, end_marker, fence in sections:
+            start_pos = new_content.find(start_marker)
+            end_pos = new_content.find(end_marker)
+
+            if start_pos == -1 or end_pos == -1:
+                print(f"Warning: Markers {start_marker} and {end_marker} not found in {self.readme_path}")
+                continue
+
+            digest = payload_hash(content, fence)
+            hash_line = f"{HASH_PREFIX}{digest}{HASH_SUFFIX}"
+            if hash_line in new_content[start_pos:end_pos]:
+                print(f"README section {start_marker} unchanged; skipping.")
+                continue
+
+            new_content = (
+                new_content[:start_pos + len(start_marker)]
+                + f"\n{hash_line}\n{timestamp_str}\n\n```{fence}\n" + content + "\n```\n"
+                + new_content[end_pos:]
+            )
+            changed.append(start_marker)
+
+        if not changed:
+            return False
+
+        try:
+            directory = os.path.dirname(os.path.abspath(self.readme_path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                f.write(new_content)
+            os.replace(tmp_path, self.readme_path)
+        except OSError as e:
+            print(f"Error updating README: {e}")
+            return False
+
+        print(f"Successfully updated {self.readme_path} ({len(changed)} section(s))")
+        return True
+
+def defer_updates(readme_path=README_PATH):
+    """
+    Makes update_readme() queue its sections into one shared ReadmeWriter instead of
+    writing at once, for a host that runs several scripts (gemini_daemon.py) and writes
+    their sections together with flush_updates().
+    """
+    global _deferred
+    with _apply_lock:
+        if _deferred is None:
+            _deferred = ReadmeWriter(readme_path)
+    return _deferred
+
+def flush_updates():
+    """Writes the sections queued since defer_updates(); returns True if README.md was rewritten."""
+    return _deferred.apply() if _deferred is not None else False
+
+def update_readme(content, start_marker, end_marker, fence="text"):
+    """Updates the README.md file between specific markers (or queues it, after defer_updates())."""
+    if _deferred is not None:
+        _deferred.add(content, start_marker, end_marker, fence)
+        print(f"README section {start_marker} queued.")
+        return False
+    writer = ReadmeWriter()
+    writer.add(content, start_marker, end_marker, fence)
+    return writer.apply()
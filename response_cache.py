@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+DEFAULT_CACHE_DIR = ".gemini_cache"
+DEFAULT_TTL = 24 * 60 * 60 # 1 day
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024 # 100 MB
+
+def _to_jsonable(value):
+    """Converts SDK objects (pydantic models), lists and dicts into plain JSON data."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, dict):
+        return {str(k): _to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_jsonable(v) for v in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return repr(value)
+
+class ResponseCache:
+    """
+    Content-addressed on-disk cache for generate_content responses.
+
+    Entries are keyed on a hash of (model, contents, config) and stored as one JSON
+    file each. Expired entries are dropped on read, and the least recently used
+    entries are evicted once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        self.reload()
+
+    def reload(self):
+        """Re-reads the GEMINI_CACHE* settings and clears the --no-cache / --refresh switches."""
+        self.cache_dir = self._cache_dir or os.environ.get("GEMINI_CACHE_DIR", DEFAULT_CACHE_DIR)
+        max_bytes = self._max_bytes
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("GEMINI_CACHE_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.enabled = os.environ.get("GEMINI_CACHE", "1") not in ("0", "off", "false")
+        self.refresh = False
+
+    def make_key(self, model, contents, config=None):
+        """Returns the cache key for a request."""
+        payload = {
+            "model": model,
+            "contents": _to_jsonable(contents),
+            "config": _to_jsonable(config),
+        }
+        encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        return hashlib.sha256(encoded).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        """Returns the cached GenerateContentResponse for key, or None on a miss."""
+        if not self.enabled or self.refresh:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("created", 0) > entry.get("ttl", DEFAULT_TTL):
+            self._remove(path)
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        from google.genai import types
+        return types.GenerateContentResponse.model_validate(entry["response"])
+
+    def put(self, key, response, ttl=None, site=None):
+        """Stores a response under key with the given TTL (seconds)."""
+        if not self.enabled:
+            return
+        entry = {
+            "created": time.time(),
+            "ttl": DEFAULT_TTL if ttl is None else ttl,
+            "site": site,
+            "response": _to_jsonable(response),
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Warning: Could not write response cache entry: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith(".json")]
+        except OSError:
+            return
+        stats = []
+        total = 0
+        for entry in entries:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            stats.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+        if total <= self.max_bytes:
+            return
+        for _, size, path in sorted(stats):
+            self._remove(path)
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """Deletes every cache entry."""
+        try:
+            entries = list(os.scandir(self.cache_dir))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name.endswith(".json"):
+                self._remove(entry.path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
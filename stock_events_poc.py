@@ -3,77 +3,45 @@ import argparse
 import datetime
 import csv
 import io
+import time
 from datetime import timedelta
-from google import genai
-from google.genai import types
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+from readme_writer import update_readme
+from gemini_client import add_cache_arguments, configure_cache, create_client, generate_content, load_env
+from key_index import KeyIndex, event_key
+from event_csv import EVENT_HEADER, is_header_row, is_valid_date, parse_event_rows, validate_row
+from near_duplicates import DEFAULT_DATE_TOLERANCE, DEFAULT_THRESHOLD, NearDuplicateIndex
+from coverage_ledger import DEFAULT_MAX_AGE_HOURS, DEFAULT_NEAR_DAYS, CoverageLedger
 
-# Load environment variables from .env file
-load_dotenv()
+# Grounded search results go stale quickly, so only reuse them briefly
+CACHE_TTL = 60 * 60
 
-def update_readme(content, start_marker, end_marker):
-    """Updates the README.md file between specific markers."""
-    readme_path = "README.md"
-    try:
-        with open(readme_path, "r", encoding="utf-8") as f:
-            readme_content = f.read()
-        
-        start_pos = readme_content.find(start_marker)
-        end_pos = readme_content.find(end_marker)
-        
-        if start_pos == -1 or end_pos == -1:
-            print(f"Warning: Markers {start_marker} and {end_marker} not found in {readme_path}")
-            return
+OUTPUT_FILE = "market_events.csv"
 
-        # Generate timestamp
-        now = datetime.datetime.now()
-        timestamp_str = now.strftime("產生時間: %Y-%m-%d %H:%M:%S") + " CST"
-
-
-        new_content = (
-            readme_content[:start_pos + len(start_marker)]
-            + f"\n{timestamp_str}\n\n```csv\n" + content + "\n```\n" # Add timestamp here, use ```csv
-            + readme_content[end_pos:]
-        )
-        
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_content)
-            
-        print(f"Successfully updated {readme_path}")
-        
-    except Exception as e:
-        print(f"Error updating README: {e}")
+# Days before and after today covered by the sliding window
+WINDOW_DAYS = 7
 
-def generate_market_csv(update_readme_flag=False):
-    # 1. Initialize Client
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("Error: GEMINI_API_KEY environment variable not set.")
-        return
+# Event families covered by the prompt; sharded runs can ask for each one separately
+EVENT_FAMILIES = {
+    "schedule": "Taiwan Stock Exchange (TWSE) and Taipei Exchange (TPEx) official schedules (holidays, open tenders).",
+    "company": "Key TWSE/TPEx listed company events: Earnings calls (法說會), Ex-dividend dates (除權息), Capital reductions, Shareholder meetings.",
+    "macro": "Major Global Economic Data impacting Taiwan: US FOMC meetings, US CPI/PPI releases, Non-farm payrolls.",
+    "tech": "Major Tech Earnings (e.g., TSMC, Apple, NVIDIA) if occurring in this range.",
+}
 
-    client = genai.Client(api_key=api_key)
+def build_prompt(date_range_str, families=None):
+    """Builds the grounded extraction prompt for a date range and a subset of EVENT_FAMILIES."""
+    families = families or list(EVENT_FAMILIES)
+    focus = "\n".join(f"    {i}. {EVENT_FAMILIES[name]}" for i, name in enumerate(families, 1))
 
-    # 2. Calculate Date Range (Dynamic)
-    today = datetime.date.today()
-    # Define "Last Week" to "Next Week" as a sliding window: -7 days to +7 days
-    start_date = today - timedelta(days=7)
-    end_date = today + timedelta(days=7)
-    
-    date_range_str = f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
-    print(f"Generating market events for period: {date_range_str}...")
-
-    # 3. Construct Prompt
     # We explicitly ask for CSV format, define the columns, and request search grounding.
-    prompt = f"""
+    return f"""
     You are a financial data analyst.
     
     Task: Search for and extract scheduled stock market events for the period: {date_range_str}.
     
     Focus on identifying specific events including:
-    1. Taiwan Stock Exchange (TWSE) and Taipei Exchange (TPEx) official schedules (holidays, open tenders).
-    2. Key TWSE/TPEx listed company events: Earnings calls (法說會), Ex-dividend dates (除權息), Capital reductions, Shareholder meetings.
-    3. Major Global Economic Data impacting Taiwan: US FOMC meetings, US CPI/PPI releases, Non-farm payrolls.
-    4. Major Tech Earnings (e.g., TSMC, Apple, NVIDIA) if occurring in this range.
+{focus}
 
     Use Google Search to find real, specific dates and details.
     
@@ -93,67 +61,147 @@ def generate_market_csv(update_readme_flag=False):
     - MANDATORY: You must populate "Link1" with the source URL for every event. If a direct link is not available, use the search result link. Do not leave "Link1" empty.
     """
 
-    print("Sending request to Gemini 2.5 Flash with Google Search...")
-    
-    try:
+def format_date_range(start_date, end_date):
+    return f"{start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+
+def parse_csv_response(csv_content):
+    """Splits the model's CSV answer into (header, rows)."""
+    # Clean up if the model added markdown blocks despite instructions
+    if csv_content.startswith("```"):
+        csv_content = csv_content.strip("`").replace("csv\n", "", 1)
+
+    rows = list(csv.reader(io.StringIO(csv_content)))
+    if not rows:
+        return None, []
+    return rows[0], rows[1:]
+
+def request_events(client, start_date, end_date, families=None, structured=False):
+    """Runs one grounded request and returns (csv_content, header, rows)."""
+    from google.genai import types
+
+    prompt = build_prompt(format_date_range(start_date, end_date), families)
+    config = types.GenerateContentConfig(
         # Enable Google Search Tool
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                tools=[types.Tool(google_search=types.GoogleSearch())],
-                response_modalities=["TEXT"]
-            )
-        )
-        
-        csv_content = response.text.strip()
-        
-        # Clean up if the model added markdown blocks despite instructions
-        if csv_content.startswith("```"):
-            csv_content = csv_content.strip("`").replace("csv\n", "", 1)
+        tools=[types.Tool(google_search=types.GoogleSearch())],
+        response_modalities=["TEXT"]
+    )
 
-        # 4. Save to File (Append with Deduplication)
-        output_file = "market_events.csv"
-        
-        # Parse the new content
-        new_events = []
-        header = None
+    if structured:
+        # Typed JSON records, validated in one pass; only invalid rows are re-requested
+        from structured_events import generate_structured_rows
+        rows = generate_structured_rows(client, prompt, config, ttl=CACHE_TTL,
+                                        site="stock_events_poc.generate_market_csv")
+        return rows_to_csv(EVENT_HEADER, rows), EVENT_HEADER, rows
+
+    response = generate_content(
+        client,
+        model="gemini-2.5-flash",
+        contents=prompt,
+        config=config,
+        ttl=CACHE_TTL,
+        site="stock_events_poc.generate_market_csv",
+    )
+    csv_content = response.text.strip()
+    header, rows = parse_csv_response(csv_content)
+    return csv_content, header, rows
+
+def split_range(start_date, end_date, shard_days=None):
+    """Splits [start_date, end_date] into ranges of at most shard_days days."""
+    if not shard_days:
+        return [(start_date, end_date)]
+    ranges = []
+    current = start_date
+    while current <= end_date:
+        shard_end = min(end_date, current + timedelta(days=shard_days - 1))
+        ranges.append((current, shard_end))
+        current = shard_end + timedelta(days=1)
+    return ranges
+
+def build_shards(start_date, end_date, shard_days=None, by_family=False):
+    """Splits the window into (start, end, families) shards by day range and/or event family."""
+    family_groups = [[name] for name in EVENT_FAMILIES] if by_family else [None]
+    return [(s, e, families) for s, e in split_range(start_date, end_date, shard_days) for families in family_groups]
+
+def build_refresh_shards(due, shard_days=None, by_family=False):
+    """
+    Turns the coverage ledger's {family: [days]} into (start, end, families) shards:
+    families due on the same days share a request (unless by_family), and each run of
+    consecutive days becomes one range.
+    """
+    groups = {}
+    for family, days in due.items():
+        if days:
+            groups.setdefault((family,) if by_family else tuple(days), []).append(family)
+    shards = []
+    for families in groups.values():
+        days = due[families[0]]
+        run_start = previous = days[0]
+        for day in days[1:] + [None]:
+            if day is not None and (day - previous).days == 1:
+                previous = day
+                continue
+            for s, e in split_range(run_start, previous, shard_days):
+                shards.append((s, e, None if len(families) == len(EVENT_FAMILIES) else families))
+            run_start = previous = day
+    return sorted(shards, key=lambda shard: shard[0])
+
+def request_events_sharded(client, shards, workers=4, structured=False):
+    """
+    Runs the shards concurrently; returns (header, rows merged in shard order, per-shard
+    (header, rows) with None for the shards that failed).
+    """
+    results = [None] * len(shards)
+
+    def run_shard(i):
+        shard_start, shard_end, families = shards[i]
+        label = f"{format_date_range(shard_start, shard_end)} [{','.join(families or EVENT_FAMILIES)}]"
+        started = time.perf_counter()
         try:
-            reader = csv.reader(io.StringIO(csv_content))
-            rows = list(reader)
-            if rows:
-                header = rows[0]
-                new_events = rows[1:]
-        except csv.Error as e:
-             print(f"Error parsing CSV response: {e}")
-             return
-
-        # Load existing keys (Name + StartDate) to prevent duplicates
-        existing_keys = set()
-        write_header = True
-        
-        if os.path.exists(output_file):
-            write_header = False
-            try:
-                with open(output_file, "r", encoding="utf-8") as f:
-                    reader = csv.reader(f)
-                    for i, row in enumerate(reader):
-                        if i == 0: continue # Skip header
-                        if len(row) >= 4:
-                            # Key: Event Name + Start Date
-                            key = (row[2].strip(), row[3].strip())
-                            existing_keys.add(key)
-            except Exception as e:
-                print(f"Warning: Could not read existing file for deduplication: {e}")
-                # If read fails, maybe overwrite or append anyway? Let's proceed to append what we can.
+            _, header, rows = request_events(client, shard_start, shard_end, families, structured)
+        except Exception as e:
+            print(f"  Shard {label} failed after {time.perf_counter() - started:.1f}s: {e}")
+            return
+        print(f"  Shard {label}: {len(rows)} events in {time.perf_counter() - started:.1f}s")
+        results[i] = (header, rows)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run_shard, range(len(shards))))
+
+    header = None
+    rows = []
+    for result in results:
+        if result is None:
+            continue
+        header = header or result[0]
+        rows.extend(result[1])
+    return header, rows, results
 
+def append_new_events(output_file, header, new_events, near_dup_threshold=DEFAULT_THRESHOLD, date_tolerance=DEFAULT_DATE_TOLERANCE):
+    """
+    Appends rows whose (事件名稱, 開始日期) is not yet in output_file and that are not
+    a rephrasing of an event within `date_tolerance` days; returns the appended rows.
+    A near_dup_threshold of 0 turns the near-duplicate check off.
+    """
+    # Check keys (Name + StartDate) against the persistent sidecar index to prevent duplicates.
+    # The index rebuilds itself from the CSV if the two disagree.
+    write_header = not os.path.exists(output_file)
+
+    near_index = NearDuplicateIndex(output_file, threshold=near_dup_threshold, date_tolerance=date_tolerance) if near_dup_threshold else None
+    with KeyIndex(output_file) as key_index:
         rows_to_append = []
+        batch_keys = set() # Prevent duplicates within the new batch
         for row in new_events:
-            if len(row) >= 4:
-                key = (row[2].strip(), row[3].strip())
-                if key not in existing_keys:
-                    rows_to_append.append(row)
-                    existing_keys.add(key) # Add to set to prevent duplicates within the new batch
+            key = event_key(row)
+            if not key or key in batch_keys or key in key_index:
+                continue
+            if near_index is not None and is_valid_date(key[1]):
+                # Also indexes the row, so later rows of the batch are compared with it
+                match = near_index.add_if_new(row)
+                if match:
+                    print(f"Skipped near-duplicate ({match[2]:.2f}): '{key[0]}' ~ '{match[0]}' ({match[1]})")
+                    continue
+            rows_to_append.append(row)
+            batch_keys.add(key)
 
         if rows_to_append:
             mode = "a" if os.path.exists(output_file) else "w"
@@ -162,23 +210,148 @@ def generate_market_csv(update_readme_flag=False):
                 if write_header and header:
                     writer.writerow(header)
                 writer.writerows(rows_to_append)
+            key_index.add_many(batch_keys)
+            key_index.mark_synced()
+            if near_index is not None:
+                near_index.mark_synced()
             print(f"Successfully appended {len(rows_to_append)} new events to '{output_file}'.")
         else:
             print(f"No new unique events found to append to '{output_file}'.")
+    if near_index is not None:
+        near_index.close()
+    return rows_to_append
+
+def window_rows(output_file, start_date, end_date):
+    """Rows of output_file overlapping [start_date, end_date], ordered by 開始日期."""
+    try:
+        with open(output_file, "r", encoding="utf-8-sig") as f:
+            rows = parse_event_rows(f.read())
+    except OSError:
+        return []
+    start, end = start_date.isoformat(), end_date.isoformat()
+    rows = [row for row in rows if not validate_row(row, require_link=False)
+            and row[3].strip() <= end and (row[4].strip() or row[3].strip()) >= start]
+    return sorted(rows, key=lambda row: row[3].strip())
+
+def rows_to_csv(header, rows):
+    """Renders a header and rows back into CSV text."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if header:
+        writer.writerow(header)
+    writer.writerows(rows)
+    return buffer.getvalue().strip()
+
+def generate_market_csv(update_readme_flag=False, shard_days=None, by_family=False, workers=4, structured=False,
+                        near_dup_threshold=DEFAULT_THRESHOLD, date_tolerance=DEFAULT_DATE_TOLERANCE,
+                        full_window=False, near_days=DEFAULT_NEAR_DAYS, max_age_hours=DEFAULT_MAX_AGE_HOURS):
+    # 1. Initialize Client
+    # Load environment variables from .env file
+    load_env()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        print("Error: GEMINI_API_KEY environment variable not set.")
+        return
+
+    client = create_client(api_key)
+
+    # 2. Calculate Date Range (Dynamic)
+    today = datetime.date.today()
+    # Define "Last Week" to "Next Week" as a sliding window: -7 days to +7 days
+    start_date = today - timedelta(days=WINDOW_DAYS)
+    end_date = today + timedelta(days=WINDOW_DAYS)
+    
+    date_range_str = format_date_range(start_date, end_date)
+    print(f"Generating market events for period: {date_range_str}...")
+
+    output_file = OUTPUT_FILE
+    ledger = CoverageLedger(output_file)
+    try:
+        # 3. Query Gemini (one request, or concurrent shards split by days and/or event family).
+        # The coverage ledger limits the window to the days that still need a search.
+        started = time.perf_counter()
+        searched_at = time.time()
+        shards = None
+        if not full_window:
+            due, new, stale = ledger.due_days(start_date, end_date, list(EVENT_FAMILIES), today, near_days, max_age_hours)
+            total = len(EVENT_FAMILIES) * ((end_date - start_date).days + 1)
+            if new + stale < total:
+                shards = build_refresh_shards(due, shard_days, by_family)
+                print(f"Coverage ledger: {new} new and {stale} stale of {total} day/family slots to search.")
+        if shards is None and (shard_days or by_family):
+            shards = build_shards(start_date, end_date, shard_days, by_family)
+
+        if shards is None:
+            print("Sending request to Gemini 2.5 Flash with Google Search...")
+            csv_content, header, new_events = request_events(client, start_date, end_date, structured=structured)
+            results = [(header, new_events)]
+            shards = [(start_date, end_date, None)]
+        elif shards:
+            print(f"Sending {len(shards)} sharded requests to Gemini 2.5 Flash with Google Search ({workers} at a time)...")
+            header, new_events, results = request_events_sharded(client, shards, workers, structured)
+            csv_content = None
+        else:
+            print("Every day of the window is already covered; nothing to search.")
+            header, new_events, csv_content, results = EVENT_HEADER, [], None, []
+        print(f"Received {len(new_events)} events in {time.perf_counter() - started:.1f}s.")
+
+        # 4. Save to File (Append with Deduplication)
+        append_new_events(output_file, header, new_events, near_dup_threshold, date_tolerance)
+
+        # Only once the rows are in the CSV, and only for answers that were an event CSV
+        # (a refusal or chat answer has no header row), do the searched days count as covered
+        for (shard_start, shard_end, families), result in zip(shards, results):
+            if result is not None and result[0] and is_header_row(result[0]):
+                ledger.record(shard_start, shard_end, families or list(EVENT_FAMILIES), result[1], searched_at)
+            elif result is not None:
+                print(f"  No event CSV for {format_date_range(shard_start, shard_end)}; its days stay due.")
+        # Keeps the ledger (committed by the scheduled workflow) down to the window
+        ledger.prune(start_date)
+
+        if csv_content is None:
+            # Shards cover only part of the window (and may overlap), so show the window as stored in the CSV
+            csv_content = rows_to_csv(header or EVENT_HEADER, window_rows(output_file, start_date, end_date))
 
         print("-" * 30)
         print(csv_content) # Still print the full generated content for visibility
         print("-" * 30)
 
         if update_readme_flag:
-            update_readme(csv_content, "<!-- START_EVENTS_OUTPUT -->", "<!-- END_EVENTS_OUTPUT -->")
+            update_readme(csv_content, "<!-- START_EVENTS_OUTPUT -->", "<!-- END_EVENTS_OUTPUT -->", fence="csv")
 
+    except csv.Error as e:
+        print(f"Error parsing CSV response: {e}")
     except Exception as e:
         print(f"An error occurred: {e}")
+    finally:
+        ledger.close()
+
+def add_arguments(parser):
+    parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
+    parser.add_argument("--compact-index", action="store_true", help="Drop duplicate rows from market_events.csv, rebuild its key index and exit")
+    parser.add_argument("--shard-days", type=int, help="Split the window into shards of N days and query them concurrently")
+    parser.add_argument("--by-family", action="store_true", help="Query each event family (schedule, company, macro, tech) as a separate concurrent shard")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum concurrent shard requests")
+    parser.add_argument("--structured", action="store_true", help="Request typed JSON records instead of free-text CSV and re-request only invalid rows")
+    parser.add_argument("--near-dup-threshold", type=float, default=DEFAULT_THRESHOLD, help="Skip new events whose 事件名稱 is at least this contained in a stored one's (share of the shorter name's bigrams) or vice versa; 0 disables")
+    parser.add_argument("--date-tolerance", type=int, default=DEFAULT_DATE_TOLERANCE, help="Only treat events starting at most this many days apart as near-duplicates")
+    parser.add_argument("--full-window", action="store_true", help="Search the whole window instead of only the days the coverage ledger says are due")
+    parser.add_argument("--near-days", type=int, default=DEFAULT_NEAR_DAYS, help="Search days at most this far from today again on every run, for late-announced events")
+    parser.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE_HOURS, help="Hours before a near day's last search counts as stale")
+    add_cache_arguments(parser)
+
+def main(args):
+    configure_cache(args)
+
+    if args.compact_index:
+        with KeyIndex(OUTPUT_FILE) as key_index:
+            removed = key_index.compact()
+            print(f"Removed {removed} duplicate rows; index holds {len(key_index)} keys.")
+    else:
+        generate_market_csv(args.update_readme, args.shard_days, args.by_family, args.workers, args.structured,
+                            args.near_dup_threshold, args.date_tolerance, args.full_window, args.near_days, args.max_age)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Extract Market Events")
-    parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
-    args = parser.parse_args()
-    
-    generate_market_csv(args.update_readme)
\ No newline at end of file
+    add_arguments(parser)
+    main(parser.parse_args())
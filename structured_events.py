@@ -0,0 +1,140 @@
+import json
+from pydantic import BaseModel, Field, ValidationError
+from google.genai import types
+from gemini_client import generate_content
+from event_csv import validate_row, dedup_rows
+
+# Model used for the cheap formatting pass when grounding and JSON output can't be combined
+FORMAT_MODEL = "gemini-2.5-flash-lite"
+
+# Models that accept Google Search grounding together with a JSON response schema
+SCHEMA_WITH_TOOLS_MODELS = ("gemini-3",)
+
+class EventRecord(BaseModel):
+    """Typed event record matching the columns of the event CSV files."""
+    category: str = Field(description="類別 (Category), in Traditional Chinese")
+    subcategory: str = Field(description="子類別 (Sub-category), in Traditional Chinese")
+    name: str = Field(description="事件名稱 (Event name), in Traditional Chinese")
+    start_date: str = Field(description="開始日期 (Start date), YYYY-MM-DD")
+    end_date: str = Field(default="", description="結束日期 (End date), YYYY-MM-DD or empty")
+    note: str = Field(default="", description="備註 (Note), in Traditional Chinese")
+    link1: str = Field(description="Link1: source URL verifying the event (required)")
+    link2: str = Field(default="", description="Link2: optional second source URL")
+
+    def to_row(self):
+        return [self.category, self.subcategory, self.name, self.start_date,
+                self.end_date, self.note, self.link1, self.link2]
+
+# Inline array schema (no $refs) for response_json_schema
+EVENT_LIST_SCHEMA = {"type": "array", "items": EventRecord.model_json_schema()}
+
+def supports_schema_with_tools(model):
+    return any(model.startswith(prefix) for prefix in SCHEMA_WITH_TOOLS_MODELS)
+
+def parse_records(text):
+    """Parses a JSON array of event records, skipping items that don't fit the schema."""
+    try:
+        items = json.loads(text or "[]")
+    except ValueError:
+        return []
+    if isinstance(items, dict):
+        items = [items]
+    records = []
+    for item in items if isinstance(items, list) else []:
+        try:
+            records.append(EventRecord.model_validate(item))
+        except ValidationError:
+            continue
+    return records
+
+# Appended to a prompt template's system instruction, whose output rules ask for CSV
+JSON_OUTPUT_OVERRIDE = ("Output Format override: ignore the CSV rules above and return the events as JSON records "
+                        "matching the response schema, one field per column; every other requirement still applies.")
+
+def _without_instruction(config):
+    """Copies a GenerateContentConfig without its system instruction (a template's CSV output rules)."""
+    if config is None or not config.system_instruction:
+        return config
+    return config.model_copy(update={"system_instruction": None})
+
+def _json_config(config=None):
+    """Copies a GenerateContentConfig, switching it to JSON output with the event schema."""
+    fields = config.model_dump(exclude_none=True) if config is not None else {}
+    fields.pop("response_modalities", None)
+    instruction = fields.pop("system_instruction", None)
+    if isinstance(instruction, str):
+        # Keep the template's taxonomy and requirements, but not its CSV output format
+        fields["system_instruction"] = instruction + "\n\n" + JSON_OUTPUT_OVERRIDE
+    fields["response_mime_type"] = "application/json"
+    fields["response_json_schema"] = EVENT_LIST_SCHEMA
+    return types.GenerateContentConfig(**fields)
+
+def request_records(client, model, prompt, config=None, ttl=None, site=None):
+    """
+    Runs a (possibly grounded) request and returns its answer as EventRecords.
+
+    When the model can't combine search grounding with a response schema, the grounded
+    answer is fetched as free text and converted by a cheap second formatting pass.
+    """
+    has_tools = bool(config is not None and config.tools)
+    if not has_tools or supports_schema_with_tools(model):
+        response = generate_content(client, model=model, contents=prompt, config=_json_config(config),
+                                    ttl=ttl, site=site)
+        return parse_records(response.text)
+
+    raw = generate_content(client, model=model, contents=prompt, config=config, ttl=ttl, site=site)
+    format_prompt = (
+        "Convert every event in the following text into JSON records. "
+        "Copy the values exactly; do not invent events, dates or URLs. "
+        "Ignore any text that is not an event.\n\n" + (raw.text or "")
+    )
+    response = generate_content(client, model=FORMAT_MODEL, contents=format_prompt, config=_json_config(),
+                                ttl=ttl, site=f"{site}.format" if site else "structured_events.format")
+    return parse_records(response.text)
+
+def generate_structured_rows(client, prompt, config=None, model="gemini-2.5-flash", ttl=None, site=None,
+                             require_link=True, repair_rounds=2):
+    """
+    Generates events as validated CSV rows in one pass.
+
+    Records failing validation (bad dates, missing Link1, ...) are sent back for
+    correction on their own, up to `repair_rounds` times, instead of regenerating
+    the whole set. Rows still invalid after that are dropped and reported.
+    """
+    records = request_records(client, model, prompt, config, ttl, site)
+    # Repairs send records, not the template's task, so its CSV output rules don't apply
+    repair_config = _without_instruction(config)
+    valid = []
+    invalid = []
+    for record in records:
+        problems = validate_row(record.to_row(), require_link)
+        (invalid if problems else valid).append((record, problems))
+    print(f"Structured output: {len(valid)} valid, {len(invalid)} invalid records.")
+
+    for round_number in range(1, repair_rounds + 1):
+        if not invalid:
+            break
+        listing = "\n".join(
+            f"- {record.model_dump_json()} -> problems: {'; '.join(problems)}" for record, problems in invalid
+        )
+        repair_prompt = (
+            "The following event records failed validation. Return corrected versions of ONLY these events, "
+            "one per input record. Dates must be real calendar dates in YYYY-MM-DD format, and Link1 must be "
+            "a source URL verifying the event (use Google Search to find one). Drop an event only if it did not "
+            "actually happen.\n\n" + listing
+        )
+        try:
+            repaired = request_records(client, model, repair_prompt, repair_config, ttl,
+                                       f"{site}.repair" if site else "structured_events.repair")
+        except Exception as e:
+            print(f"Repair round {round_number} failed: {e}")
+            break
+        invalid = []
+        for record in repaired:
+            problems = validate_row(record.to_row(), require_link)
+            (invalid if problems else valid).append((record, problems))
+        print(f"Repair round {round_number}: {len(repaired) - len(invalid)} fixed, {len(invalid)} still invalid.")
+
+    for record, problems in invalid:
+        print(f"  Dropped invalid record ({'; '.join(problems)}): {record.name}")
+    return dedup_rows(record.to_row() for record, _ in valid)
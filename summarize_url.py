@@ -1,83 +1,321 @@
-import requests
-import os
-from bs4 import BeautifulSoup
-from google import genai
-
-import requests
 import os
+import sys
+import json
+import hashlib
+import time
 import argparse
-import datetime # Import datetime
-from bs4 import BeautifulSoup
-from google import genai
-from dotenv import load_dotenv # Import load_dotenv
-
-def update_readme(content, start_marker, end_marker):
-    """Updates the README.md file between specific markers."""
-    readme_path = "README.md"
-    try:
-        with open(readme_path, "r", encoding="utf-8") as f:
-            readme_content = f.read()
-        
-        start_pos = readme_content.find(start_marker)
-        end_pos = readme_content.find(end_marker)
-        
-        if start_pos == -1 or end_pos == -1:
-            print(f"Warning: Markers {start_marker} and {end_marker} not found in {readme_path}")
-            return
-
-        # Generate timestamp
-        now = datetime.datetime.now()
-        timestamp_str = now.strftime("產生時間: %Y-%m-%d %H:%M:%S") + " CST"
-
-
-        new_content = (
-            readme_content[:start_pos + len(start_marker)]
-            + f"\n{timestamp_str}\n\n```text\n" + content + "\n```\n"
-            + readme_content[end_pos:]
-        )
-        
-        with open(readme_path, "w", encoding="utf-8") as f:
-            f.write(new_content)
-            
-        print(f"Successfully updated {readme_path}")
-        
-    except Exception as e:
-        print(f"Error updating README: {e}")
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlparse
+from readme_writer import update_readme
+from gemini_client import add_cache_arguments, configure_cache, create_client, generate_content, load_env
+from token_budget import TokenEstimator, context_limit, split_text
+from html_extract import BACKENDS, MAX_PAGE_BYTES, declared_charset, decode_html, extract_response, extract_text
+from fetch_cache import FetchCache, TeeResponse, text_hash
 
-# Load environment variables from .env file
-load_dotenv()
+DEFAULT_URL = "https://murmurcats.com/margin-balance-market-guide/"
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Summarize URL content")
+# Add headers to mimic a browser (often needed for scraping)
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+SUMMARY_PROMPT = "請用繁體中文提供以下文章的詳細摘要。請重點關注融資餘額和市場相關性方面的關鍵點：\n\n"
+
+# Map-reduce prompts for documents longer than one chunk
+MAP_PROMPT = "以下是一篇長文的第 {index}/{total} 部分。請用繁體中文摘要這一部分的重點，保留具體的數字、日期與名稱，並特別注意融資餘額和市場相關性：\n\n"
+MERGE_PROMPT = "以下是同一篇長文連續幾個部分的摘要。請用繁體中文將它們合併成一份較短的摘要，保留具體的數字、日期與名稱：\n\n"
+REDUCE_PROMPT = "以下是同一篇長文各部分的摘要（依原文順序）。請用繁體中文整合成整篇文章的詳細摘要。請重點關注融資餘額和市場相關性方面的關鍵點：\n\n"
+
+SUMMARY_MODEL = "gemini-2.5-flash"
+
+# Documents up to this many tokens are summarized in a single call; longer ones are
+# split into chunks of this size (capped by the model's context limit).
+DEFAULT_CHUNK_TOKENS = 16000
+
+# Share of the context window a chunk may use (the rest is prompt and headroom)
+CONTEXT_FRACTION = 0.5
+
+# Summaries of the same page text are reused for a day
+CACHE_TTL = 24 * 60 * 60
+
+def create_session(pool_size=10):
+    """Creates a requests.Session whose connection pool is sized for concurrent fetching."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_text(session, url, timeout=30, extractor="auto", max_bytes=MAX_PAGE_BYTES, fetch_cache=None):
+    """
+    Fetches a URL and returns its extracted text, reading at most `max_bytes` of the page.
+
+    With a fetch_cache the request is conditional, and a 304 is served from the stored body.
+    """
+    entry = fetch_cache.get(url) if fetch_cache else None
+    headers = fetch_cache.headers_for(entry) if fetch_cache else {}
+    with session.get(url, timeout=timeout, stream=True, headers=headers) as response:
+        if response.status_code == 304 and entry and entry["body"]:
+            print(f"Not modified: {url}")
+            body = fetch_cache.body_of(entry)
+            return extract_text(decode_html(body, declared_charset(entry["content_type"])), extractor)
+        response.raise_for_status()
+        if fetch_cache is None or not fetch_cache.enabled:
+            return extract_response(response, extractor, max_bytes)
+        tee = TeeResponse(response)
+        text = extract_response(tee, extractor, max_bytes)
+        fetch_cache.store_page(url, response, tee.body, text_hash(text))
+        return text
+
+def summary_key(chunk_tokens):
+    """Fingerprint of everything besides the text that shapes a summary."""
+    settings = "\n".join([SUMMARY_MODEL, SUMMARY_PROMPT, MAP_PROMPT, MERGE_PROMPT, REDUCE_PROMPT, str(chunk_tokens)])
+    return hashlib.sha256(settings.encode("utf-8")).hexdigest()[:16]
+
+def summarize_page(client, url, text, fetch_cache=None, chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=4):
+    """
+    Summarizes a page's text, reusing the stored summary when the text is unchanged
+    since the last run. Returns (summary, reused).
+    """
+    if fetch_cache is None or not fetch_cache.enabled:
+        return summarize_text(client, text, chunk_tokens, workers), False
+    extracted_hash = text_hash(text)
+    key = summary_key(chunk_tokens)
+    summary = fetch_cache.cached_summary(fetch_cache.get(url), extracted_hash, key)
+    if summary is not None:
+        print(f"Text unchanged, reusing summary: {url}")
+        return summary, True
+    summary = summarize_text(client, text, chunk_tokens, workers)
+    if summary:
+        fetch_cache.store_summary(url, extracted_hash, key, summary)
+    return summary, False
+
+def summarize_text(client, text, chunk_tokens=DEFAULT_CHUNK_TOKENS, workers=4):
+    """
+    Summarizes extracted article text with Gemini.
+
+    Text that fits in one chunk takes a single call; anything longer is summarized
+    with map_reduce_summary so no part of the document is dropped.
+    """
+    estimator = TokenEstimator(client, SUMMARY_MODEL)
+    chunk_tokens = min(chunk_tokens, int(context_limit(SUMMARY_MODEL) * CONTEXT_FRACTION))
+    # Only pay for a count_tokens call when the local estimate is close to the limit
+    if estimator.count(text) > chunk_tokens / 2:
+        estimator.calibrate(text)
+    if estimator.count(text) > chunk_tokens:
+        return map_reduce_summary(client, text, estimator, chunk_tokens, workers)
+
+    # Using gemini-2.5-flash for reliability
+    response = generate_content(
+        client,
+        model=SUMMARY_MODEL,
+        contents=SUMMARY_PROMPT + text,
+        ttl=CACHE_TTL,
+        site="summarize_url.summarize_text",
+    )
+    return response.text
+
+def map_reduce_summary(client, text, estimator, chunk_tokens, workers=4):
+    """
+    Summarizes each chunk in parallel, then combines the partial summaries.
+
+    If the partial summaries together still exceed one chunk they are merged in
+    groups (hierarchically) until they fit, then reduced in one final call.
+    """
+    chunks = split_text(text, chunk_tokens, estimator.count)
+    print(f"Long document (~{estimator.count(text)} tokens): summarizing {len(chunks)} chunks...")
+
+    def summarize_all(prompts, site):
+        def run(prompt):
+            response = generate_content(client, model=SUMMARY_MODEL, contents=prompt, ttl=CACHE_TTL, site=site)
+            return response.text or ""
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            return list(pool.map(run, prompts))
+
+    partials = summarize_all(
+        [MAP_PROMPT.format(index=i, total=len(chunks)) + chunk for i, chunk in enumerate(chunks, 1)],
+        "summarize_url.map",
+    )
+
+    level = 1
+    while len(partials) > 1 and estimator.count("\n\n".join(partials)) > chunk_tokens:
+        groups = split_text("\n\n".join(partials), chunk_tokens, estimator.count)
+        if len(groups) >= len(partials):
+            # Merging would not shrink anything; pair the partials up instead
+            groups = ["\n\n".join(partials[i:i + 2]) for i in range(0, len(partials), 2)]
+        print(f"Merging {len(partials)} partial summaries into {len(groups)} (level {level})...")
+        partials = summarize_all([MERGE_PROMPT + group for group in groups], "summarize_url.merge")
+        level += 1
+
+    sections = "\n\n".join(f"[第 {i} 部分]\n{partial}" for i, partial in enumerate(partials, 1))
+    response = generate_content(client, model=SUMMARY_MODEL, contents=REDUCE_PROMPT + sections,
+                                ttl=CACHE_TTL, site="summarize_url.reduce")
+    return response.text
+
+def read_urls(path):
+    """Reads URLs (one per line) from a file, or from stdin when path is '-'."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+    urls = []
+    seen = set()
+    for line in lines:
+        url = line.strip()
+        if not url or url.startswith("#") or url in seen:
+            continue
+        seen.add(url)
+        urls.append(url)
+    return urls
+
+class HostLimiter:
+    """Caps the number of in-flight requests to any single host."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host)
+                self._semaphores[host] = semaphore
+        with semaphore:
+            yield
+
+def summarize_batch(client, urls, output_file, workers=8, per_host=2, summary_workers=4,
+                    chunk_tokens=DEFAULT_CHUNK_TOKENS, extractor="auto", max_bytes=MAX_PAGE_BYTES, fetch_cache=None):
+    """
+    Fetches and summarizes many URLs concurrently.
+
+    Pages are fetched over one pooled session (at most `per_host` requests per host),
+    each page is handed to Gemini as soon as its text is extracted, and every result
+    is appended to `output_file` as a JSON line the moment it completes. With a
+    fetch_cache, unchanged pages reuse their stored summary.
+    """
+    session = create_session(pool_size=workers)
+    host_limiter = HostLimiter(per_host)
+    write_lock = threading.Lock()
+    counts = {"ok": 0, "failed": 0, "reused": 0}
+    batch_start = time.perf_counter()
+
+    with open(output_file, "w", encoding="utf-8") as out:
+
+        def emit(record):
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                counts["ok" if "summary" in record else "failed"] += 1
+                if record.get("reused"):
+                    counts["reused"] += 1
+                done = counts["ok"] + counts["failed"]
+                status = "OK" if "summary" in record else f"FAILED ({record.get('stage')})"
+                print(f"[{done}/{len(urls)}] {status} {record['url']}")
+
+        def summarize_job(url, text, fetch_seconds):
+            start = time.perf_counter()
+            try:
+                summary, reused = summarize_page(client, url, text, fetch_cache, chunk_tokens, workers=1)
+            except Exception as e:
+                emit({"url": url, "stage": "summarize", "error": str(e)})
+                return
+            emit({
+                "url": url,
+                "chars": len(text),
+                "fetch_seconds": round(fetch_seconds, 3),
+                "summarize_seconds": round(time.perf_counter() - start, 3),
+                "reused": reused,
+                "summary": summary,
+            })
+
+        with ThreadPoolExecutor(max_workers=summary_workers) as summary_pool:
+
+            def fetch_job(url):
+                start = time.perf_counter()
+                try:
+                    with host_limiter.slot(url):
+                        text = fetch_text(session, url, extractor=extractor, max_bytes=max_bytes, fetch_cache=fetch_cache)
+                except Exception as e:
+                    emit({"url": url, "stage": "fetch", "error": str(e)})
+                    return
+                if not text:
+                    emit({"url": url, "stage": "extract", "error": "No text extracted"})
+                    return
+                summary_pool.submit(summarize_job, url, text, time.perf_counter() - start)
+
+            # The fetch pool must drain before the summary pool shuts down,
+            # since fetch jobs keep submitting summaries until they finish.
+            with ThreadPoolExecutor(max_workers=workers) as fetch_pool:
+                for url in urls:
+                    fetch_pool.submit(fetch_job, url)
+
+    session.close()
+    elapsed = time.perf_counter() - batch_start
+    print(f"\nBatch complete: {counts['ok']} summarized ({counts['reused']} unchanged), {counts['failed']} failed "
+          f"in {elapsed:.1f}s. Results: '{output_file}'")
+
+def add_arguments(parser):
     parser.add_argument("--update-readme", action="store_true", help="Update the README.md file with the output")
-    args = parser.parse_args()
+    parser.add_argument("--url", default=DEFAULT_URL, help="URL to summarize (single mode)")
+    parser.add_argument("--batch", metavar="FILE", help="Summarize every URL listed in FILE (one per line, '-' for stdin)")
+    parser.add_argument("--output", default="summaries.jsonl", help="JSONL output file for batch mode")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum concurrent page fetches in batch mode")
+    parser.add_argument("--per-host", type=int, default=2, help="Maximum concurrent fetches per host in batch mode")
+    parser.add_argument("--summary-workers", type=int, default=4, help="Maximum concurrent Gemini calls in batch mode")
+    parser.add_argument("--chunk-tokens", type=int, default=DEFAULT_CHUNK_TOKENS, help="Pages longer than this are summarized chunk by chunk (map-reduce)")
+    parser.add_argument("--extractor", choices=["auto"] + list(BACKENDS), default="auto", help="HTML-to-text backend (auto: lxml if installed, else the streaming parser)")
+    parser.add_argument("--max-page-bytes", type=int, default=MAX_PAGE_BYTES, help="Stop reading a page after this many bytes")
+    parser.add_argument("--map-workers", type=int, default=4, help="Maximum concurrent chunk summaries in single-URL mode")
+    add_cache_arguments(parser)
+
+def main(args):
+    configure_cache(args)
+
+    # Load environment variables from .env file
+    load_env()
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if not api_key:
+        print("Error: GEMINI_API_KEY environment variable not set")
+        exit(1)
+
+    # Validators, page bodies and summaries from earlier runs (--no-cache / --refresh apply here too)
+    fetch_cache = FetchCache(enabled=not args.no_cache, refresh=args.refresh)
+
+    if args.batch:
+        urls = read_urls(args.batch)
+        if not urls:
+            print("Error: No URLs found in batch input.")
+            exit(1)
+        print(f"Summarizing {len(urls)} URLs with Gemini 2.5 Flash...")
+        summarize_batch(create_client(api_key), urls, args.output,
+                        workers=args.workers, per_host=args.per_host, summary_workers=args.summary_workers,
+                        chunk_tokens=args.chunk_tokens, extractor=args.extractor, max_bytes=args.max_page_bytes,
+                        fetch_cache=fetch_cache)
+        fetch_cache.close()
+        return
 
     # 1. Fetch Content
-    url = "https://murmurcats.com/margin-balance-market-guide/"
+    url = args.url
     print(f"Fetching content from: {url}...")
 
     try:
-        # Add headers to mimic a browser (often needed for scraping)
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract text (simple extraction)
-        # Remove script and style elements
-        for script in soup(["script", "style", "header", "footer", "nav"]):
-            script.extract()
-            
-        text_content = soup.get_text(separator="\n")
-        
-        # Clean up whitespace
-        lines = (line.strip() for line in text_content.splitlines())
-        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        clean_text = '\n'.join(chunk for chunk in chunks if chunk)
-        
+        session = create_session(pool_size=1)
+        clean_text = fetch_text(session, url, extractor=args.extractor, max_bytes=args.max_page_bytes,
+                                fetch_cache=fetch_cache)
+        session.close()
+
         print(f"Extracted {len(clean_text)} characters.")
 
     except Exception as e:
@@ -87,25 +325,21 @@ if __name__ == "__main__":
     # 2. Summarize with Gemini
     print("Summarizing with Gemini 2.5 Flash...")
 
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        print("Error: GEMINI_API_KEY environment variable not set")
-        exit(1)
-
-    client = genai.Client(api_key=api_key)
+    client = create_client(api_key)
 
     try:
-        # Using gemini-2.5-flash for reliability
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=f"請用繁體中文提供以下文章的詳細摘要。請重點關注融資餘額和市場相關性方面的關鍵點：\n\n{clean_text[:50000]}" # Limit to 50k chars just in case, though pro handles more
-        )
-        
+        summary, _ = summarize_page(client, url, clean_text, fetch_cache, args.chunk_tokens, args.map_workers)
+
         print("\n--- Summary ---\n")
-        print(response.text)
+        print(summary)
 
         if args.update_readme:
-            update_readme(response.text, "<!-- START_SUMMARY_OUTPUT -->", "<!-- END_SUMMARY_OUTPUT -->")
+            update_readme(summary, "<!-- START_SUMMARY_OUTPUT -->", "<!-- END_SUMMARY_OUTPUT -->")
 
     except Exception as e:
         print(f"Error generating summary: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize URL content")
+    add_arguments(parser)
+    main(parser.parse_args())
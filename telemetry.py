@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import atexit
+import argparse
+import tempfile
+import threading
+
+DEFAULT_TELEMETRY_FILE = ".gemini_telemetry.jsonl"
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024 # 10 MB per file
+DEFAULT_BACKUPS = 3
+
+# Usage fields copied from response.usage_metadata
+USAGE_FIELDS = {
+    "prompt_tokens": "prompt_token_count",
+    "candidate_tokens": "candidates_token_count",
+    "thought_tokens": "thoughts_token_count",
+    "cached_tokens": "cached_content_token_count",
+    "total_tokens": "total_token_count",
+}
+
+def grounding_query_count(response):
+    """Number of Google Search queries the model issued for a grounded response."""
+    count = 0
+    for candidate in getattr(response, "candidates", None) or []:
+        metadata = getattr(candidate, "grounding_metadata", None)
+        if metadata is not None:
+            count += len(getattr(metadata, "web_search_queries", None) or [])
+    return count
+
+class Telemetry:
+    """
+    Records one JSONL line per Gemini call: model, call site, token counts, grounding
+    queries, wall time and retries.
+
+    The file is rotated once it grows past `max_bytes` (keeping `backups` old files);
+    the totals of a file dropped by rotation are added to `<path>.totals.json` first.
+    When `prometheus_file` is set, per (model, site) totals over those and all kept
+    files are written there in Prometheus textfile format when the process exits, so
+    the exported counters never go down.
+    """
+
+    def __init__(self, path=None, max_bytes=None, backups=DEFAULT_BACKUPS, prometheus_file=None):
+        self.path = path or os.environ.get("GEMINI_TELEMETRY_FILE", DEFAULT_TELEMETRY_FILE)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("GEMINI_TELEMETRY_MAX_MB", DEFAULT_MAX_BYTES / (1024 * 1024))) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.prometheus_file = prometheus_file or os.environ.get("GEMINI_PROMETHEUS_FILE")
+        self.enabled = os.environ.get("GEMINI_TELEMETRY", "1") not in ("0", "off", "false")
+        self._lock = threading.Lock()
+        self._recorded = False
+        atexit.register(self._export_on_exit)
+
+    def record(self, model, site=None, response=None, wall_time=0.0, retries=0, cached=False,
+               error=None, first_chunk_time=None):
+        """Appends one call record; `response` supplies usage_metadata and grounding data."""
+        if not self.enabled:
+            return None
+        entry = {
+            "time": round(time.time(), 3),
+            "model": model,
+            "site": site or "unknown",
+            "cached": cached,
+            "wall_ms": round(wall_time * 1000, 1),
+            "retries": retries,
+        }
+        usage = getattr(response, "usage_metadata", None)
+        for name, attribute in USAGE_FIELDS.items():
+            entry[name] = (getattr(usage, attribute, None) or 0) if usage is not None else 0
+        entry["grounding_queries"] = grounding_query_count(response)
+        if first_chunk_time is not None:
+            entry["first_chunk_ms"] = round(first_chunk_time * 1000, 1)
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"[:200]
+
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        try:
+            with self._lock:
+                self._rotate_if_needed(len(line.encode("utf-8")))
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                self._recorded = True
+        except OSError as e:
+            print(f"Warning: could not write telemetry: {e}")
+        return entry
+
+    def _rotate_if_needed(self, incoming):
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return
+        if size + incoming <= self.max_bytes:
+            return
+        oldest = f"{self.path}.{self.backups}"
+        if self.backups and os.path.exists(oldest):
+            self._retire(oldest)
+        for index in range(self.backups, 0, -1):
+            source = self.path if index == 1 else f"{self.path}.{index - 1}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index}")
+
+    def files(self):
+        """Telemetry files oldest first."""
+        candidates = [f"{self.path}.{index}" for index in range(self.backups, 0, -1)] + [self.path]
+        return [path for path in candidates if os.path.exists(path)]
+
+    def _file_entries(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue # Skip a line cut short by a crash
+
+    def entries(self):
+        for path in self.files():
+            yield from self._file_entries(path)
+
+    def _totals_path(self):
+        return f"{self.path}.totals.json"
+
+    def retired_totals(self):
+        """Totals per (model, site) of the files rotation has dropped."""
+        try:
+            with open(self._totals_path(), "r", encoding="utf-8") as f:
+                return {(total.pop("model"), total.pop("site")): total for total in json.load(f)}
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def _retire(self, path):
+        """Adds the totals of a file about to be dropped by rotation to the retired totals."""
+        totals = self.retired_totals()
+        for key, total in self._aggregate(self._file_entries(path)).items():
+            kept = totals.setdefault(key, dict.fromkeys(total, 0))
+            for name, value in total.items():
+                kept[name] = kept.get(name, 0) + value
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump([{"model": model, "site": site, **total} for (model, site), total in sorted(totals.items())],
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self._totals_path())
+
+    def totals(self, include_retired=False):
+        """Aggregates entries per (model, site), optionally plus the retired totals."""
+        totals = self._aggregate(self.entries())
+        if include_retired:
+            for key, retired in self.retired_totals().items():
+                total = totals.setdefault(key, dict.fromkeys(retired, 0))
+                for name, value in retired.items():
+                    total[name] = total.get(name, 0) + value
+        return totals
+
+    def _aggregate(self, entries):
+        totals = {}
+        for entry in entries:
+            key = (entry.get("model", ""), entry.get("site", "unknown"))
+            total = totals.setdefault(key, {"calls": 0, "cache_hits": 0, "errors": 0, "retries": 0,
+                                            "wall_seconds": 0.0, "grounding_queries": 0,
+                                            **{name: 0 for name in USAGE_FIELDS}})
+            total["calls"] += 1
+            total["cache_hits"] += 1 if entry.get("cached") else 0
+            total["errors"] += 1 if entry.get("error") else 0
+            total["retries"] += entry.get("retries", 0)
+            total["wall_seconds"] += entry.get("wall_ms", 0) / 1000
+            total["grounding_queries"] += entry.get("grounding_queries", 0)
+            for name in USAGE_FIELDS:
+                total[name] += entry.get(name, 0)
+        return totals
+
+    def prefix_cache_savings(self):
+        """
+        Compares, per (model, site), API calls that reused a cached prompt prefix with
+        calls that sent it inline: average uncached input tokens and time to first
+        token (first chunk for streams, whole call otherwise).
+        """
+        groups = {}
+        for entry in self.entries():
+            if entry.get("cached") or entry.get("error"):
+                continue
+            key = (entry.get("model", ""), entry.get("site", "unknown"))
+            group = groups.setdefault(key, {"cached": [], "inline": []})
+            uncached = entry.get("prompt_tokens", 0) - entry.get("cached_tokens", 0)
+            group["cached" if entry.get("cached_tokens") else "inline"].append(
+                (uncached, entry.get("first_chunk_ms", entry.get("wall_ms", 0))))
+        savings = {}
+        for key, group in groups.items():
+            if not group["cached"]:
+                continue
+            savings[key] = {
+                kind: (len(calls), sum(c[0] for c in calls) / len(calls), sum(c[1] for c in calls) / len(calls)) if calls else None
+                for kind, calls in group.items()
+            }
+        return savings
+
+    def write_prometheus(self, path=None):
+        """Writes per (model, site) totals in Prometheus textfile-collector format."""
+        path = path or self.prometheus_file
+        lines = []
+        metrics = [("calls", "Gemini calls"), ("cache_hits", "Calls answered from the response cache"),
+                   ("errors", "Calls that raised"), ("retries", "429 retries"),
+                   ("wall_seconds", "Wall time spent in calls"), ("grounding_queries", "Google Search grounding queries")]
+        metrics += [(name, f"{name.replace('_', ' ').capitalize()} from usage_metadata") for name in USAGE_FIELDS]
+        # Counters must never decrease, so the files rotation dropped still count
+        totals = self.totals(include_retired=True)
+        for name, help_text in metrics:
+            metric = f"gemini_{name}_total"
+            lines.append(f"# HELP {metric} {help_text}.")
+            lines.append(f"# TYPE {metric} counter")
+            for (model, site), total in sorted(totals.items()):
+                value = total[name]
+                value = f"{value:.3f}" if isinstance(value, float) else str(value)
+                lines.append(f'{metric}{{model="{model}",site="{site}"}} {value}')
+
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def _export_on_exit(self):
+        if self._recorded and self.prometheus_file:
+            try:
+                self.write_prometheus()
+            except OSError as e:
+                print(f"Warning: could not write Prometheus file: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize Gemini call telemetry")
+    parser.add_argument("command", choices=["summary", "prometheus"], help="summary: token and latency totals per call site, prometheus: write the textfile")
+    parser.add_argument("--output", default="gemini.prom", help="Prometheus textfile to write")
+    args = parser.parse_args()
+
+    telemetry = Telemetry()
+    if args.command == "prometheus":
+        telemetry.write_prometheus(args.output)
+        print(f"Wrote '{args.output}'.")
+    else:
+        totals = telemetry.totals()
+        if not totals:
+            print(f"No telemetry in '{telemetry.path}'.")
+        print(f"{'Call site':<50} {'Model':<24} {'Calls':>6} {'Hits':>5} {'Prompt':>9} {'Cached':>9} {'Output':>9} {'Thought':>9} {'Search':>6} {'Avg s':>7}")
+        for (model, site), total in sorted(totals.items(), key=lambda item: -item[1]["total_tokens"]):
+            average = total["wall_seconds"] / total["calls"] if total["calls"] else 0
+            print(f"{site[:50]:<50} {model[:24]:<24} {total['calls']:>6} {total['cache_hits']:>5} "
+                  f"{total['prompt_tokens']:>9} {total['cached_tokens']:>9} {total['candidate_tokens']:>9} {total['thought_tokens']:>9} "
+                  f"{total['grounding_queries']:>6} {average:>7.2f}")
+
+        savings = telemetry.prefix_cache_savings()
+        if savings:
+            def column(group):
+                return f"{group[0]:>4} x {group[1]:>6.0f} tok {group[2]:>6.0f} ms" if group else "-"
+            print("\nContext cache: calls x average uncached input tokens, time to first token")
+            print(f"{'Call site':<50} {'Model':<24} {'Cached prefix':>26} {'Inline prefix':>26}")
+            for (model, site), groups in sorted(savings.items()):
+                print(f"{site[:50]:<50} {model[:24]:<24} {column(groups['cached']):>26} {column(groups['inline']):>26}")
@@ -1,6 +1,7 @@
 import os
-from googleapiclient.discovery import build
 import sys
+from discovery_cache import build_service
+from check_quota import iter_quota_metrics
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -21,7 +22,7 @@ if not project_id:
 try:
     print(f"Testing Service Usage API with API Key for project: {project_id}...")
     # developerKey allows using an API Key instead of default credentials for certain APIs
-    service = build('serviceusage', 'v1beta1', developerKey=api_key)
+    service = build_service('serviceusage', 'v1beta1', developerKey=api_key)
     service_name = "generativelanguage.googleapis.com"
     parent = f"projects/{project_id}/services/{service_name}"
     
@@ -31,10 +32,8 @@ try:
     print(f"State: {response.get('state')}")
 
     print("2. Checking Consumer Quota Metrics...")
-    request = service.services().consumerQuotaMetrics().list(parent=parent)
-    response = request.execute()
-    metrics = response.get('metrics', [])
-    print(f"Success! Found {len(metrics)} metrics.")
+    metric_count = sum(1 for _ in iter_quota_metrics(service, parent))
+    print(f"Success! Found {metric_count} metrics.")
     
 except Exception as e:
     print(f"Failed: {e}")
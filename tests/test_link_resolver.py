@@ -0,0 +1,110 @@
+import os
+import sys
+import csv
+import shutil
+import tempfile
+import threading
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from event_csv import EVENT_HEADER
+from link_resolver import LinkTable, resolve_files
+
+class RedirectHandler(BaseHTTPRequestHandler):
+    """Stand-in for vertexaisearch.cloud.google.com: 302 to /articles/<token>, 404 for tokens starting with "expired"."""
+
+    requests = Counter()
+
+    def do_HEAD(self):
+        token = self.path.rsplit("/", 1)[-1]
+        RedirectHandler.requests[token] += 1
+        if token.startswith("expired"):
+            self.send_response(404)
+        else:
+            self.send_response(302)
+            self.send_header("Location", f"/articles/{token}")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+class LinkResolverTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), RedirectHandler)
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        RedirectHandler.requests.clear()
+        self.workdir = tempfile.mkdtemp(prefix="test_link_resolver_")
+        self.links_file = os.path.join(self.workdir, "links.sqlite")
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def token(self, name):
+        return f"{self.url}/grounding-api-redirect/{name}"
+
+    def write_csv(self, name, rows):
+        path = os.path.join(self.workdir, name)
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(EVENT_HEADER)
+            writer.writerows(rows)
+        return path
+
+    def read_csv(self, path):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            return list(csv.reader(f))[1:]
+
+    def resolve(self, paths):
+        resolve_files(paths, workers=4, per_host=4, links_file=self.links_file)
+
+    def test_redirect_resolves_to_final_url(self):
+        path = self.write_csv("a.csv", [["經濟數據", "CPI", "美國 CPI", "2026-01-13", "", "", self.token("AUZ1"), self.token("AUZ2")]])
+        self.resolve([path])
+        self.assertEqual(self.read_csv(path)[0][6:], [f"{self.url}/articles/AUZ1", f"{self.url}/articles/AUZ2"])
+
+    def test_expired_token_is_recorded_and_kept(self):
+        path = self.write_csv("a.csv", [["經濟數據", "CPI", "美國 CPI", "2026-01-13", "", "", self.token("expired1"), ""]])
+        self.resolve([path])
+        self.assertEqual(self.read_csv(path)[0][6], self.token("expired1"))
+        table = LinkTable(self.links_file)
+        self.assertEqual(table.lookup(self.token("expired1")), (None, 404))
+        table.close()
+
+    def test_each_token_requested_once_across_files_and_runs(self):
+        rows = [["經濟數據", "CPI", "美國 CPI", "2026-01-13", "", "", self.token("AUZ1"), self.token("expired1")]]
+        first = self.write_csv("a.csv", rows)
+        second = self.write_csv("b.csv", rows + [["經濟數據", "PPI", "美國 PPI", "2026-01-14", "", "", self.token("AUZ1"), self.token("AUZ3")]])
+        self.resolve([first, second])
+        # A later run over fresh copies of the same tokens is answered from the link table
+        third = self.write_csv("c.csv", rows)
+        self.resolve([first, second, third])
+        self.assertEqual(RedirectHandler.requests, {"AUZ1": 1, "AUZ3": 1, "expired1": 1})
+        self.assertEqual(self.read_csv(third)[0][6], f"{self.url}/articles/AUZ1")
+
+    def test_malformed_rows_are_kept(self):
+        glued = ["公司行動", "財報發布", "財報發布", "2025-12-11", "2025-12-11", "Broadcom, Oracle經濟數據", "就業報告",
+                 "美國非農就業報告", "2026-01-09", "2026-01-09", "美國勞工統計局公布", self.token("AUZ1"), self.token("AUZ2")]
+        short = ["模型回覆的說明文字"]
+        path = self.write_csv("a.csv", [glued, short])
+        self.resolve([path])
+        rows = self.read_csv(path)
+        self.assertEqual(rows[0], glued[:11] + [f"{self.url}/articles/AUZ1", f"{self.url}/articles/AUZ2"])
+        self.assertEqual(rows[1], short)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import csv
+import shutil
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from event_csv import EVENT_HEADER
+from near_duplicates import NearDuplicateIndex, near_dedup_rows
+
+def event(name, start, note="", category="經濟數據", subcategory="數據發布"):
+    return [category, subcategory, name, start, "", note, "", ""]
+
+class NearDuplicateTest(unittest.TestCase):
+
+    def assertNearDuplicate(self, row, other):
+        self.assertEqual(near_dedup_rows([row, other], verbose=False), [row], f"'{other[2]}' should match '{row[2]}'")
+
+    def assertDistinct(self, row, other):
+        self.assertEqual(near_dedup_rows([row, other], verbose=False), [row, other], f"'{other[2]}' should not match '{row[2]}'")
+
+    def test_shorter_name_contained_in_longer_one(self):
+        self.assertNearDuplicate(event("TWSE上市公司法人說明會", "2025-12-05", "於IT中心舉辦", "公司行動", "法說會"),
+                                 event("法人說明會", "2025-12-08", "勤益控 (1437), 鴻海 (2317)", "公司行動", "法說會"))
+        self.assertNearDuplicate(event("FOMC 利率決策會議", "2025-12-10"), event("聯準會 FOMC 利率決策會議", "2025-12-11"))
+
+    def test_dates_and_numbers_in_the_name_are_ignored(self):
+        self.assertNearDuplicate(event("美國非農就業報告 (2025年12月)", "2026-01-09"), event("美國12月非農就業報告", "2026-01-09"))
+        self.assertNearDuplicate(event("台積電 (TSMC) 2025年第四季度財報發布", "2026-01-15", "台灣時間14:00舉行"),
+                                 event("TSMC 第四季度財報", "2026-01-15"))
+
+    def test_different_indicators_are_distinct(self):
+        # The CPI and PPI rows of market_events.csv
+        self.assertDistinct(event("美國消費者物價指數 (CPI) (2025年12月)", "2026-01-13", "美國勞工統計局公布"),
+                            event("美國生產者物價指數 (PPI) (2025年11月)", "2026-01-14", "美國勞工統計局公布"))
+        # Same template and note, only the indicator differs
+        self.assertDistinct(event("美國 CPI 數據公布", "2026-01-13", "美國勞工統計局公布12月數據，市場關注通膨走勢"),
+                            event("美國 PPI 數據公布", "2026-01-14", "美國勞工統計局公布12月數據，市場關注通膨走勢"))
+
+    def test_names_differing_in_their_subject_are_distinct(self):
+        self.assertDistinct(event("日本央行利率決議", "2026-01-22"), event("歐洲央行利率決議", "2026-01-22"))
+
+    def test_different_companies_are_distinct(self):
+        self.assertDistinct(event("金像電 (2368) 法說會", "2026-01-13", category="公司行動", subcategory="法說會"),
+                            event("可成 (2474) 法說會", "2026-01-13", category="公司行動", subcategory="法說會"))
+        self.assertDistinct(event("法人說明會", "2025-12-08", "勤益控 (1437), 鴻海 (2317), 致茂 (2360)"),
+                            event("法人說明會", "2025-12-09", "TECO (1504), Lite-On (2301), Foxconn (2317)"))
+
+    def test_date_tolerance(self):
+        self.assertDistinct(event("FOMC 利率決策會議", "2025-12-01"), event("聯準會 FOMC 利率決策會議", "2025-12-11"))
+
+    def test_persisted_index_matches_events_in_the_csv(self):
+        workdir = tempfile.mkdtemp(prefix="test_near_duplicates_")
+        try:
+            path = os.path.join(workdir, "events.csv")
+            with open(path, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(EVENT_HEADER)
+                writer.writerow(event("美國FOMC利率決議", "2025-12-11", "台北時間約02:00"))
+            with NearDuplicateIndex(path) as index:
+                self.assertEqual(len(index), 1)
+                self.assertEqual(index.find(event("聯準會 FOMC 利率決議", "2025-12-12"))[:2], ("美國FOMC利率決議", "2025-12-11"))
+                self.assertIsNone(index.find(event("美國 PPI 公布", "2025-12-12")))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import re
+import threading
+
+# Local estimate before calibration: CJK characters are roughly one token each,
+# other text about four characters per token.
+CJK_TOKENS_PER_CHAR = 1.0
+CHARS_PER_TOKEN = 4.0
+
+# Characters of the document sent to count_tokens when calibrating
+CALIBRATION_CHARS = 8000
+
+DEFAULT_CONTEXT_TOKENS = 1048576
+
+CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+def local_estimate(text):
+    """Uncalibrated token estimate for mixed Chinese / English text."""
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk * CJK_TOKENS_PER_CHAR + (len(text) - cjk) / CHARS_PER_TOKEN
+
+class TokenEstimator:
+    """
+    Counts tokens locally, scaled by a ratio measured once per model with count_tokens.
+
+    calibrate() sends a sample of the real document, so the scale reflects its mix of
+    Chinese and English; without a client (or if the call fails) the local estimate is used.
+    """
+
+    _scales = {}
+    _lock = threading.Lock()
+
+    def __init__(self, client=None, model="gemini-2.5-flash"):
+        self.client = client
+        self.model = model
+
+    @property
+    def scale(self):
+        return self._scales.get(self.model, 1.0)
+
+    def calibrate(self, sample):
+        """Measures the model's tokens-per-estimate ratio on `sample`; returns the scale."""
+        sample = sample[:CALIBRATION_CHARS]
+        with self._lock:
+            if self.model in self._scales or self.client is None or not sample.strip():
+                return self.scale
+            try:
+                result = self.client.models.count_tokens(model=self.model, contents=sample)
+                estimate = local_estimate(sample)
+                if result.total_tokens and estimate:
+                    self._scales[self.model] = result.total_tokens / estimate
+            except Exception as e:
+                print(f"count_tokens failed, using the local token estimate: {e}")
+                self._scales[self.model] = 1.0
+        return self.scale
+
+    def count(self, text):
+        return int(local_estimate(text) * self.scale) + 1
+
+def context_limit(model):
+    """Input token limit of `model` from the local model catalog, or the Gemini 2.5 default."""
+    from model_catalog import ModelCatalog
+    record = ModelCatalog().get(model)
+    return (record or {}).get("input_token_limit") or DEFAULT_CONTEXT_TOKENS
+
+def split_text(text, max_tokens, count):
+    """
+    Splits text into chunks of at most `max_tokens` (as measured by `count`), breaking
+    at line boundaries and only cutting inside a line when a single line is too long.
+    """
+    chunks = []
+    current = []
+    current_tokens = 0
+    for line in text.split("\n"):
+        tokens = count(line)
+        if tokens > max_tokens:
+            # Cut an oversized line into pieces proportional to its token density
+            piece_chars = max(1, int(len(line) * max_tokens / tokens))
+            pieces = [line[i:i + piece_chars] for i in range(0, len(line), piece_chars)]
+        else:
+            pieces = [line]
+        for piece in pieces:
+            tokens = count(piece)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n".join(current))
+    return chunks